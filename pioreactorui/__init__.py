@@ -6,6 +6,7 @@ import sqlite3
 import tempfile
 import typing as t
 from base64 import b64decode
+from contextlib import contextmanager
 from datetime import datetime
 from datetime import timezone
 from logging import handlers
@@ -25,7 +26,12 @@ from pioreactor.whoami import am_I_leader
 from pioreactor.whoami import get_unit_name
 from pioreactor.whoami import UNIVERSAL_EXPERIMENT
 
+from . import sharding
 from .config import env
+from .hot_tier import HotTier
+from .live import LiveFanout
+from .schema_catalog import catalog
+from .schema_catalog import TableInfo
 from .version import __version__
 
 VERSION = __version__
@@ -60,13 +66,31 @@ client.username_pw_set(
     pioreactor_config.get("mqtt", "username", fallback="pioreactor"),
     pioreactor_config.get("mqtt", "password", fallback="raspberry"),
 )
+# live viewers share the client's subscriptions, see /api/experiments/<experiment>/live
+live_fanout = LiveFanout(client)
+# recent readings kept in memory, see hot_tier.py. Disabled unless [ui] hot_tier_hours is set.
+recent_readings = HotTier(
+    pioreactor_config.getfloat("ui", "hot_tier_hours", fallback=0.0),
+    pioreactor_config.get("storage", "database"),
+)
+
+
+def on_connect(client: mqtt.Client, *args, **kwargs) -> None:
+    live_fanout.resubscribe()
+    if recent_readings.is_enabled:
+        recent_readings.on_connect(client)
+
+
+client.on_connect = on_connect
 
 
 def decode_base64(string: str) -> str:
     return b64decode(string).decode("utf-8")
 
 
-def create_app():
+def create_app(connect_to_mqtt=True):
+    # huey's tasks build an app without connecting, see tasks.refresh_dashboard_snapshots. A second
+    # connection with the same client_id would disconnect the web server's.
     from .unit_api import unit_api
     from .api import api
 
@@ -76,6 +100,8 @@ def create_app():
 
     if am_I_leader():
         app.register_blueprint(api)
+
+    if am_I_leader() and connect_to_mqtt:
         # we currently only need to communicate with MQTT for the leader.
         # don't even connect if a worker - if the leader is down, this will crash and restart the server over and over.
         client.connect(
@@ -226,6 +252,93 @@ def query_app_db(
     return (rv[0] if rv else None) if one else rv
 
 
+def query_app_db_columns(query: str, args=()) -> list[tuple]:
+    """
+    Like query_app_db, but skips the dict row factory and returns the result column-wise.
+    Useful for large time series reads that are going straight into NumPy.
+    """
+    assert am_I_leader()
+    cur = _get_app_db_connection().cursor()
+    cur.row_factory = None
+    cur.execute(query, args)
+    rv = cur.fetchall()
+    n_columns = len(cur.description or ())
+    cur.close()
+    if not rv:
+        return [tuple() for _ in range(n_columns)]
+    return list(zip(*rv))
+
+
+def iter_app_db(query: str, args=()) -> t.Generator[tuple, None, None]:
+    """
+    Like query_app_db, but rows (as tuples) are stepped through lazily, so a caller that stops early
+    doesn't pay for the rest of the result.
+    """
+    assert am_I_leader()
+    cur = _get_app_db_connection().cursor()
+    cur.row_factory = None
+    try:
+        yield from cur.execute(query, args)
+    finally:
+        cur.close()
+
+
+def get_app_db_table(name: str) -> TableInfo | None:
+    """
+    The columns and indexes of a table or view in the app database, or None if it doesn't exist.
+    """
+    assert am_I_leader()
+    return catalog.tables(_get_app_db_connection()).get(name)
+
+
+def query_app_db_sharded(query: str, shard_args: t.Sequence[tuple]) -> list[list[tuple]]:
+    """
+    Run the same read query once for each args in shard_args (ex: once per unit), in parallel
+    across a pool of read-only connections, see sharding.py. Returns each shard's rows, as tuples,
+    in the order of shard_args.
+
+    Databases that aren't files (ex: in tests) can't be opened by other connections, so their shards
+    are run one after another on this request's connection.
+    """
+    assert am_I_leader()
+    con = _get_app_db_connection()
+    cur = con.cursor()
+    cur.row_factory = None
+
+    database = next(file for _, name, file in cur.execute("PRAGMA database_list") if name == "main")
+    if database:
+        cur.close()
+        return sharding.map_query(database, query, shard_args)
+
+    rv = [cur.execute(query, args).fetchall() for args in shard_args]
+    cur.close()
+    return rv
+
+
+@contextmanager
+def app_db_read_transaction() -> t.Iterator[None]:
+    """
+    Run several query_app_db* reads against one consistent snapshot of the database, ex:
+
+        with app_db_read_transaction():
+            a = query_app_db(...)
+            b = query_app_db(...)
+
+    Nested uses join the outer transaction.
+    """
+    assert am_I_leader()
+    con = _get_app_db_connection()
+    if con.in_transaction:
+        yield
+        return
+
+    con.execute("BEGIN")
+    try:
+        yield
+    finally:
+        con.rollback()  # nothing was written
+
+
 def query_temp_local_metadata_db(
     query: str, args=(), one: bool = False
 ) -> dict[str, t.Any] | list[dict[str, t.Any]] | None:
@@ -2,14 +2,23 @@
 from __future__ import annotations
 
 import configparser
+import itertools
 import os
+import queue
 import re
 import sqlite3
 import tempfile
+import typing as t
 import zipfile
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
 from io import BytesIO
 from pathlib import Path
+from time import time
 
+import numpy as np
+import paho.mqtt.client as mqtt
 from flask import abort
 from flask import Blueprint
 from flask import current_app
@@ -17,13 +26,17 @@ from flask import jsonify
 from flask import request
 from flask import Response
 from flask import send_file
+from flask import stream_with_context
 from flask.typing import ResponseReturnValue
 from huey.api import Result
 from huey.exceptions import HueyException
 from huey.exceptions import TaskException
 from msgspec import DecodeError
 from msgspec import ValidationError
+from msgspec.json import decode as json_decode
+from msgspec.json import encode as json_encode
 from msgspec.yaml import decode as yaml_decode
+from pioreactor.config import config as pioreactor_config
 from pioreactor.config import get_leader_hostname
 from pioreactor.experiment_profiles.profile_struct import Profile
 from pioreactor.structs import CalibrationBase
@@ -31,27 +44,109 @@ from pioreactor.structs import Dataset
 from pioreactor.structs import subclass_union
 from pioreactor.utils.timing import current_utc_datetime
 from pioreactor.utils.timing import current_utc_timestamp
+from pioreactor.utils.timing import to_datetime
+from pioreactor.utils.timing import to_iso_format
 from pioreactor.whoami import UNIVERSAL_EXPERIMENT
 from pioreactor.whoami import UNIVERSAL_IDENTIFIER
 from werkzeug.utils import safe_join
 from werkzeug.utils import secure_filename
 
+from . import app_db_read_transaction
 from . import client
 from . import get_all_units
 from . import get_all_workers
 from . import get_all_workers_in_experiment
+from . import get_app_db_table
 from . import HOSTNAME
+from . import iter_app_db
+from . import live_fanout
 from . import modify_app_db
 from . import msg_to_JSON
 from . import publish_to_error_log
 from . import publish_to_experiment_log
 from . import publish_to_log
 from . import query_app_db
+from . import query_app_db_columns
+from . import query_app_db_sharded
 from . import query_temp_local_metadata_db
+from . import recent_readings
 from . import structs
 from . import tasks
+from .calibrations import active_od_calibrations
+from .calibrations import calibrate_series
+from .calibrations import DEFAULT_PATH as DEFAULT_CALIBRATION_CACHE
 from .config import env
 from .config import is_testing_env
+from .dosing_ledger import LATEST_STATE_QUERY as DOSING_LEDGER_LATEST_STATE_QUERY
+from .dosing_ledger import STATE_BEFORE_QUERY as DOSING_LEDGER_STATE_BEFORE_QUERY
+from .dosing_ledger import summarize_unit as summarize_dosing_ledger
+from .dosing_ledger import tail_query as dosing_ledger_tail_query
+from .dosing_ledger import vial_defaults
+from .hot_tier import to_epoch_ms
+from .latest_values import combine_latest_values
+from .latest_values import LATEST_VALUE_SOURCES
+from .latest_values import tail_query as latest_values_tail_query
+from .live import chart_point
+from .live import HEARTBEAT_SECONDS
+from .log_search import DEFAULT_PAGE_SIZE as DEFAULT_LOG_SEARCH_PAGE_SIZE
+from .log_search import encode_cursor as encode_log_search_cursor
+from .log_search import MAX_PAGE_SIZE as MAX_LOG_SEARCH_PAGE_SIZE
+from .log_search import parse_cursor as parse_log_search_cursor
+from .log_search import to_match_expression
+from .result_cache import DEFAULT_PATH as DEFAULT_RESULT_CACHE
+from .result_cache import get_stats as get_result_cache_stats
+from .result_cache import ResultCache
+from .rollups import choose_resolution
+from .rollups import MAX_STALENESS_MINUTES
+from .rollups import RESOLUTIONS
+from .schema_catalog import TableInfo
+from .snapshots import DEFAULT_PATH as DEFAULT_DASHBOARD_SNAPSHOTS
+from .snapshots import read_snapshot
+from .sparklines import DEFAULT_HEIGHT as DEFAULT_SPARKLINE_HEIGHT
+from .sparklines import DEFAULT_WIDTH as DEFAULT_SPARKLINE_WIDTH
+from .sparklines import MAX_HEIGHT as MAX_SPARKLINE_HEIGHT
+from .sparklines import MAX_WIDTH as MAX_SPARKLINE_WIDTH
+from .sparklines import render_sparkline
+from .sparklines import sparkline_path
+from .tiles import DEFAULT_PATH as DEFAULT_TILE_CACHE
+from .tiles import IMMUTABLE_MAX_AGE
+from .tiles import max_tile_index
+from .tiles import tile_is_complete
+from .tiles import TILE_LEVELS
+from .tiles import TILE_MAX_POINTS
+from .tiles import tile_range
+from .tiles import tile_settles_at
+from .tiles import TileCache
+from .time_series import BUCKET_STATISTICS
+from .time_series import bucket_statistics
+from .time_series import BUILTIN_TIME_SERIES
+from .time_series import change_points
+from .time_series import COLUMNAR_MIMETYPE
+from .time_series import DEFAULT_MAX_POINTS
+from .time_series import downsample_indices
+from .time_series import DOWNSAMPLE_METHODS
+from .time_series import encode_columns
+from .time_series import ENCODINGS
+from .time_series import MAX_OVERLAY_SERIES
+from .time_series import MAX_POINTS_LIMIT
+from .time_series import next_cursors
+from .time_series import parse_bucket
+from .time_series import parse_concatenated_series
+from .time_series import replicate_bands
+from .time_series import replicate_group
+from .time_series import resample
+from .time_series import Since
+from .time_series import split_by_unit
+from .time_series import stream_series_json
+from .time_series import to_timestamps
+from .timeline import DEFAULT_PAGE_SIZE as DEFAULT_TIMELINE_PAGE_SIZE
+from .timeline import encode_cursor as encode_timeline_cursor
+from .timeline import MAX_PAGE_SIZE as MAX_TIMELINE_PAGE_SIZE
+from .timeline import merge_timelines
+from .timeline import parse_cursor as parse_timeline_cursor
+from .timeline import timeline_query
+from .timeline import TIMELINE_SOURCES
+from .transformations import compile_transformation
 from .utils import attach_cache_control
 from .utils import create_task_response
 from .utils import is_valid_unix_filename
@@ -410,6 +505,94 @@ def get_logs() -> ResponseReturnValue:
     return jsonify(recent_logs)
 
 
+@api.route("/logs/search", methods=["GET"])
+def search_logs() -> ResponseReturnValue:
+    """
+    Full-text search of the logs' message and task (see log_search.py). Responses look like
+
+        {"hits": [{"timestamp": ..., "level": ..., "pioreactor_unit": ..., "message": ..., "task": ..., "experiment": ...}, ...], "cursor": ..., "complete": true}
+
+    where cursor is null on the last page, or else is passed back as `cursor` for the next page, and
+    complete is false while older logs are still being indexed. Query parameters:
+
+     - q: search terms, required. Logs must match all of them.
+     - experiment: only this experiment's logs.
+     - unit: only this unit's logs, and the logs sent to all units.
+     - min_level: default INFO.
+     - limit: hits per page, default 50, max 500.
+     - order: `newest` (default), or `best` for the best matches first (by bm25).
+
+    Newest first pages are keyset-paginated on (timestamp, ROWID): each log that matched when the
+    first page was read, and still does, is on exactly one page. Logs indexed since are on the next
+    pages only if they're older than the cursor (ex: back-filled ones). Ranks change as logs are
+    added, so `order=best` is only one page, of the `limit` best matches, with a null cursor.
+    """
+    args = request.args
+    match = to_match_expression(args.get("q", ""))
+    if not match:
+        abort(400, "q is required.")
+    try:
+        limit = int(args.get("limit", DEFAULT_LOG_SEARCH_PAGE_SIZE))
+        if not 0 < limit <= MAX_LOG_SEARCH_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_LOG_SEARCH_PAGE_SIZE}.")
+        after = parse_log_search_cursor(args["cursor"]) if "cursor" in args else None
+    except ValueError as e:
+        abort(400, str(e))
+
+    order = args.get("order", "newest")
+    if order not in ("newest", "best"):
+        abort(400, "order must be newest or best.")
+    elif order == "best" and after is not None:
+        abort(400, "Best matches first is only one page: it takes no cursor.")
+
+    filters: list[str] = []
+    query_args: list[t.Any] = [match]
+    if "experiment" in args:
+        filters.append("l.experiment=?")
+        query_args.append(args["experiment"])
+    if "unit" in args:
+        filters.append("(l.pioreactor_unit=? OR l.pioreactor_unit=?)")
+        query_args.extend((args["unit"], UNIVERSAL_IDENTIFIER))
+    if after is not None:
+        filters.append("(l.timestamp, l.ROWID) < (?, ?)")
+        query_args.extend(after)
+
+    try:
+        with app_db_read_transaction():
+            hits = query_app_db(
+                f"""
+                SELECT l.ROWID as log_id, l.timestamp, l.level, l.pioreactor_unit, l.message, l.task, l.experiment
+                FROM logs_fts
+                JOIN logs AS l ON l.ROWID = logs_fts.rowid
+                WHERE logs_fts MATCH ?
+                    AND ({get_level_string(args.get("min_level", "INFO"))})
+                    {"".join(f" AND {f}" for f in filters)}
+                ORDER BY {"bm25(logs_fts), l.ROWID" if order == "best" else "l.timestamp DESC, l.ROWID DESC"}
+                LIMIT {limit + 1};
+                """,
+                tuple(query_args),
+            )
+            backfill = query_app_db(
+                "SELECT next_rowid >= backfill_below as complete FROM logs_fts_backfill", one=True
+            )
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            abort(503, "The log search index hasn't been created yet. Try again in a minute.")
+        publish_to_error_log(str(e), "search_logs")
+        abort(400, str(e))
+    assert isinstance(hits, list) and isinstance(backfill, dict)
+
+    cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        if order == "newest":
+            cursor = encode_log_search_cursor(hits[-1]["timestamp"], hits[-1]["log_id"])
+    for hit in hits:
+        del hit["log_id"]
+
+    return jsonify({"hits": hits, "cursor": cursor, "complete": bool(backfill["complete"])})
+
+
 @api.route("/experiments/<experiment>/logs", methods=["GET"])
 def get_exp_logs(experiment: str) -> ResponseReturnValue:
     """Shows event logs from all units, uses pagination."""
@@ -429,6 +612,64 @@ def get_exp_logs(experiment: str) -> ResponseReturnValue:
     return jsonify(recent_logs)
 
 
+@api.route("/experiments/<experiment>/timeline", methods=["GET"])
+def get_experiment_timeline(experiment: str) -> ResponseReturnValue:
+    """
+    Dosing events, LED and PWM changes, and logs, merged in timestamp order. Responses look like
+
+        {"events": [{"timestamp": ..., "type": "dosing"|"led"|"pwm"|"log", "pioreactor_unit": ..., "details": {...}}, ...], "cursor": ...}
+
+    where cursor is null on the last page, or else is passed back as `cursor` for the next page.
+    Query parameters:
+
+     - start, end: UTC timestamps. Events are in [start, end).
+     - limit: events per page, default 100, max 1000.
+     - min_level: of the logs, default INFO.
+    """
+    args = request.args
+    try:
+        start, end = args.get("start"), args.get("end")
+        for timestamp in (start, end):
+            if timestamp is not None:
+                to_datetime(timestamp)
+        limit = int(args.get("limit", DEFAULT_TIMELINE_PAGE_SIZE))
+        if not 0 < limit <= MAX_TIMELINE_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_TIMELINE_PAGE_SIZE}.")
+        after = parse_timeline_cursor(args["cursor"]) if "cursor" in args else None
+    except ValueError as e:
+        abort(400, str(e))
+
+    log_filter = f"({get_level_string(args.get('min_level', 'INFO'))})"
+
+    streams = []
+    try:
+        with app_db_read_transaction():
+            for index, source in enumerate(TIMELINE_SOURCES):
+                query, query_args = timeline_query(
+                    index,
+                    experiment,
+                    start,
+                    end,
+                    after,
+                    log_filter if source.table == "logs" else "",
+                )
+                streams.append(iter_app_db(query, query_args))
+            events, next_cursor = merge_timelines(streams, limit)
+    except sqlite3.OperationalError as e:
+        publish_to_error_log(str(e), "get_experiment_timeline")
+        abort(400, str(e))
+    finally:
+        for stream in streams:
+            stream.close()
+
+    return jsonify(
+        {
+            "events": events,
+            "cursor": encode_timeline_cursor(next_cursor) if next_cursor is not None else None,
+        }
+    )
+
+
 @api.route("/workers/<pioreactor_unit>/experiments/<experiment>/recent_logs", methods=["GET"])
 def get_recent_logs_for_unit_and_experiment(
     pioreactor_unit: str, experiment: str
@@ -475,296 +716,2248 @@ def get_logs_for_unit_and_experiment(pioreactor_unit: str, experiment: str) -> R
         (experiment, pioreactor_unit, UNIVERSAL_IDENTIFIER),
     )
 
-    return jsonify(recent_logs)
+    return jsonify(recent_logs)
+
+
+@api.route("/units/<pioreactor_unit>/system_logs", methods=["GET"])
+def get_system_logs_for_unit(pioreactor_unit: str) -> ResponseReturnValue:
+    """Shows system logs from specific unit uses pagination."""
+
+    skip = int(request.args.get("skip", 0))
+    min_level = request.args.get("min_level", "INFO")
+
+    recent_logs = query_app_db(
+        f"""SELECT l.timestamp, l.level, l.pioreactor_unit, l.message, l.task, l.experiment
+            FROM logs AS l
+            WHERE (l.experiment="$experiment")
+                AND (l.pioreactor_unit=? or l.pioreactor_unit=?)
+                AND ({get_level_string(min_level)})
+            ORDER BY l.timestamp DESC LIMIT 50 OFFSET {skip};""",
+        (pioreactor_unit, UNIVERSAL_IDENTIFIER),
+    )
+
+    return jsonify(recent_logs)
+
+
+@api.route("/units/<pioreactor_unit>/logs", methods=["GET"])
+def get_logs_for_unit(pioreactor_unit: str) -> ResponseReturnValue:
+    """Shows event logs from all units, uses pagination."""
+
+    skip = int(request.args.get("skip", 0))
+    min_level = request.args.get("min_level", "INFO")
+
+    recent_logs = query_app_db(
+        f"""SELECT l.timestamp, level, l.pioreactor_unit, message, task, l.experiment
+            FROM logs AS l
+            WHERE (l.pioreactor_unit=? or l.pioreactor_unit=?)
+            AND ({get_level_string(min_level)})
+            ORDER BY l.timestamp DESC LIMIT 50 OFFSET {skip};""",
+        (pioreactor_unit, UNIVERSAL_IDENTIFIER),
+    )
+
+    return jsonify(recent_logs)
+
+
+@api.route("/workers/<pioreactor_unit>/experiments/<experiment>/logs", methods=["POST"])
+@api.route("/units/<pioreactor_unit>/experiments/<experiment>/logs", methods=["POST"])
+def publish_new_log(pioreactor_unit: str, experiment: str) -> ResponseReturnValue:
+    body = request.get_json()
+    source_ = body.get("source_", "ui")
+
+    topic = f"pioreactor/{pioreactor_unit}/{experiment}/logs/{source_}/{body['level'].lower()}"
+    client.publish(
+        topic,
+        msg_to_JSON(
+            msg=body["message"],
+            source=body["source"],
+            level=body["level"].upper(),
+            timestamp=body["timestamp"],
+            task=body["task"] or "",
+        ),
+    )
+    return {"status": "success"}, 202
+
+
+## Time series data
+
+# experiments with at least this many units have their raw time series read per unit, in parallel.
+MIN_UNITS_TO_SHARD = 8
+
+
+def get_downsample_parameters(args, default_method: str | None = None) -> tuple[str, int] | None:
+    """
+    Parses `downsample=lttb|minmax&max_points=N`. Returns None if the caller didn't ask for
+    downsampling (and there's no default_method), in which case the legacy `filter_mod_N`
+    thinning is used.
+    """
+    method = args.get("downsample", default_method)
+    if method is None:
+        return None
+    elif method not in DOWNSAMPLE_METHODS:
+        abort(400, f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+
+    try:
+        max_points = int(args.get("max_points", DEFAULT_MAX_POINTS))
+    except ValueError:
+        abort(400, "max_points must be an integer")
+
+    return method, min(max(max_points, 4), MAX_POINTS_LIMIT)
+
+
+def get_since_parameter(args) -> Since | None:
+    """
+    `since` is the `cursor` returned by a previous call, a JSON object of each series' newest
+    timestamp. Only rows strictly newer than their series' cursor are returned, so a client can
+    poll and append instead of re-downloading the whole lookback. A single timestamp applies to
+    every series.
+
+    Timestamps are normalized to the tables' format (see pioreactor.utils.timing), as they are
+    compared to the timestamp column as strings.
+    """
+    since = args.get("since")
+    if since is None:
+        return None
+
+    try:
+        if since.startswith("{"):
+            cursors = {
+                series: to_iso_format(to_datetime(timestamp))
+                for series, timestamp in json_decode(since, type=dict[str, str]).items()
+            }
+            return Since(cursors, min(cursors.values())) if cursors else None
+        else:
+            return Since({}, to_iso_format(to_datetime(since)))
+    except (DecodeError, ValidationError, ValueError):
+        abort(
+            400,
+            "since must be a cursor, or a UTC timestamp like 2024-01-01T00:00:00.000Z",
+        )
+
+
+def since_filter(source: structs.TimeSeriesSource, since: Since | None) -> tuple[str, tuple]:
+    """
+    SQL (and its args) keeping only the rows newer than their series' cursor. The floor is checked
+    on its own too, so that SQLite can still skip the older rows with the timestamp index.
+    """
+    if since is None:
+        return "", ()
+    elif not since.cursors:
+        return "timestamp > ? AND", (since.floor,)
+    return (
+        f"""timestamp > ? AND
+        timestamp > coalesce((SELECT value FROM json_each(?) WHERE key = {source.unit_expression}), ?) AND""",
+        (since.floor, json_encode(since.cursors).decode(), since.floor),
+    )
+
+
+def get_parallel_parameter(args) -> bool | None:
+    """
+    `parallel=1` forces reading each unit's rows separately, in parallel (see units_to_shard), and
+    `parallel=0` disables it. The default, None, shards experiments with many units.
+    """
+    parallel = args.get("parallel")
+    if parallel is None:
+        return None
+    elif parallel.lower() in ("1", "true"):
+        return True
+    elif parallel.lower() in ("0", "false"):
+        return False
+    else:
+        abort(400, "parallel must be 1 or 0")
+
+
+def get_stream_parameter(args) -> bool:
+    """
+    `stream=1` streams raw rows as JSON in chunks, see streamed_time_series.
+    """
+    stream = args.get("stream", "0").lower()
+    if stream not in ("1", "true", "0", "false"):
+        abort(400, "stream must be 1 or 0")
+    return stream in ("1", "true")
+
+
+def get_encoding_parameter(args) -> str:
+    """
+    `encoding=change_points` collapses runs of equal values, see change_point_time_series. It
+    needs every row, so it can't be combined with downsampling or streaming.
+    """
+    encoding = args.get("encoding", "rows")
+    if encoding not in ENCODINGS:
+        abort(400, f"encoding must be one of {', '.join(ENCODINGS)}")
+    if encoding == "change_points" and ("downsample" in args or get_stream_parameter(args)):
+        abort(400, "encoding=change_points can't be combined with downsample or stream.")
+    return encoding
+
+
+def experiment_units(experiment: str, data_source: str) -> list[str]:
+    """
+    The units with rows in data_source for this experiment.
+
+    Units are found with a "loose index scan": each step seeks to the next unit in the
+    (experiment, pioreactor_unit, timestamp) index, instead of scanning all the experiment's rows.
+    """
+    (units,) = query_app_db_columns(
+        f"""
+        WITH RECURSIVE units(unit) AS (
+            SELECT min(pioreactor_unit) FROM {data_source} WHERE experiment=?
+            UNION ALL
+            SELECT (SELECT min(pioreactor_unit) FROM {data_source} WHERE experiment=? AND pioreactor_unit > unit)
+            FROM units
+            WHERE unit IS NOT NULL
+        )
+        SELECT unit FROM units WHERE unit IS NOT NULL;
+        """,
+        (experiment, experiment),
+    )
+    return list(units)
+
+
+def units_to_shard(experiment: str, data_source: str, parallel: bool | None) -> list[str] | None:
+    """
+    The units to split a read of data_source into, or None if it should be read in one query.
+    """
+    if parallel is False:
+        return None
+
+    units = experiment_units(experiment, data_source)
+    if parallel or len(units) >= MIN_UNITS_TO_SHARD:
+        return units
+    return None
+
+
+def units_for_index(experiment: str, table: TableInfo | None) -> list[str] | None:
+    """
+    The units to pass to thinned_time_series, if naming them lets SQLite use the table's index.
+    """
+    if table is not None and table.filter_by_unit:
+        return experiment_units(experiment, table.name)
+    return None
+
+
+def get_time_series_table(data_source: str, column: str) -> TableInfo:
+    """
+    Validate a user-supplied data_source and column against the schema catalog, before any query
+    is run. Aborts with a 400 if they aren't a time series table (or view) and column.
+    """
+    try:
+        data_source = scrub_to_valid(data_source)
+        column = scrub_to_valid(column)
+    except ValueError:
+        abort(400, "Invalid data_source or column.")
+
+    table = get_app_db_table(data_source)
+    if table is None:
+        abort(400, f"No table or view named {data_source}.")
+
+    for required in (column, "experiment", "pioreactor_unit", "timestamp"):
+        if not table.has_columns(required):
+            abort(400, f"{data_source} has no column {required}.")
+
+    return table
+
+
+def get_time_series_source(data_source: str, column: str | None) -> structs.TimeSeriesSource:
+    """
+    The time series of a user-supplied data_source and column: the built-in one if column is its
+    column (or None), so that its series are named and rounded the same everywhere, else one of a
+    validated table and column, see get_time_series_table.
+    """
+    builtin = BUILTIN_TIME_SERIES.get(data_source)
+    if builtin is not None and column in (None, builtin.column):
+        return builtin
+    elif column is None:
+        abort(400, f"column is required for {data_source}.")
+
+    table = get_time_series_table(data_source, column)
+    return structs.TimeSeriesSource(table.name, scrub_to_valid(column))
+
+
+def is_builtin(source: structs.TimeSeriesSource) -> bool:
+    """True if source is a built-in time series (which have rollups), not another column of its table."""
+    return BUILTIN_TIME_SERIES.get(source.data_source) == source
+
+
+def get_resolution_parameter(
+    args, source: structs.TimeSeriesSource, lookback: float, since: Since | None
+) -> str | None:
+    """
+    Parses `resolution=auto|raw|1m|10m|1h`. Returns a key of rollups.RESOLUTIONS, or None if the raw
+    table should be read. `auto` (the default) picks a resolution from the lookback.
+    """
+    resolution = args.get("resolution", "auto")
+    if resolution not in ("auto", "raw", *RESOLUTIONS):
+        abort(400, f"resolution must be one of auto, raw, {', '.join(RESOLUTIONS)}")
+
+    if resolution == "raw" or since is not None or not is_builtin(source):
+        # polling for new rows is cheap on the raw tables, and the newest bucket is still filling up anyways.
+        return None
+    elif resolution == "auto":
+        return choose_resolution(lookback)
+    else:
+        return resolution
+
+
+def series_payload(
+    units: tuple,
+    timestamps: tuple,
+    x: tuple | np.ndarray,
+    y: tuple | np.ndarray,
+    downsample: tuple[str, int] | None = None,
+    since: Since | None = None,
+    transform: t.Callable[[np.ndarray], np.ndarray] | None = None,
+    encoding: str = "rows",
+) -> dict[str, t.Any]:
+    """
+    Builds the {"series": ..., "data": ..., "cursor": ...} payload from columns sorted by unit, then
+    timestamp, where cursor is since's, updated with each unit's newest timestamp. If downsample
+    is provided, each unit's series is bounded using that method. If
+    transform is provided, it's applied to y before downsampling, and the payload is marked as
+    `"transformed": true`. If encoding is change_points, only the rows where a unit's value changes
+    are kept, with their run length `n`, see change_point_time_series.
+    """
+    units_ = np.asarray(units, dtype=object)
+    x_ = np.asarray(x, dtype=np.float64)
+    y_ = np.asarray(y, dtype=np.float64)
+    if transform is not None:
+        y_ = transform(y_)
+
+    series, data, newest = [], [], []
+    for unit_slice in split_by_unit(units_):
+        if encoding == "change_points":
+            keep, run_lengths = change_points(y_[unit_slice])
+            keep += unit_slice.start
+            points = [
+                {"x": timestamps[i], "y": y, "n": n}
+                for i, y, n in zip(keep, y_[keep].tolist(), run_lengths.tolist())
+            ]
+        else:
+            if downsample is not None:
+                keep = downsample_indices(x_[unit_slice], y_[unit_slice], *downsample)
+                keep += unit_slice.start
+            else:
+                keep = np.arange(unit_slice.start, unit_slice.stop)
+            points = [{"x": timestamps[i], "y": y} for i, y in zip(keep, y_[keep].tolist())]
+
+        series.append(units_[unit_slice.start])
+        data.append(points)
+        # rows are sorted by timestamp within a unit, so the last one is that unit's newest.
+        newest.append((units_[unit_slice.start], timestamps[unit_slice.stop - 1]))
+
+    payload: dict[str, t.Any] = {
+        "series": series,
+        "data": data,
+        "cursor": next_cursors(since, newest),
+    }
+    if transform is not None:
+        payload["transformed"] = True
+    if encoding == "change_points":
+        payload["encoding"] = encoding
+    return payload
+
+
+def time_series_columns(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    since: Since | None = None,
+    shard_units: list[str] | None = None,
+    filter_mod_n: float | None = None,
+) -> tuple[tuple, tuple, tuple, tuple]:
+    """
+    The (series, timestamp, julian day, y) columns of the source's rows, sorted by series, then
+    timestamp. If shard_units is given, each unit's rows are read by a separate query, in parallel.
+    If filter_mod_n is given, rows are thinned by ROWID like thinned_time_series.
+
+    The source's fields are interpolated into the SQL: callers must pass trusted or scrubbed values.
+    """
+    since_sql, since_args = since_filter(source, since)
+    thinning_sql = ""
+    thinning_args: tuple[float, ...] = ()
+    if filter_mod_n is not None:
+        thinning_sql = "((ROWID * 0.61803398875) - cast(ROWID * 0.61803398875 as int) < 1.0/?) AND"
+        thinning_args = (filter_mod_n,)
+    query = f"""
+        SELECT {source.unit_expression} as unit, timestamp, julianday(timestamp), round({source.column}, {source.decimals})
+        FROM {source.data_source}
+        WHERE experiment=? AND
+            timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?) AND
+            {since_sql}
+            {thinning_sql}
+            {source.column} IS NOT NULL
+            {"AND pioreactor_unit=?" if shard_units is not None else ""}
+        ORDER BY 1, timestamp;
+        """
+    args = (experiment, f"-{lookback} hours", *since_args, *thinning_args)
+    if shard_units is None:
+        units, timestamps, x, y = query_app_db_columns(query, args)
+    else:
+        shards = query_app_db_sharded(query, [(*args, unit) for unit in shard_units])
+        rows = [row for shard in shards for row in shard]
+        units, timestamps, x, y = zip(*rows) if rows else ((), (), (), ())
+    return units, timestamps, x, y
+
+
+def downsampled_time_series(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    downsample: tuple[str, int] | None,
+    since: Since | None = None,
+    shard_units: list[str] | None = None,
+    transform: t.Callable[[np.ndarray], np.ndarray] | None = None,
+) -> Response:
+    """
+    Same response shape as the json_group_array queries, but each unit's series is bounded to
+    `max_points` using a shape-preserving downsampler instead of the ROWID thinning. If downsample
+    is None, all rows are returned.
+    """
+    units, timestamps, x, y = time_series_columns(experiment, source, lookback, since, shard_units)
+    payload = series_payload(units, timestamps, x, y, downsample, since, transform)
+    return jsonify(payload | {"resolution": "raw"})
+
+
+def change_point_time_series(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    since: Since | None = None,
+    unit: str | None = None,
+    transform: t.Callable[[np.ndarray], np.ndarray] | None = None,
+) -> Response:
+    """
+    Piecewise constant series (ex: LED intensities, duty cycles, target temperatures) as their
+    change points, for `encoding=change_points`. Points look like
+
+        {"x": timestamp, "y": value, "n": run_length}
+
+    where n counts the point's row and the rows after it with the same value. Each unit's last row
+    is also kept, so that the last step is drawn up to it. Rows are never thinned or read from
+    rollups, as either could miss a change. With `since`, the first row of each unit is a point.
+    """
+    units, timestamps, x, y = time_series_columns(
+        experiment, source, lookback, since, [unit] if unit is not None else None
+    )
+    payload = series_payload(
+        units, timestamps, x, y, since=since, transform=transform, encoding="change_points"
+    )
+    return jsonify(payload | {"resolution": "raw"})
+
+
+def hot_tier_time_series(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    filter_mod_n: float,
+    since: Since | None,
+    downsample: tuple[str, int] | None,
+    unit: str | None = None,
+) -> Response | None:
+    """
+    The raw series from the in-memory hot tier, see hot_tier.py. Returns None if the window isn't
+    all in memory (ex: the hot tier is disabled, or lookback is longer than it keeps), so that it's
+    read from the database instead. Rows are thinned by filter_mod_n like thinned_time_series,
+    unless downsample is given.
+    """
+    window_start = int(time() * 1000) - int(lookback * 3_600_000)
+    if since is not None:
+        window_start = max(window_start, to_epoch_ms(since.floor))
+
+    columns = recent_readings.read(
+        source.data_source,
+        experiment,
+        window_start,
+        unit,
+        1.0 if downsample is not None else filter_mod_n,
+        source.decimals,
+    )
+    if columns is None:
+        return None
+
+    names, timestamps, x, y = columns
+    if since is not None and since.cursors:
+        cursors = {name: to_epoch_ms(since.of(name)) for name in set(names)}
+        keep = x > np.array([cursors[name] for name in names], dtype=np.float64)
+        names = tuple(itertools.compress(names, keep))
+        timestamps = tuple(itertools.compress(timestamps, keep))
+        x, y = x[keep], y[keep]
+
+    payload = series_payload(names, timestamps, x, y, downsample=downsample, since=since)
+    response = jsonify(payload | {"resolution": "raw"})
+    response.headers["X-Hot-Tier"] = "HIT"
+    return response
+
+
+def calibrated_time_series(
+    experiment: str, source: structs.TimeSeriesSource, unit: str | None = None
+) -> Response:
+    """
+    Raw OD readings converted to OD with each unit's active OD calibration, for `calibrate=1`.
+    Series without a calibration for their channel are left as voltages. Responses have the same
+    shape as the other time series, plus `"calibrations": {series: calibration_name}`.
+
+    Rows are read like the uncalibrated series: thinned with `filter_mod_N` (the calibration is
+    applied to each row kept), or downsampled if `downsample` is given. They're never read from
+    rollups, as the calibration of a bucket's mean isn't the mean of the calibrated rows.
+    """
+    args = request.args
+    filter_mod_n = float(args.get("filter_mod_N", 100.0))
+    lookback = float(args.get("lookback", 4.0))
+    since = get_since_parameter(args)
+    downsample = get_downsample_parameters(args)
+
+    shard_units = (
+        [unit]
+        if unit is not None
+        else units_to_shard(experiment, source.data_source, get_parallel_parameter(args))
+    )
+    units, timestamps, x, y = time_series_columns(
+        experiment,
+        source,
+        lookback,
+        since,
+        shard_units,
+        filter_mod_n=filter_mod_n if downsample is None else None,
+    )
+    series = np.asarray(units, dtype=object)
+    slices = split_by_unit(series)
+    names = [series[series_slice.start] for series_slice in slices]
+    calibrations = active_od_calibrations(
+        sorted({name.rpartition("-")[0] for name in names}),
+        current_app.config.get("CALIBRATION_CACHE", DEFAULT_CALIBRATION_CACHE),
+    )
+
+    y_ = np.asarray(y, dtype=np.float64)
+    calibrated = calibrate_series(names, y_, slices, calibrations)
+    payload = series_payload(units, timestamps, x, np.round(y_, source.decimals), downsample, since)
+    return jsonify(payload | {"resolution": "raw", "calibrations": calibrated})
+
+
+def rollups_are_usable(data_source: str) -> bool:
+    """
+    False if the rollups for data_source are missing, still back-filling, or stale (ex: huey isn't running).
+    """
+    try:
+        is_usable = query_app_db(
+            """
+            SELECT 1 FROM ts_rollup_watermarks
+            WHERE data_source=? AND
+                is_caught_up=1 AND
+                updated_at > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?);
+            """,
+            (data_source, f"-{MAX_STALENESS_MINUTES} minutes"),
+            one=True,
+        )
+    except sqlite3.OperationalError:
+        # the rollup tables haven't been created yet.
+        return False
+
+    return is_usable is not None
+
+
+def rollups_cover(data_source: str, unix_time: float) -> bool:
+    """
+    True if the rollups for data_source include all the rows inserted before unix_time: their last
+    update caught up, and ran after it.
+    """
+    try:
+        covers = query_app_db(
+            """
+            SELECT 1 FROM ts_rollup_watermarks
+            WHERE data_source=? AND
+                is_caught_up=1 AND
+                julianday(updated_at) >= julianday(?, 'unixepoch');
+            """,
+            (data_source, unix_time),
+            one=True,
+        )
+    except sqlite3.OperationalError:
+        # the rollup tables haven't been created yet.
+        return False
+
+    return covers is not None
+
+
+def rollup_series_filter(
+    source: structs.TimeSeriesSource, unit: str | None
+) -> tuple[str, tuple[str, ...]]:
+    """
+    SQL (and its args) restricting ts_rollups to one unit's series. Series are either the unit, or
+    unit-channel for sources partitioned by sensor.
+    """
+    if unit is None:
+        return "", ()
+    elif source.unit_expression == "pioreactor_unit":
+        return "series = ? AND", (unit,)
+    else:
+        escaped_unit = "".join(f"[{c}]" if c in "*?[" else c for c in unit)
+        return "series GLOB ? AND", (f"{escaped_unit}-[0-9]",)
+
+
+def rollup_time_series(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    resolution: str,
+    downsample: tuple[str, int] | None = None,
+    unit: str | None = None,
+    transform: t.Callable[[np.ndarray], np.ndarray] | None = None,
+) -> Response | None:
+    """
+    Reads the pre-aggregated buckets maintained by tasks.update_read_models, with each
+    bucket's mean as y. Returns None if this source's rollups aren't usable, in which case the caller
+    should read the raw table instead.
+    """
+    columns = rollup_columns(experiment, source, lookback, resolution, unit)
+    if columns is None:
+        return None
+    payload = series_payload(*columns, downsample, transform=transform)
+    return jsonify(payload | {"resolution": resolution})
+
+
+def rollup_columns(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    resolution: str,
+    unit: str | None = None,
+) -> tuple[tuple, tuple, tuple, tuple] | None:
+    """
+    The (series, bucket start, julian day, mean) columns of the source's rollups, sorted by series,
+    then bucket start. Returns None if they aren't usable, see rollups_are_usable.
+    """
+    if not rollups_are_usable(source.data_source):
+        return None
+
+    units, timestamps, x, y = query_app_db_columns(
+        *rollup_query(experiment, source, lookback, resolution, unit)
+    )
+    return units, timestamps, x, y
+
+
+def rollup_query(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    resolution: str,
+    unit: str | None = None,
+) -> tuple[str, tuple]:
+    """The query of rollup_columns, and its args. Without unit, the query is the same for all sources."""
+    series_filter, series_args = rollup_series_filter(source, unit)
+    return (
+        f"""
+        SELECT series, bucket_start, julianday(bucket_start), round(sum_value / count, ?)
+        FROM ts_rollups
+        WHERE data_source=? AND
+            experiment=? AND
+            resolution=? AND
+            {series_filter}
+            bucket_start > STRFTIME('%Y-%m-%dT%H:%M:%S.000Z', 'NOW', ?)
+        ORDER BY series, bucket_start;
+        """,
+        (
+            source.decimals,
+            source.data_source,
+            experiment,
+            RESOLUTIONS[resolution],
+            *series_args,
+            f"-{lookback} hours",
+        ),
+    )
+
+
+def thinned_time_series(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    filter_mod_n: float,
+    since: Since | None = None,
+    thinning_key: str = "ROWID",
+    units: list[str] | None = None,
+) -> Response:
+    """
+    The default path: keep roughly 1/filter_mod_n rows using the golden-ratio ROWID trick, and have
+    SQLite build the JSON.
+
+    thinning_key is the integer the thinning is keyed on, see TableInfo.thinning_key. If units is
+    given, only those units are read. This lets SQLite use an (experiment, pioreactor_unit,
+    timestamp) index for the timestamp range too, see TableInfo.filter_by_unit.
+
+    The source's fields are interpolated into the SQL: callers must pass trusted or scrubbed values.
+    """
+    unit_filter = ""
+    if units is not None:
+        unit_filter = f"pioreactor_unit IN ({', '.join('?' for _ in units)}) AND"
+    since_sql, since_args = since_filter(source, since)
+
+    r = query_app_db(
+        f"""
+        SELECT
+            json_object(
+                'series', json_group_array(unit),
+                'data', json_group_array(json(data)),
+                'cursor', json_patch(?, json_group_object(unit, max_timestamp)),
+                'resolution', 'raw'
+            ) as json
+        FROM (
+            SELECT
+                {source.unit_expression} as unit,
+                json_group_array(json_object('x', timestamp, 'y', round({source.column}, {source.decimals}))) as data,
+                max(timestamp) as max_timestamp
+            FROM {source.data_source}
+            WHERE experiment=? AND
+                {unit_filter}
+                (({thinning_key} * 0.61803398875) - cast({thinning_key} * 0.61803398875 as int) < 1.0/?) AND
+                timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?) AND
+                {since_sql}
+                {source.column} IS NOT NULL
+            GROUP BY 1
+            );
+        """,
+        (
+            json_encode(next_cursors(since, ())).decode(),
+            experiment,
+            *(units or ()),
+            filter_mod_n,
+            f"-{lookback} hours",
+            *since_args,
+        ),
+        one=True,
+    )
+    assert isinstance(r, dict)
+    return Response(r["json"], mimetype="application/json")
+
+
+def sharded_thinned_time_series(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    filter_mod_n: float,
+    since: Since | None,
+    shard_units: list[str],
+    thinning_key: str = "ROWID",
+) -> Response:
+    """
+    thinned_time_series, but each unit is read by a separate query, in parallel, and the JSON is
+    stitched together afterwards. See thinned_time_series and columnar_time_series for the arguments.
+    """
+    since_sql, since_args = since_filter(source, since)
+    shards = query_app_db_sharded(
+        f"""
+        WITH incrementing_data AS (
+            SELECT
+                {source.unit_expression} as unit,
+                timestamp,
+                {source.column} as data,
+                {thinning_key} as thinning_key
+            FROM {source.data_source}
+            WHERE experiment=? AND
+                pioreactor_unit=? AND
+                timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?) AND
+                {since_sql}
+                {source.column} IS NOT NULL
+        )
+        SELECT unit, json_group_array(json_object('x', timestamp, 'y', round(data, {source.decimals}))), max(timestamp)
+        FROM incrementing_data
+        WHERE ((thinning_key * 0.61803398875) - cast(thinning_key * 0.61803398875 as int) < 1.0/?)
+        GROUP BY 1;
+        """,
+        [
+            (experiment, unit, f"-{lookback} hours", *since_args, filter_mod_n)
+            for unit in shard_units
+        ],
+    )
+    rows = [row for shard in shards for row in shard]
+    cursor = next_cursors(since, ((unit, max_timestamp) for unit, _, max_timestamp in rows))
+    return Response(
+        b'{"series":%s,"data":[%s],"cursor":%s,"resolution":"raw"}'
+        % (
+            json_encode([unit for unit, _, _ in rows]),
+            ",".join(data for _, data, _ in rows).encode(),
+            json_encode(cursor),
+        ),
+        mimetype="application/json",
+    )
+
+
+def streamed_time_series(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    filter_mod_n: float,
+    since: Since | None = None,
+    thinning_key: str = "ROWID",
+    units: list[str] | None = None,
+) -> Response:
+    """
+    thinned_time_series, but rows are read from the cursor in order and the JSON is written in
+    chunks as they are read (see time_series.stream_series_json), so memory stays bounded no matter
+    the lookback, instead of SQLite building the whole response as one string.
+
+    If units is given, each unit is read by its own query, in turn. Series named by the unit are
+    then read in the order of the (experiment, pioreactor_unit, timestamp) index, without a sort.
+    Sources split by channel are sorted one unit at a time.
+
+    The source's fields are interpolated into the SQL: callers must pass trusted or scrubbed values.
+    """
+    in_index_order = units is not None and source.unit_expression == "pioreactor_unit"
+    since_sql, since_args = since_filter(source, since)
+    query = f"""
+        SELECT {source.unit_expression} as unit, timestamp, round({source.column}, {source.decimals})
+        FROM {source.data_source}
+        WHERE experiment=? AND
+            {"pioreactor_unit=? AND" if units is not None else ""}
+            (({thinning_key} * 0.61803398875) - cast({thinning_key} * 0.61803398875 as int) < 1.0/?) AND
+            timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?) AND
+            {since_sql}
+            {source.column} IS NOT NULL
+        ORDER BY {"timestamp" if in_index_order else "1, timestamp"};
+        """
+    query_args: list[tuple]
+    if units is None:
+        query_args = [(experiment, filter_mod_n, f"-{lookback} hours", *since_args)]
+    else:
+        query_args = [
+            (experiment, unit, filter_mod_n, f"-{lookback} hours", *since_args) for unit in units
+        ]
+    rows = itertools.chain.from_iterable(iter_app_db(query, args) for args in query_args)
+    return Response(
+        stream_with_context(stream_series_json(rows, since, resolution="raw")),
+        mimetype="application/json",
+    )
+
+
+def columnar_time_series(
+    experiment: str,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    filter_mod_n: float,
+    since: Since | None = None,
+    downsample: tuple[str, int] | None = None,
+    resolution: str | None = None,
+    thinning_key: str = "ROWID",
+    unit: str | None = None,
+) -> Response:
+    """
+    The application/x-pioreactor-columns version of the time series endpoints (see
+    time_series.encode_columns for the format). SQLite concatenates each unit's epoch milliseconds
+    and values, and NumPy parses them directly, so no Python objects are created per row.
+
+    thinning_key is the integer the filter_mod_N thinning is keyed on. Tables have a ROWID, but
+    views (ex: from plugins) need `row_number() OVER ()`.
+
+    The source's fields are interpolated into the SQL: callers must pass trusted or scrubbed values.
+    """
+    if resolution is not None and rollups_are_usable(source.data_source):
+        series_filter, series_args = rollup_series_filter(source, unit)
+        rows = query_app_db_columns(
+            f"""
+            SELECT series, group_concat(x), group_concat(y), NULL
+            FROM (
+                SELECT
+                    series,
+                    CAST(round((julianday(bucket_start) - 2440587.5) * 86400000.0) AS INTEGER) as x,
+                    sum_value / count as y
+                FROM ts_rollups
+                WHERE data_source=? AND
+                    experiment=? AND
+                    resolution=? AND
+                    {series_filter}
+                    bucket_start > STRFTIME('%Y-%m-%dT%H:%M:%S.000Z', 'NOW', ?)
+            )
+            GROUP BY 1;
+            """,
+            (
+                source.data_source,
+                experiment,
+                RESOLUTIONS[resolution],
+                *series_args,
+                f"-{lookback} hours",
+            ),
+        )
+    else:
+        resolution = "raw"
+        since_sql, since_args = since_filter(source, since)
+        rows = query_app_db_columns(
+            f"""
+            WITH filtered AS (
+                SELECT
+                    {source.unit_expression} as unit,
+                    timestamp,
+                    {source.column} as y,
+                    {thinning_key} as thinning_key
+                FROM {source.data_source}
+                WHERE experiment=? AND
+                    {"pioreactor_unit=? AND" if unit is not None else ""}
+                    timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?) AND
+                    {since_sql}
+                    {source.column} IS NOT NULL
+            )
+            SELECT unit, group_concat(x), group_concat(y), max(timestamp)
+            FROM (
+                SELECT
+                    unit,
+                    timestamp,
+                    CAST(round((julianday(timestamp) - 2440587.5) * 86400000.0) AS INTEGER) as x,
+                    y
+                FROM filtered
+                WHERE ((thinning_key * 0.61803398875) - cast(thinning_key * 0.61803398875 as int) < 1.0/?)
+            )
+            GROUP BY 1;
+            """,
+            (
+                experiment,
+                *((unit,) if unit is not None else ()),
+                f"-{lookback} hours",
+                *since_args,
+                1.0 if downsample is not None else filter_mod_n,
+            ),
+        )
+
+    units, xs, ys, max_timestamps = rows
+    series = []
+    for name, x_csv, y_csv in zip(units, xs, ys):
+        x, y = parse_concatenated_series(x_csv, y_csv, x_dtype=np.int64)
+        if downsample is not None:
+            keep = downsample_indices(x.astype(np.float64), y, *downsample)
+            x, y = x[keep], y[keep]
+        series.append((name, x, y))
+
+    cursor = next_cursors(
+        since, ((name, ts) for name, ts in zip(units, max_timestamps) if ts is not None)
+    )
+    return Response(
+        encode_columns(series, {"cursor": cursor, "resolution": resolution}),
+        mimetype=COLUMNAR_MIMETYPE,
+    )
+
+
+def wants_columnar_response() -> bool:
+    return (
+        request.accept_mimetypes.best_match(["application/json", COLUMNAR_MIMETYPE])
+        == COLUMNAR_MIMETYPE
+    )
+
+
+def cached_time_series_response(data_source: str, compute: t.Callable[[], Response]) -> Response:
+    """
+    Serve the response from the cross-process ResultCache if the same request (path, arguments
+    and response format) was computed recently and data_source hasn't had rows added since.
+    Otherwise compute() it and cache it.
+
+    Polls with `since` aren't cached: they are cheap, and every client's cursor is different.
+    Neither are streamed responses, which would have to be held in memory to be cached.
+    """
+    if "since" in request.args or get_stream_parameter(request.args):
+        return compute()
+
+    try:
+        row = query_app_db(
+            f"SELECT coalesce(max(ROWID), 0) as version FROM {scrub_to_valid(data_source)}",
+            one=True,
+        )
+        assert isinstance(row, dict)
+        version = str(row["version"])
+    except (ValueError, sqlite3.OperationalError):
+        # views don't have a ROWID, and invalid sources are handled (and rejected) by compute.
+        return compute()
+
+    if data_source in BUILTIN_TIME_SERIES:
+        # responses may also be read from the rollups, which change without new raw rows.
+        try:
+            watermark = query_app_db(
+                "SELECT updated_at FROM ts_rollup_watermarks WHERE data_source=?",
+                (data_source,),
+                one=True,
+            )
+        except sqlite3.OperationalError:
+            watermark = None
+        if isinstance(watermark, dict):
+            version += f":{watermark['updated_at']}"
+
+    key = "|".join(
+        (
+            request.path,
+            "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True))),
+            COLUMNAR_MIMETYPE if wants_columnar_response() else "application/json",
+        )
+    )
+    with ResultCache(current_app.config.get("TIME_SERIES_CACHE", DEFAULT_RESULT_CACHE)) as cache:
+        hit = cache.get(key, version)
+        if hit is not None:
+            mimetype, body = hit
+            response = Response(body, mimetype=mimetype)
+            response.vary.add("Accept")
+            response.headers["X-Cache"] = "HIT"
+            return response
+
+        response = compute()
+        if response.status_code == 200:
+            cache.set(key, version, response.mimetype or "application/json", response.get_data())
+            response.vary.add("Accept")
+            response.headers["X-Cache"] = "MISS"
+        return response
+
+
+@api.route("/time_series/cache_stats", methods=["GET"])
+def get_time_series_cache_stats() -> ResponseReturnValue:
+    """Hit and miss counts of the time series result cache, for the process serving this request."""
+    return jsonify(get_result_cache_stats())
+
+
+def time_series_response(
+    experiment: str, source: structs.TimeSeriesSource, unit: str | None = None
+) -> Response:
+    """
+    Shared request handling for the built-in time series endpoints. Responses look like
+
+        {"series": [unit, ...], "data": [[{"x": timestamp, "y": value}, ...], ...], "cursor": timestamp, "resolution": "raw"}
+
+    where `cursor` is the newest timestamp included, to be passed back as `since` on the next poll,
+    and `resolution` is either `raw` or the rollup bucket width that was read.
+
+    Clients that send `Accept: application/x-pioreactor-columns` get the same data as contiguous
+    binary arrays instead, see columnar_time_series.
+
+    If unit is given, only that unit's rows are read.
+
+    Raw OD readings take `calibrate=1` to be converted to OD, see calibrated_time_series.
+    """
+    if request.args.get("calibrate", "0") not in ("0", "false"):
+        if source.data_source != "raw_od_readings":
+            abort(400, "Only raw_od_readings can be calibrated.")
+        # not cached: the calibrations can change without new rows.
+        return calibrated_time_series(experiment, source, unit)
+
+    return cached_time_series_response(
+        source.data_source, lambda: compute_time_series_response(experiment, source, unit)
+    )
+
+
+def compute_time_series_response(
+    experiment: str, source: structs.TimeSeriesSource, unit: str | None = None
+) -> Response:
+    args = request.args
+    filter_mod_n = float(args.get("filter_mod_N", 100.0))
+    lookback = float(args.get("lookback", 4.0))
+    since = get_since_parameter(args)
+    downsample = get_downsample_parameters(args)
+    resolution = get_resolution_parameter(args, source, lookback, since)
+
+    response: Response | None = None
+    if get_encoding_parameter(args) == "change_points":
+        response = change_point_time_series(experiment, source, lookback, since, unit)
+    elif wants_columnar_response():
+        response = columnar_time_series(
+            experiment, source, lookback, filter_mod_n, since, downsample, resolution, unit=unit
+        )
+    elif resolution is not None:
+        response = rollup_time_series(experiment, source, lookback, resolution, downsample, unit)
+    elif not get_stream_parameter(args):
+        response = hot_tier_time_series(
+            experiment, source, lookback, filter_mod_n, since, downsample, unit
+        )
+
+    if response is None:
+        if unit is not None:
+            shard_units = None
+        else:
+            shard_units = units_to_shard(
+                experiment, source.data_source, get_parallel_parameter(args)
+            )
+
+        if downsample is not None:
+            response = downsampled_time_series(
+                experiment,
+                source,
+                lookback,
+                downsample,
+                since,
+                [unit] if unit is not None else shard_units,
+            )
+        elif get_stream_parameter(args):
+            response = streamed_time_series(
+                experiment,
+                source,
+                lookback,
+                filter_mod_n,
+                since,
+                units=[unit]
+                if unit is not None
+                else experiment_units(experiment, source.data_source),
+            )
+        elif shard_units is not None:
+            response = sharded_thinned_time_series(
+                experiment, source, lookback, filter_mod_n, since, shard_units
+            )
+        else:
+            units: list[str] | None
+            if unit is not None:
+                units = [unit]
+            else:
+                units = units_for_index(experiment, get_app_db_table(source.data_source))
+            response = thinned_time_series(
+                experiment, source, lookback, filter_mod_n, since, units=units
+            )
+
+    response.vary.add("Accept")
+    return response
+
+
+@api.route("/experiments/<experiment>/time_series/growth_rates", methods=["GET"])
+def get_growth_rates(experiment: str) -> ResponseReturnValue:
+    """Gets growth rates for all units"""
+    return attach_cache_control(
+        time_series_response(experiment, BUILTIN_TIME_SERIES["growth_rates"])
+    )
+
+
+@api.route("/experiments/<experiment>/time_series/temperature_readings", methods=["GET"])
+def get_temperature_readings(experiment: str) -> ResponseReturnValue:
+    """Gets temperature readings for all units"""
+    return attach_cache_control(
+        time_series_response(experiment, BUILTIN_TIME_SERIES["temperature_readings"])
+    )
+
+
+@api.route("/experiments/<experiment>/time_series/od_readings_filtered", methods=["GET"])
+def get_od_readings_filtered(experiment: str) -> ResponseReturnValue:
+    """Gets normalized od for all units"""
+    return attach_cache_control(
+        time_series_response(experiment, BUILTIN_TIME_SERIES["od_readings_filtered"])
+    )
+
+
+@api.route("/experiments/<experiment>/time_series/od_readings", methods=["GET"])
+def get_od_readings(experiment: str) -> ResponseReturnValue:
+    """Gets raw od for all units"""
+    return attach_cache_control(
+        time_series_response(experiment, BUILTIN_TIME_SERIES["od_readings"])
+    )
+
+
+@api.route("/experiments/<experiment>/time_series/raw_od_readings", methods=["GET"])
+def get_od_raw_readings(experiment: str) -> ResponseReturnValue:
+    """Gets raw od for all units"""
+    return attach_cache_control(
+        time_series_response(experiment, BUILTIN_TIME_SERIES["raw_od_readings"])
+    )
+
+
+@api.route("/experiments/<experiment>/time_series/<data_source>/<column>", methods=["GET"])
+def get_fallback_time_series(experiment: str, data_source: str, column: str) -> ResponseReturnValue:
+    return attach_cache_control(
+        cached_time_series_response(
+            data_source,
+            lambda: compute_fallback_time_series_response(experiment, data_source, column),
+        )
+    )
+
+
+@api.route(
+    "/workers/<pioreactor_unit>/experiments/<experiment>/time_series/<data_source>",
+    methods=["GET"],
+)
+def get_time_series_for_unit(
+    pioreactor_unit: str, experiment: str, data_source: str
+) -> ResponseReturnValue:
+    """
+    A built-in time series (ex: growth_rates), for one unit only. Same parameters and response as
+    /experiments/<experiment>/time_series/<data_source>.
+    """
+    if data_source not in BUILTIN_TIME_SERIES:
+        abort(404, f"{data_source} is not a built-in time series.")
+
+    return attach_cache_control(
+        time_series_response(experiment, BUILTIN_TIME_SERIES[data_source], pioreactor_unit)
+    )
+
+
+@api.route(
+    "/workers/<pioreactor_unit>/experiments/<experiment>/time_series/<data_source>/<column>",
+    methods=["GET"],
+)
+def get_fallback_time_series_for_unit(
+    pioreactor_unit: str, experiment: str, data_source: str, column: str
+) -> ResponseReturnValue:
+    return attach_cache_control(
+        cached_time_series_response(
+            data_source,
+            lambda: compute_fallback_time_series_response(
+                experiment, data_source, column, pioreactor_unit
+            ),
+        )
+    )
+
+
+def compute_fallback_time_series_response(
+    experiment: str, data_source: str, column: str, unit: str | None = None
+) -> Response:
+    args = request.args
+    filter_mod_n = float(args.get("filter_mod_N", 100.0))
+    lookback = float(args.get("lookback", 4.0))
+    since = get_since_parameter(args)
+    downsample = get_downsample_parameters(args)
+
+    # plugins' tables get the same plan as the built-in time series
+    table = get_time_series_table(data_source, column)
+    source = structs.TimeSeriesSource(table.name, scrub_to_valid(column))
+    encoding = get_encoding_parameter(args)
+
+    try:
+        if encoding == "change_points":
+            response = change_point_time_series(experiment, source, lookback, since, unit)
+            response.vary.add("Accept")
+            return response
+        elif wants_columnar_response():
+            response = columnar_time_series(
+                experiment,
+                source,
+                lookback,
+                filter_mod_n,
+                since,
+                downsample,
+                thinning_key=table.thinning_key,
+                unit=unit,
+            )
+            response.vary.add("Accept")
+            return response
+
+        if unit is not None:
+            shard_units = None
+        else:
+            shard_units = units_to_shard(experiment, table.name, get_parallel_parameter(args))
+
+        if downsample is not None:
+            return downsampled_time_series(
+                experiment,
+                source,
+                lookback,
+                downsample,
+                since,
+                [unit] if unit is not None else shard_units,
+            )
+        elif get_stream_parameter(args):
+            units: list[str] | None = None
+            if unit is not None:
+                units = [unit]
+            elif table.has_index_on("experiment", "pioreactor_unit", "timestamp"):
+                units = experiment_units(experiment, table.name)
+            return streamed_time_series(
+                experiment,
+                source,
+                lookback,
+                filter_mod_n,
+                since,
+                thinning_key=table.thinning_key,
+                units=units,
+            )
+        elif shard_units is not None:
+            return sharded_thinned_time_series(
+                experiment,
+                source,
+                lookback,
+                filter_mod_n,
+                since,
+                shard_units,
+                thinning_key=table.thinning_key,
+            )
+        else:
+            return thinned_time_series(
+                experiment,
+                source,
+                lookback,
+                filter_mod_n,
+                since,
+                thinning_key=table.thinning_key,
+                units=[unit] if unit is not None else units_for_index(experiment, table),
+            )
+
+    except Exception as e:
+        publish_to_error_log(str(e), "get_fallback_time_series")
+        abort(400, str(e))
+
+
+def compute_tile(
+    experiment: str, source: structs.TimeSeriesSource, level: int, tile_index: int
+) -> dict[str, t.Any]:
+    """
+    A tile's payload: the built-in series are read from the level's rollups (if usable), other
+    series from the raw table, downsampled to TILE_MAX_POINTS per series. `"complete"` is whether
+    the payload is final: the tile has settled, and the rollups it was read from (if any) were
+    updated since.
+
+    The source's fields are interpolated into the SQL: callers must pass trusted or scrubbed values.
+    """
+    start, end = tile_range(TILE_LEVELS[level], tile_index)
+    settles_at = tile_settles_at(TILE_LEVELS[level], tile_index)
+    complete = settles_at <= time()
+    resolution = TILE_LEVELS[level].resolution
+    if not is_builtin(source) or not rollups_are_usable(source.data_source):
+        resolution = None
+    elif complete:
+        # usable rollups can be a few minutes behind, and buckets of the settled rows still missing.
+        complete = rollups_cover(source.data_source, settles_at)
+
+    if resolution is not None:
+        units, timestamps, x, y = query_app_db_columns(
+            """
+            SELECT series, bucket_start, julianday(bucket_start), round(sum_value / count, ?)
+            FROM ts_rollups
+            WHERE data_source=? AND
+                experiment=? AND
+                resolution=? AND
+                bucket_start >= ? AND
+                bucket_start < ?
+            ORDER BY series, bucket_start;
+            """,
+            (
+                source.decimals,
+                source.data_source,
+                experiment,
+                RESOLUTIONS[resolution],
+                start,
+                end,
+            ),
+        )
+        payload = series_payload(units, timestamps, x, y)
+    else:
+        units_ = units_for_index(experiment, get_app_db_table(source.data_source))
+        unit_filter = ""
+        if units_ is not None:
+            unit_filter = f"pioreactor_unit IN ({', '.join('?' for _ in units_)}) AND"
+        units, timestamps, x, y = query_app_db_columns(
+            f"""
+            SELECT {source.unit_expression} as unit, timestamp, julianday(timestamp), round({source.column}, {source.decimals})
+            FROM {source.data_source}
+            WHERE experiment=? AND
+                {unit_filter}
+                timestamp >= ? AND
+                timestamp < ? AND
+                {source.column} IS NOT NULL
+            ORDER BY 1, timestamp;
+            """,
+            (experiment, *(units_ or ()), start, end),
+        )
+        payload = series_payload(units, timestamps, x, y, ("lttb", TILE_MAX_POINTS))
+
+    return payload | {
+        "resolution": resolution or "raw",
+        "tile": {"level": level, "index": tile_index, "start": start, "end": end},
+        "complete": complete,
+    }
+
+
+def tile_response(
+    experiment: str, source: structs.TimeSeriesSource, level: int, tile_index: int
+) -> Response:
+    """
+    Complete tiles (see tiles.py) are read through the TileCache and served as immutable. Others are
+    computed each time, and cached for a few seconds like the other time series.
+    """
+    if level >= len(TILE_LEVELS):
+        abort(404, f"Tile levels are 0 to {len(TILE_LEVELS) - 1}.")
+    elif tile_index > max_tile_index(TILE_LEVELS[level]):
+        abort(400, f"Tiles of level {level} are 0 to {max_tile_index(TILE_LEVELS[level])}.")
+
+    if not tile_is_complete(TILE_LEVELS[level], tile_index):
+        try:
+            payload = compute_tile(experiment, source, level, tile_index)
+        except sqlite3.OperationalError as e:
+            publish_to_error_log(str(e), "tile_response")
+            abort(400, str(e))
+        return attach_cache_control(jsonify(payload))
+
+    key = "|".join((experiment, source.data_source, source.column, str(level), str(tile_index)))
+    with TileCache(current_app.config.get("TILE_CACHE", DEFAULT_TILE_CACHE)) as cache:
+        body = cache.get(key)
+        if body is None:
+            try:
+                payload = compute_tile(experiment, source, level, tile_index)
+            except sqlite3.OperationalError as e:
+                publish_to_error_log(str(e), "tile_response")
+                abort(400, str(e))
+            if not payload["complete"]:
+                # ex: the rollups haven't been updated since the tile settled.
+                return attach_cache_control(jsonify(payload))
+            body = json_encode(payload)
+            cache.set(key, experiment, body)
+            cache_status = "MISS"
+        else:
+            cache_status = "HIT"
+
+    response = Response(body, mimetype="application/json")
+    response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    response.headers["X-Cache"] = cache_status
+    return response
+
+
+@api.route("/time_series/tile_levels", methods=["GET"])
+def get_tile_levels() -> ResponseReturnValue:
+    """The width (ms) and resolution of each tile level. Tile i covers [i * width, (i + 1) * width)."""
+    return attach_cache_control(
+        jsonify(
+            [
+                {"level": level, "width_ms": width_ms, "resolution": resolution or "raw"}
+                for level, (width_ms, resolution) in enumerate(TILE_LEVELS)
+            ]
+        ),
+        max_age=3600,
+    )
+
+
+@api.route(
+    "/experiments/<experiment>/tiles/<data_source>/<int:level>/<int:tile_index>", methods=["GET"]
+)
+def get_time_series_tile(
+    experiment: str, data_source: str, level: int, tile_index: int
+) -> ResponseReturnValue:
+    """
+    A built-in time series (ex: growth_rates) over one tile, see tiles.py. Responses have the same
+    shape as the time_series endpoints, plus `"tile": {"level", "index", "start", "end"}` and
+    `"complete"`: whether the tile is final, and cached as immutable.
+    """
+    if data_source not in BUILTIN_TIME_SERIES:
+        abort(404, f"{data_source} is not a built-in time series.")
+    return tile_response(experiment, BUILTIN_TIME_SERIES[data_source], level, tile_index)
+
+
+@api.route(
+    "/experiments/<experiment>/tiles/<data_source>/<column>/<int:level>/<int:tile_index>",
+    methods=["GET"],
+)
+def get_fallback_time_series_tile(
+    experiment: str, data_source: str, column: str, level: int, tile_index: int
+) -> ResponseReturnValue:
+    """Like get_time_series_tile, for any time series table and column."""
+    source = get_time_series_source(data_source, column)
+    return tile_response(experiment, source, level, tile_index)
+
+
+def sparklines_response(experiment: str, source: structs.TimeSeriesSource) -> Response:
+    """
+    Renders each series as a small SVG, see sparklines.py. Long lookbacks of the built-in series
+    are read from the rollups, like the time_series endpoints.
+    """
+    args = request.args
+    try:
+        lookback = float(args.get("lookback", 4.0))
+        width = int(args.get("width", DEFAULT_SPARKLINE_WIDTH))
+        height = int(args.get("height", DEFAULT_SPARKLINE_HEIGHT))
+    except ValueError:
+        abort(400, "lookback, width and height must be numbers.")
+    if lookback <= 0:
+        abort(400, "lookback must be positive.")
+    if not (3 <= width <= MAX_SPARKLINE_WIDTH and 3 <= height <= MAX_SPARKLINE_HEIGHT):
+        abort(
+            400,
+            f"width and height must be between 3 and {MAX_SPARKLINE_WIDTH}x{MAX_SPARKLINE_HEIGHT}.",
+        )
+
+    columns = None
+    resolution = None
+    if is_builtin(source):
+        resolution = choose_resolution(lookback)
+    if resolution is not None:
+        columns = rollup_columns(experiment, source, lookback, resolution)
+    if columns is None:
+        resolution = None
+        try:
+            columns = time_series_columns(experiment, source, lookback)
+        except sqlite3.OperationalError as e:
+            publish_to_error_log(str(e), "sparklines_response")
+            abort(400, str(e))
+
+    units, timestamps, x, y = columns
+    series = np.asarray(units, dtype=object)
+    x_ = np.asarray(x, dtype=np.float64)
+    y_ = np.asarray(y, dtype=np.float64)
+    # julian days, like x: the time axis ends now for every series
+    now = time() / 86400 + 2440587.5
+    x_domain = (now - lookback / 24, now)
+
+    sparklines = {}
+    for series_slice in split_by_unit(series):
+        keep = downsample_indices(x_[series_slice], y_[series_slice], "lttb", width)
+        keep += series_slice.start
+        path = sparkline_path(x_[keep], y_[keep], width, height, x_domain)
+        sparklines[series[series_slice.start]] = {
+            "svg": render_sparkline(path, width, height),
+            "last": {"x": timestamps[series_slice.stop - 1], "y": float(y_[series_slice.stop - 1])},
+            "min": float(y_[series_slice].min()),
+            "max": float(y_[series_slice].max()),
+        }
+
+    return jsonify(
+        {
+            "sparklines": sparklines,
+            "lookback": lookback,
+            "width": width,
+            "height": height,
+            "resolution": resolution or "raw",
+        }
+    )
+
+
+@api.route("/experiments/<experiment>/sparklines/<data_source>", methods=["GET"])
+def get_sparklines(experiment: str, data_source: str) -> ResponseReturnValue:
+    """
+    A small SVG of each unit's recent trend of a built-in time series (ex: growth_rates), for pages
+    that show many units. Responses look like
+
+        {"sparklines": {series: {"svg": "<svg ...>", "last": {"x": timestamp, "y": value}, "min": ..., "max": ...}, ...}, "lookback": 4.0, "width": 100, "height": 24, "resolution": "raw"}
+
+    Query parameters:
+
+     - lookback: hours, default 4.
+     - width, height: of each SVG, in pixels. Default is 100 x 24.
+
+    Responses are cached until the source has new rows, like the time_series endpoints.
+    """
+    if data_source not in BUILTIN_TIME_SERIES:
+        abort(404, f"{data_source} is not a built-in time series.")
+    source = BUILTIN_TIME_SERIES[data_source]
+    return attach_cache_control(
+        cached_time_series_response(data_source, lambda: sparklines_response(experiment, source))
+    )
+
+
+@api.route("/experiments/<experiment>/sparklines/<data_source>/<column>", methods=["GET"])
+def get_fallback_sparklines(experiment: str, data_source: str, column: str) -> ResponseReturnValue:
+    """Like get_sparklines, for any time series table and column."""
+    source = get_time_series_source(data_source, column)
+    return attach_cache_control(
+        cached_time_series_response(
+            source.data_source, lambda: sparklines_response(experiment, source)
+        )
+    )
+
+
+@api.route(
+    "/experiments/<experiment>/time_series/<data_source>/<column>/aggregate", methods=["GET"]
+)
+def get_aggregated_time_series(
+    experiment: str, data_source: str, column: str
+) -> ResponseReturnValue:
+    """
+    Per-bucket statistics of each unit's series, instead of the raw points. Responses look like
+
+        {"series": [unit, ...], "data": [[{"x": bucket start, "mean": ..., "max": ...}, ...], ...], "bucket": "10m", "stats": ["mean", "max"]}
+
+    Query parameters:
+
+     - bucket: width of the buckets, like 30s, 10m, 1h or 1d. Buckets are aligned to the epoch. Default is 10m.
+     - stats: comma separated, any of mean, min, max, count, sum, first, last. Default is mean,min,max,count,last.
+     - lookback: hours, default 4.
+    """
+    args = request.args
+    bucket = args.get("bucket", "10m")
+    stats = args.get("stats", "mean,min,max,count,last").split(",")
+
+    try:
+        bucket_ms = parse_bucket(bucket)
+        lookback = float(args.get("lookback", 4.0))
+    except ValueError as e:
+        abort(400, str(e))
+
+    if not all(stat in BUCKET_STATISTICS for stat in stats):
+        abort(400, f"stats must be some of {', '.join(BUCKET_STATISTICS)}")
+
+    source = get_time_series_source(data_source, column)
+
+    try:
+        units, xs, ys = query_app_db_columns(
+            f"""
+            SELECT unit, group_concat(x), group_concat(y)
+            FROM (
+                SELECT
+                    {source.unit_expression} as unit,
+                    CAST(round((julianday(timestamp) - 2440587.5) * 86400000.0) AS INTEGER) as x,
+                    {source.column} as y
+                FROM {source.data_source}
+                WHERE experiment=? AND
+                    timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?) AND
+                    {source.column} IS NOT NULL
+            )
+            GROUP BY 1;
+            """,
+            (experiment, f"-{lookback} hours"),
+        )
+    except Exception as e:
+        publish_to_error_log(str(e), "get_aggregated_time_series")
+        abort(400, str(e))
+
+    data = []
+    for x_csv, y_csv in zip(xs, ys):
+        buckets = bucket_statistics(
+            *parse_concatenated_series(x_csv, y_csv, x_dtype=np.int64), bucket_ms, stats
+        )
+        columns = [("x", to_timestamps(buckets["start"]))] + [
+            (stat, np.round(buckets[stat], source.decimals).tolist()) for stat in stats
+        ]
+        keys = [key for key, _ in columns]
+        data.append([dict(zip(keys, point)) for point in zip(*(values for _, values in columns))])
+
+    return attach_cache_control(
+        jsonify({"series": list(units), "data": data, "bucket": bucket, "stats": stats})
+    )
+
+
+def get_replicate_groups(experiment: str, groups: str | None) -> dict[str, list[str]]:
+    """
+    Parse `groups=control:unit1,unit2;treated:unit3,unit4`, or if that's not given, group the
+    experiment's units by their labels, see time_series.replicate_group.
+    """
+    if groups:
+        try:
+            return {
+                name.strip(): [unit.strip() for unit in units.split(",") if unit.strip()]
+                for name, units in (group.split(":", 1) for group in groups.split(";") if group)
+            }
+        except ValueError:
+            abort(400, "groups must look like name1:unit1,unit2;name2:unit3,unit4")
+
+    labels = query_app_db(
+        "SELECT pioreactor_unit, label FROM pioreactor_unit_labels WHERE experiment=? ORDER BY label",
+        (experiment,),
+    )
+    assert isinstance(labels, list)
+    replicate_groups: dict[str, list[str]] = {}
+    for row in labels:
+        replicate_groups.setdefault(replicate_group(row["label"]), []).append(
+            row["pioreactor_unit"]
+        )
+    return replicate_groups
+
+
+@api.route("/experiments/<experiment>/time_series/<data_source>/<column>/bands", methods=["GET"])
+def get_replicate_bands(experiment: str, data_source: str, column: str) -> ResponseReturnValue:
+    """
+    Statistics across groups of replicate units, per time bucket: mean, sd, and the 10th, 50th and
+    90th percentiles of the units' bucket means, and n, the number of units with data. Responses
+    look like
+
+        {"groups": {name: [unit, ...], ...}, "data": {name: [{"x": bucket start, "mean": ..., "sd": ..., "p10": ..., "p50": ..., "p90": ..., "n": ...}, ...], ...}, "bucket": "10m"}
+
+    For time series with a series per sensor of each unit (ex: od_readings, one per PD channel),
+    each sensor is banded separately, and data's keys are the group's name with the sensor's suffix,
+    like the series' names (ex: `control-2`).
+
+    Query parameters:
+
+     - groups: like `control:unit1,unit2;treated:unit3,unit4`. Default is to group units by their
+       labels, without a trailing replicate number (ex: `control-1` and `control-2`).
+     - bucket: like 30s, 10m, 1h or 1d. Default is 10m.
+     - lookback: hours, default 4.
+    """
+    args = request.args
+    bucket = args.get("bucket", "10m")
+    try:
+        bucket_ms = parse_bucket(bucket)
+        lookback = float(args.get("lookback", 4.0))
+    except ValueError as e:
+        abort(400, str(e))
+
+    source = get_time_series_source(data_source, column)
+    groups = get_replicate_groups(experiment, args.get("groups"))
+    all_units = sorted({unit for units in groups.values() for unit in units})
+
+    try:
+        units, names, xs, ys = query_app_db_columns(
+            f"""
+            SELECT pioreactor_unit, name, group_concat(x), group_concat(y)
+            FROM (
+                SELECT
+                    pioreactor_unit,
+                    {source.unit_expression} as name,
+                    CAST(round((julianday(timestamp) - 2440587.5) * 86400000.0) AS INTEGER) as x,
+                    {source.column} as y
+                FROM {source.data_source}
+                WHERE experiment=? AND
+                    pioreactor_unit IN ({', '.join('?' for _ in all_units)}) AND
+                    timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?) AND
+                    {source.column} IS NOT NULL
+            )
+            GROUP BY 1, 2;
+            """,
+            (experiment, *all_units, f"-{lookback} hours"),
+        )
+    except sqlite3.OperationalError as e:
+        publish_to_error_log(str(e), "get_replicate_bands")
+        abort(400, str(e))
+
+    # series of the same sensor of each unit, ex: {"-2": {"unit1": ..., "unit2": ...}} for od_readings,
+    # as replicates of each other. For tables with a series per unit, the suffix is "".
+    series: dict[str, dict[str, tuple[np.ndarray, np.ndarray]]] = {}
+    for unit, name, x_csv, y_csv in zip(units, names, xs, ys):
+        series.setdefault(name.removeprefix(unit), {})[unit] = parse_concatenated_series(
+            x_csv, y_csv, x_dtype=np.int64
+        )
+
+    data = {}
+    for group, group_units in groups.items():
+        for suffix, replicates in sorted(series.items()) or [("", {})]:
+            bands = replicate_bands(
+                [replicates[unit] for unit in group_units if unit in replicates], bucket_ms
+            )
+            columns = (
+                [("x", to_timestamps(bands["start"]))]
+                + [
+                    (stat, np.round(bands[stat], source.decimals).tolist())
+                    for stat in ("mean", "sd", "p10", "p50", "p90")
+                ]
+                + [("n", bands["n"].tolist())]
+            )
+            keys = [key for key, _ in columns]
+            data[group + suffix] = [
+                dict(zip(keys, point)) for point in zip(*(values for _, values in columns))
+            ]
+
+    return attach_cache_control(jsonify({"groups": groups, "data": data, "bucket": bucket}))
+
+
+@api.route("/time_series/<data_source>/overlay", methods=["GET"])
+def get_overlaid_time_series(data_source: str) -> ResponseReturnValue:
+    """
+    Align several experiments' time series by time since each experiment was created, and resample
+    them onto a common grid, for comparing runs. Responses look like
+
+        {"hours": [0.0, 0.1, ...], "series": [{"experiment": ..., "unit": ...}, ...], "values": [[...], ...]}
+
+    where values[i][j] is series i at hours[j], or null outside of that series' range. Query
+    parameters:
+
+     - experiments: comma separated, required.
+     - units: comma separated, optional. Default is all units.
+     - column: required if data_source isn't a built-in time series (ex: od_readings_filtered).
+     - points: size of the grid, default 720.
+     - max_hours: end of the grid. Default is the longest series.
+
+    Requests matching more than MAX_OVERLAY_SERIES series are rejected, instead of returning only
+    some of them.
+    """
+    args = request.args
+    experiments = [e for e in args.get("experiments", "").split(",") if e]
+    units = [u for u in args.get("units", "").split(",") if u]
+    if not experiments:
+        abort(400, "experiments is required.")
+
+    try:
+        points = min(max(int(args.get("points", DEFAULT_MAX_POINTS)), 2), MAX_POINTS_LIMIT)
+        max_hours = float(args["max_hours"]) if "max_hours" in args else None
+    except ValueError as e:
+        abort(400, str(e))
+
+    source = get_time_series_source(data_source, args.get("column"))
+
+    created_at = query_app_db(
+        f"SELECT experiment, created_at FROM experiments WHERE experiment IN ({', '.join('?' for _ in experiments)})",
+        experiments,
+    )
+    assert isinstance(created_at, list)
+    missing = set(experiments) - {row["experiment"] for row in created_at}
+    if missing:
+        abort(404, f"Experiment(s) not found: {', '.join(sorted(missing))}")
+
+    unit_filter = f"AND d.pioreactor_unit IN ({', '.join('?' for _ in units)})" if units else ""
+    try:
+        series_experiments, series_units, xs, ys = query_app_db_columns(
+            f"""
+            SELECT experiment, unit, group_concat(hours), group_concat(y)
+            FROM (
+                SELECT
+                    d.experiment as experiment,
+                    {source.unit_expression} as unit,
+                    (julianday(d.timestamp) - julianday(e.created_at)) * 24.0 as hours,
+                    d.{source.column} as y
+                FROM {source.data_source} d
+                JOIN experiments e ON e.experiment = d.experiment
+                WHERE d.experiment IN ({', '.join('?' for _ in experiments)})
+                    {unit_filter} AND
+                    d.{source.column} IS NOT NULL
+            )
+            GROUP BY 1, 2
+            LIMIT ?;
+            """,
+            (*experiments, *units, MAX_OVERLAY_SERIES + 1),
+        )
+    except sqlite3.OperationalError as e:
+        publish_to_error_log(str(e), "get_overlaid_time_series")
+        abort(400, str(e))
+
+    if len(series_experiments) > MAX_OVERLAY_SERIES:
+        abort(
+            400,
+            f"More than {MAX_OVERLAY_SERIES} series to overlay. Select fewer experiments or units.",
+        )
+
+    series = [parse_concatenated_series(x_csv, y_csv) for x_csv, y_csv in zip(xs, ys)]
+    if max_hours is None:
+        max_hours = max((x[-1] for x, _ in series if len(x)), default=0.0)
+
+    grid = np.linspace(0.0, max_hours, points)
+    values = np.round([resample(x, y, grid) for x, y in series], source.decimals)
+
+    return attach_cache_control(
+        jsonify(
+            {
+                "hours": np.round(grid, 4).tolist(),
+                "series": [
+                    {"experiment": experiment, "unit": unit}
+                    for experiment, unit in zip(series_experiments, series_units)
+                ],
+                # NaNs are encoded as null
+                "values": values.tolist(),
+            }
+        ),
+        max_age=60,
+    )
+
 
+def chart_lookback(chart: structs.ChartDescriptor) -> float:
+    """
+    Charts' lookbacks are either hours, or a JS expression read from the UI's config, like
+    `parseFloat(config['ui.overview.settings']['raw_od_lookback_hours'])`.
+    """
+    if isinstance(chart.lookback, (int, float)):
+        return float(chart.lookback)
 
-@api.route("/units/<pioreactor_unit>/system_logs", methods=["GET"])
-def get_system_logs_for_unit(pioreactor_unit: str) -> ResponseReturnValue:
-    """Shows system logs from specific unit uses pagination."""
+    try:
+        return float(chart.lookback)
+    except ValueError:
+        pass
 
-    skip = int(request.args.get("skip", 0))
-    min_level = request.args.get("min_level", "INFO")
+    match = re.fullmatch(r"\s*parseFloat\(config\['([^']+)'\]\['([^']+)'\]\)\s*", chart.lookback)
+    if match is None:
+        raise ValueError(f"Can't evaluate lookback `{chart.lookback}` of chart {chart.chart_key}.")
+    # same default as the time_series endpoints.
+    return pioreactor_config.getfloat(match.group(1), match.group(2), fallback=4.0)
 
-    recent_logs = query_app_db(
-        f"""SELECT l.timestamp, l.level, l.pioreactor_unit, l.message, l.task, l.experiment
-            FROM logs AS l
-            WHERE (l.experiment="$experiment")
-                AND (l.pioreactor_unit=? or l.pioreactor_unit=?)
-                AND ({get_level_string(min_level)})
-            ORDER BY l.timestamp DESC LIMIT 50 OFFSET {skip};""",
-        (pioreactor_unit, UNIVERSAL_IDENTIFIER),
-    )
 
-    return jsonify(recent_logs)
+def chart_transformation(
+    chart: structs.ChartDescriptor, decimals: int
+) -> t.Callable[[np.ndarray], np.ndarray] | None:
+    """
+    The chart's y_transformation as a function of y, or None if it's the identity or isn't in the
+    subset of JavaScript we evaluate (see transformations.py). In that case the UI applies it.
+    """
+    try:
+        transformation = compile_transformation(chart.y_transformation or "(y) => y")
+    except ValueError:
+        return None
 
+    if transformation is None:
+        return None
+    evaluate = transformation
+    return lambda y: np.round(evaluate(y), decimals)
 
-@api.route("/units/<pioreactor_unit>/logs", methods=["GET"])
-def get_logs_for_unit(pioreactor_unit: str) -> ResponseReturnValue:
-    """Shows event logs from all units, uses pagination."""
 
-    skip = int(request.args.get("skip", 0))
-    min_level = request.args.get("min_level", "INFO")
+def chart_time_series(
+    experiment: str,
+    chart: structs.ChartDescriptor,
+    source: structs.TimeSeriesSource,
+    lookback: float,
+    downsample: tuple[str, int] | None,
+) -> Response:
+    """
+    The chart's series read from the raw table, with its y_transformation applied if we can
+    evaluate it: those charts' payloads have `"transformed": true`. Charts read from the rollups are
+    read by rollup_charts_time_series.
+    """
+    transform = chart_transformation(chart, source.decimals)
+    if chart.encoding == "change_points":
+        return change_point_time_series(experiment, source, lookback, transform=transform)
+    return downsampled_time_series(experiment, source, lookback, downsample, transform=transform)
 
-    recent_logs = query_app_db(
-        f"""SELECT l.timestamp, level, l.pioreactor_unit, message, task, l.experiment
-            FROM logs AS l
-            WHERE (l.pioreactor_unit=? or l.pioreactor_unit=?)
-            AND ({get_level_string(min_level)})
-            ORDER BY l.timestamp DESC LIMIT 50 OFFSET {skip};""",
-        (pioreactor_unit, UNIVERSAL_IDENTIFIER),
-    )
 
-    return jsonify(recent_logs)
+def rollup_charts_time_series(
+    experiment: str,
+    charts: list[tuple[structs.ChartDescriptor, structs.TimeSeriesSource, float, str]],
+    downsample: tuple[str, int] | None,
+) -> list[bytes]:
+    """
+    The series of each (chart, source, lookback, resolution) read from the rollups, like
+    chart_time_series. All charts' reads are the same query, so they run in parallel on the shard
+    pool (see sharding.py), one chart per shard.
+    """
+    queries = [
+        rollup_query(experiment, source, lookback, resolution)
+        for _, source, lookback, resolution in charts
+    ]
+    if not queries:
+        return []
+
+    shards = query_app_db_sharded(queries[0][0], [args for _, args in queries])
+    bodies = []
+    for (chart, source, _, resolution), rows in zip(charts, shards):
+        units, timestamps, x, y = tuple(zip(*rows)) or ((), (), (), ())
+        payload = series_payload(
+            units,
+            timestamps,
+            x,
+            y,
+            downsample if chart.down_sample else None,
+            transform=chart_transformation(chart, source.decimals),
+        )
+        bodies.append(json_encode(payload | {"resolution": resolution}))
+    return bodies
 
 
-@api.route("/workers/<pioreactor_unit>/experiments/<experiment>/logs", methods=["POST"])
-@api.route("/units/<pioreactor_unit>/experiments/<experiment>/logs", methods=["POST"])
-def publish_new_log(pioreactor_unit: str, experiment: str) -> ResponseReturnValue:
-    body = request.get_json()
-    source_ = body.get("source_", "ui")
+@api.route("/experiments/<experiment>/charts", methods=["GET"])
+def get_charts_time_series(experiment: str) -> ResponseReturnValue:
+    """
+    The time series of several charts (see /api/contrib/charts) in one request. Responses look like
 
-    topic = f"pioreactor/{pioreactor_unit}/{experiment}/logs/{source_}/{body['level'].lower()}"
-    client.publish(
-        topic,
-        msg_to_JSON(
-            msg=body["message"],
-            source=body["source"],
-            level=body["level"].upper(),
-            timestamp=body["timestamp"],
-            task=body["task"] or "",
-        ),
-    )
-    return {"status": "success"}, 202
+        {chart_key: {"series": [...], "data": [...], "cursor": ..., "resolution": ...}, ...}
 
+    with the same per-chart shape as the time_series endpoints. Query parameters:
 
-## Time series data
+     - keys: comma separated chart_keys. Default is all charts.
+     - lookback: hours, overrides each chart's lookback.
+     - downsample, max_points: applied to charts with `down_sample: true`. Default is lttb.
 
+    Charts of built-in series are read from the rollups when they're usable, in parallel on the
+    shard pool: each from its own connection, so an update of the rollups can land between two of
+    them. The other charts are read from the raw tables one after another, from one snapshot of the
+    database, so that they all end at the same rows.
 
-@api.route("/experiments/<experiment>/time_series/growth_rates", methods=["GET"])
-def get_growth_rates(experiment: str) -> ResponseReturnValue:
-    """Gets growth rates for all units"""
+    Charts with `encoding: change_points` are sent as their change points instead, see
+    change_point_time_series.
+    """
     args = request.args
-    filter_mod_n = float(args.get("filter_mod_N", 100.0))
-    lookback = float(args.get("lookback", 4.0))
+    charts = load_chart_descriptors()
 
-    growth_rates = query_app_db(
-        """
-        SELECT
-            json_object('series', json_group_array(unit), 'data', json_group_array(json(data))) as json
-        FROM (
-            SELECT pioreactor_unit as unit,
-                   json_group_array(json_object('x', timestamp, 'y', round(rate, 5))) as data
-            FROM growth_rates
-            WHERE experiment=? AND
-                  ((ROWID * 0.61803398875) - cast(ROWID * 0.61803398875 as int) < 1.0/?) AND
-                  timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?)
-            GROUP BY 1
-            );
-        """,
-        (experiment, filter_mod_n, f"-{lookback} hours"),
-        one=True,
-    )
+    keys = [key for key in args.get("keys", ",".join(charts)).split(",") if key]
+    unknown_keys = [key for key in keys if key not in charts]
+    if unknown_keys:
+        abort(404, f"Unknown chart_key(s): {', '.join(unknown_keys)}")
 
-    assert isinstance(growth_rates, dict)
-    return attach_cache_control(as_json_response(growth_rates["json"]))
+    downsample = get_downsample_parameters(args, default_method="lttb")
 
+    try:
+        lookbacks = {
+            key: float(args["lookback"]) if "lookback" in args else chart_lookback(charts[key])
+            for key in keys
+        }
+    except (ValueError, configparser.Error) as e:
+        abort(400, str(e))
 
-@api.route("/experiments/<experiment>/time_series/temperature_readings", methods=["GET"])
-def get_temperature_readings(experiment: str) -> ResponseReturnValue:
-    """Gets temperature readings for all units"""
-    args = request.args
-    filter_mod_n = float(args.get("filter_mod_N", 100.0))
-    lookback = float(args.get("lookback", 4.0))
+    sources = {
+        key: get_time_series_source(charts[key].data_source, charts[key].data_source_column)
+        for key in keys
+    }
+    rollup_charts = {}
+    for key in keys:
+        resolution = choose_resolution(lookbacks[key])
+        if (
+            charts[key].encoding != "change_points"
+            and is_builtin(sources[key])
+            and resolution is not None
+            and rollups_are_usable(sources[key].data_source)
+        ):
+            rollup_charts[key] = (charts[key], sources[key], lookbacks[key], resolution)
 
-    temperature_readings = query_app_db(
-        """
-        SELECT json_object('series', json_group_array(unit), 'data', json_group_array(json(data))) as json
-        FROM (
-            SELECT
-                pioreactor_unit as unit,
-                json_group_array(json_object('x', timestamp, 'y', round(temperature_c, 2))) as data
-            FROM temperature_readings
-            WHERE experiment=? AND
-                ((ROWID * 0.61803398875) - cast(ROWID * 0.61803398875 as int) < 1.0/?) AND
-                timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW' , ?)
-            GROUP BY 1
-            );
-        """,
-        (experiment, filter_mod_n, f"-{lookback} hours"),
-        one=True,
-    )
+    bodies: dict[str, bytes] = {}
+    try:
+        rollup_bodies = rollup_charts_time_series(
+            experiment, list(rollup_charts.values()), downsample
+        )
+        bodies.update(zip(rollup_charts, rollup_bodies))
+
+        with app_db_read_transaction():
+            for key in keys:
+                if key in bodies:
+                    continue
+                chart = charts[key]
+                response = chart_time_series(
+                    experiment,
+                    chart,
+                    sources[key],
+                    lookbacks[key],
+                    downsample if chart.down_sample else None,
+                )
+                bodies[key] = response.get_data()
+    except Exception as e:
+        publish_to_error_log(str(e), "get_charts_time_series")
+        abort(400, str(e))
 
-    assert isinstance(temperature_readings, dict)
-    return attach_cache_control(as_json_response(temperature_readings["json"]))
+    return attach_cache_control(
+        Response(
+            b"{" + b",".join(json_encode(key) + b":" + bodies[key] for key in keys) + b"}",
+            mimetype="application/json",
+        )
+    )
 
 
-@api.route("/experiments/<experiment>/time_series/od_readings_filtered", methods=["GET"])
-def get_od_readings_filtered(experiment: str) -> ResponseReturnValue:
-    """Gets normalized od for all units"""
-    args = request.args
-    filter_mod_n = float(args.get("filter_mod_N", 100.0))
-    lookback = float(args.get("lookback", 4.0))
+@api.route("/experiments/<experiment>/live", methods=["GET"])
+def stream_live_charts(experiment: str) -> ResponseReturnValue:
+    """
+    Server-sent events of new chart data, from MQTT. Each event is named by its chart_key, and has
+    data like
 
-    filtered_od_readings = query_app_db(
-        """
-        SELECT
-            json_object('series', json_group_array(unit), 'data', json_group_array(json(data))) as json
-        FROM (
-            SELECT
-                pioreactor_unit as unit,
-                json_group_array(json_object('x', timestamp, 'y', round(normalized_od_reading, 7))) as data
-            FROM od_readings_filtered
-            WHERE experiment=? AND
-                ((ROWID * 0.61803398875) - cast(ROWID * 0.61803398875 as int) < 1.0/?) AND
-                timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW', ?)
-            GROUP BY 1
-            );
-        """,
-        (experiment, filter_mod_n, f"-{lookback} hours"),
-        one=True,
-    )
+        {"series": "unit1", "x": timestamp, "y": value}
 
-    assert isinstance(filtered_od_readings, dict)
-    return attach_cache_control(as_json_response(filtered_od_readings["json"]))
+    with the same series names as the time_series endpoints. Viewers share the leader's MQTT
+    subscriptions, so they add no load on the broker or the database. Query parameters:
 
+     - keys: comma separated chart_keys. Default is all charts with an mqtt_topic.
+    """
+    if "+" in experiment or "#" in experiment:
+        abort(400, "experiment can't contain MQTT wildcards.")
+
+    charts = load_chart_descriptors()
+    keys = [key for key in request.args.get("keys", "").split(",") if key] or [
+        key for key, chart in charts.items() if chart.mqtt_topic
+    ]
+    unknown_keys = [key for key in keys if key not in charts]
+    if unknown_keys:
+        abort(404, f"Unknown chart_key(s): {', '.join(unknown_keys)}")
+
+    subscriptions = []  # (topic filter, chart, is_partitioned_by_sensor)
+    for key in keys:
+        chart = charts[key]
+        if not chart.mqtt_topic:
+            abort(400, f"Chart {key} has no mqtt_topic.")
+        builtin = BUILTIN_TIME_SERIES.get(chart.data_source)
+        is_partitioned_by_sensor = (
+            builtin is not None and builtin.unit_expression != "pioreactor_unit"
+        )
+        topics = [chart.mqtt_topic] if isinstance(chart.mqtt_topic, str) else chart.mqtt_topic
+        for topic in topics:
+            subscriptions.append(
+                (f"pioreactor/+/{experiment}/{topic}", chart, is_partitioned_by_sensor)
+            )
 
-@api.route("/experiments/<experiment>/time_series/od_readings", methods=["GET"])
-def get_od_readings(experiment: str) -> ResponseReturnValue:
-    """Gets raw od for all units"""
-    args = request.args
-    filter_mod_n = float(args.get("filter_mod_N", 100.0))
-    lookback = float(args.get("lookback", 4.0))
+    viewer = live_fanout.subscribe(topic_filter for topic_filter, _, _ in subscriptions)
 
-    raw_od_readings = query_app_db(
-        """
-        SELECT
-            json_object('series', json_group_array(unit), 'data', json_group_array(json(data))) as json
-        FROM (
-            SELECT pioreactor_unit || '-' || channel as unit, json_group_array(json_object('x', timestamp, 'y', round(od_reading, 7))) as data
-            FROM od_readings
-            WHERE experiment=? AND
-                ((ROWID * 0.61803398875) - cast(ROWID * 0.61803398875 as int) < 1.0/?) AND
-                timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW',  ?)
-            GROUP BY 1
-            );
-        """,
-        (experiment, filter_mod_n, f"-{lookback} hours"),
-        one=True,
+    def stream() -> t.Iterator[bytes]:
+        try:
+            yield b": connected\n\n"
+            while True:
+                try:
+                    topic, payload = viewer.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield b": keep-alive\n\n"
+                    continue
+
+                for topic_filter, chart, is_partitioned_by_sensor in subscriptions:
+                    if not mqtt.topic_matches_sub(topic_filter, topic):
+                        continue
+                    point = chart_point(chart, is_partitioned_by_sensor, topic, payload)
+                    if point is not None:
+                        yield b"event: %s\ndata: %s\n\n" % (chart.chart_key.encode(), point)
+        finally:
+            # the client disconnected
+            live_fanout.unsubscribe(viewer)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    assert isinstance(raw_od_readings, dict)
-    return attach_cache_control(as_json_response(raw_od_readings["json"]))
 
+@api.route("/experiments/<experiment>/latest", methods=["GET"])
+def get_latest_values(experiment: str) -> ResponseReturnValue:
+    """
+    The latest OD, growth rate, temperature, alt. media fraction and dosing event of each unit, for
+    the overview cards. Responses look like
 
-@api.route("/experiments/<experiment>/time_series/raw_od_readings", methods=["GET"])
-def get_od_raw_readings(experiment: str) -> ResponseReturnValue:
-    """Gets raw od for all units"""
-    args = request.args
-    filter_mod_n = float(args.get("filter_mod_N", 100.0))
-    lookback = float(args.get("lookback", 4.0))
+        {"units": {unit: {metric: {"value": ..., "timestamp": ...}, ...}, ...}}
 
-    raw_od_readings = query_app_db(
-        """
-        SELECT
-            json_object('series', json_group_array(unit), 'data', json_group_array(json(data))) as json
-        FROM (
-            SELECT pioreactor_unit || '-' || channel as unit, json_group_array(json_object('x', timestamp, 'y', round(od_reading, 7))) as data
-            FROM raw_od_readings
-            WHERE experiment=? AND
-                ((ROWID * 0.61803398875) - cast(ROWID * 0.61803398875 as int) < 1.0/?) AND
-                timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW',  ?)
-            GROUP BY 1
-            );
-        """,
-        (experiment, filter_mod_n, f"-{lookback} hours"),
-        one=True,
-    )
+    Read from the latest_values table (see latest_values.py), plus any raw rows added since it was
+    last updated.
+    """
+    rows: list[dict[str, t.Any]] = []
+    try:
+        with app_db_read_transaction():
+            try:
+                stored = query_app_db(
+                    "SELECT pioreactor_unit, metric, timestamp, value FROM latest_values WHERE experiment=?",
+                    (experiment,),
+                )
+                watermarks = query_app_db(
+                    "SELECT data_source, last_rowid FROM latest_values_watermarks WHERE is_caught_up=1"
+                )
+            except sqlite3.OperationalError:
+                # the table hasn't been created yet.
+                stored, watermarks = [], []
+            assert isinstance(stored, list) and isinstance(watermarks, list)
+            rows.extend(stored)
+            last_rowids = {row["data_source"]: row["last_rowid"] for row in watermarks}
+
+            for data_source in LATEST_VALUE_SOURCES:
+                if get_app_db_table(data_source) is None:
+                    continue
+                query, args = latest_values_tail_query(
+                    data_source, experiment, last_rowids.get(data_source)
+                )
+                tail = query_app_db(query, args)
+                assert isinstance(tail, list)
+                rows.extend(tail)
+    except sqlite3.OperationalError as e:
+        publish_to_error_log(str(e), "get_latest_values")
+        abort(400, str(e))
 
-    assert isinstance(raw_od_readings, dict)
-    return attach_cache_control(as_json_response(raw_od_readings["json"]))
+    return attach_cache_control(jsonify({"units": combine_latest_values(rows)}), max_age=2)
 
 
-@api.route("/experiments/<experiment>/time_series/<data_source>/<column>", methods=["GET"])
-def get_fallback_time_series(experiment: str, data_source: str, column: str) -> ResponseReturnValue:
-    args = request.args
-    filter_mod_n = float(args.get("filter_mod_N", 100.0))
-    lookback = float(args.get("lookback", 4.0))
+def dosing_ledger_summaries(experiment: str, windows: list[float]) -> dict[str, dict[str, t.Any]]:
+    """
+    Each unit's summary from the dosing ledger (see dosing_ledger.py), plus any dosing events added
+    since it was last updated.
+    """
+    now = current_utc_datetime()
+    cutoffs = {
+        hours: (now - timedelta(hours=hours)).strftime("%Y-%m-%dT%H:%M:%S.%fZ") for hours in windows
+    }
+    defaults = vial_defaults(pioreactor_config)
 
-    try:
-        data_source = scrub_to_valid(data_source)
-        column = scrub_to_valid(column)
-        r = query_app_db(
-            f"""
-            WITH incrementing_data AS (
-                SELECT pioreactor_unit as unit, timestamp, {column} as data, row_number() OVER () AS row_num
-                FROM {data_source}
-                WHERE experiment=? AND
-                timestamp > STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW',?) AND
-                {column} IS NOT NULL
+    with app_db_read_transaction():
+        try:
+            units = query_app_db(
+                "SELECT DISTINCT pioreactor_unit FROM dosing_ledger WHERE experiment=?",
+                (experiment,),
             )
-            SELECT
-                json_object('series', json_group_array(unit), 'data', json_group_array(json(rdata))) as json
-            FROM (
-                SELECT unit, json_group_array(json_object('x', timestamp, 'y', round(data, 7))) as rdata
-                FROM incrementing_data
-                    WHERE ((row_num * 0.61803398875) - cast(row_num * 0.61803398875 as int) < 1.0/?)
-                GROUP BY 1
-            );
-            """,
-            (experiment, f"-{lookback} hours", filter_mod_n),
-            one=True,
-        )
+            watermark = query_app_db(
+                "SELECT last_rowid FROM dosing_ledger_watermarks WHERE data_source='dosing_events'",
+                one=True,
+            )
+        except sqlite3.OperationalError:
+            # the ledger hasn't been created yet.
+            units, watermark = [], None
+        assert isinstance(units, list)
+        last_rowid = watermark["last_rowid"] if isinstance(watermark, dict) else None
+
+        tails: dict[str, list[tuple]] = {row["pioreactor_unit"]: [] for row in units}
+        if get_app_db_table("dosing_events") is not None:
+            tail = query_app_db(*dosing_ledger_tail_query(experiment, last_rowid))
+            assert isinstance(tail, list)
+            for row in tail:
+                tails.setdefault(row["pioreactor_unit"], []).append(
+                    (
+                        row["timestamp"],
+                        row["event_rowid"],
+                        row["event"],
+                        row["volume_change_ml"],
+                        row["source_of_event"],
+                    )
+                )
 
-    except Exception as e:
-        publish_to_error_log(str(e), "get_fallback_time_series")
-        abort(400, str(e))
+        summaries = {}
+        for unit, unit_tail in sorted(tails.items()):
+            latest: t.Any = None
+            before_windows: dict[float, t.Any] = {}
+            if last_rowid is not None:
+                latest = query_app_db(
+                    DOSING_LEDGER_LATEST_STATE_QUERY, (experiment, unit), one=True
+                )
+                for hours, cutoff in cutoffs.items():
+                    before_windows[hours] = query_app_db(
+                        DOSING_LEDGER_STATE_BEFORE_QUERY, (experiment, unit, cutoff), one=True
+                    )
+            summaries[unit] = summarize_dosing_ledger(
+                latest, before_windows, cutoffs, unit_tail, defaults
+            )
+    return summaries
 
-    assert isinstance(r, dict)
-    return attach_cache_control(as_json_response(r["json"]))
+
+def parse_windows(windows: str) -> list[float]:
+    try:
+        hours = [float(window) for window in windows.split(",")]
+    except ValueError:
+        abort(400, f"Invalid window `{windows}`: expected hours, like 3 or 1,3,24.")
+    if not hours or not all(0 < window <= 24 * 365 for window in hours):
+        abort(400, f"Invalid window `{windows}`: expected hours, like 3 or 1,3,24.")
+    return hours
+
+
+@api.route("/experiments/<experiment>/dashboard", methods=["GET"])
+def get_dashboard_snapshot(experiment: str) -> ResponseReturnValue:
+    """
+    The experiment overview's payloads (charts, latest values, media rates, recent logs), as
+    precomputed by a periodic task (see snapshots.py), so viewers don't query the database. Responses
+    look like
+
+        {"computed_at": timestamp, "age_seconds": ..., "payloads": {"charts": ..., ...}}
+
+    with each payload as returned by its own endpoint. 404 if the experiment has no snapshot (ex: no
+    assigned workers, or the task hasn't run yet), in which case request the endpoints themselves.
+    """
+    snapshot = read_snapshot(
+        experiment, current_app.config.get("DASHBOARD_SNAPSHOTS", DEFAULT_DASHBOARD_SNAPSHOTS)
+    )
+    if snapshot is None:
+        abort(404, f"No dashboard snapshot of experiment {experiment}.")
+
+    computed_at, body = snapshot
+    age = max(time() - computed_at, 0.0)
+    response = Response(
+        b'{"computed_at":%s,"age_seconds":%s,"payloads":%s}'
+        % (
+            json_encode(
+                datetime.fromtimestamp(computed_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            ),
+            json_encode(round(age, 3)),
+            body,
+        ),
+        mimetype="application/json",
+    )
+    response.headers["Age"] = str(int(age))
+    return attach_cache_control(response, max_age=5)
 
 
 @api.route("/experiments/<experiment>/media_rates", methods=["GET"])
 def get_media_rates(experiment: str) -> ResponseReturnValue:
     """
-    Shows amount of added media per unit. Note that it only consider values from a dosing automation (i.e. not manual dosing, which includes continously dose)
-
+    Shows amount of added media per unit (ml/h), over the last `window` hours (default 3). Read
+    from the dosing ledger (see dosing_ledger.py), not from a scan of the window's dosing events.
     """
-    ## this one confusing
+    window = parse_windows(request.args.get("window", "3"))[0]
 
     try:
-        rows = query_app_db(
-            """
-            SELECT
-                d.pioreactor_unit,
-                SUM(CASE WHEN event='add_media' THEN volume_change_ml ELSE 0 END) / 3 AS mediaRate,
-                SUM(CASE WHEN event='add_alt_media' THEN volume_change_ml ELSE 0 END) / 3 AS altMediaRate
-            FROM dosing_events AS d
-            WHERE
-                datetime(d.timestamp) >= datetime('now', '-3 hours') AND
-                event IN ('add_alt_media', 'add_media') AND
-                experiment = ?
-            GROUP BY d.pioreactor_unit;
-            """,
-            (experiment,),
-        )
-        assert isinstance(rows, list)
-        json_result: dict[str, dict[str, float]] = {}
-        aggregate: dict[str, float] = {"altMediaRate": 0.0, "mediaRate": 0.0}
+        summaries = dosing_ledger_summaries(experiment, [window])
+    except sqlite3.OperationalError as e:
+        publish_to_error_log(str(e), "get_media_rates")
+        abort(500, str(e))
 
-        for row in rows:
-            json_result[row["pioreactor_unit"]] = {
-                "altMediaRate": float(row["altMediaRate"]),
-                "mediaRate": float(row["mediaRate"]),
-            }
-            aggregate["mediaRate"] = aggregate["mediaRate"] + float(row["mediaRate"])
-            aggregate["altMediaRate"] = aggregate["altMediaRate"] + float(row["altMediaRate"])
+    json_result: dict[str, dict[str, float]] = {}
+    aggregate: dict[str, float] = {"altMediaRate": 0.0, "mediaRate": 0.0}
+    for unit, summary in summaries.items():
+        rates = summary["rates"][f"{window:g}"]
+        if rates["media_ml_per_hour"] == 0 and rates["alt_media_ml_per_hour"] == 0:
+            # like before, only units that dosed in the window
+            continue
+        json_result[unit] = {
+            "altMediaRate": rates["alt_media_ml_per_hour"],
+            "mediaRate": rates["media_ml_per_hour"],
+        }
+        aggregate["mediaRate"] = aggregate["mediaRate"] + rates["media_ml_per_hour"]
+        aggregate["altMediaRate"] = aggregate["altMediaRate"] + rates["alt_media_ml_per_hour"]
+
+    json_result["all"] = aggregate
+    return attach_cache_control(jsonify(json_result))
+
+
+@api.route("/experiments/<experiment>/dosing_ledger", methods=["GET"])
+def get_dosing_ledger(experiment: str) -> ResponseReturnValue:
+    """
+    Each unit's cumulative media, alt. media and waste (ml), current estimated liquid volume and
+    alt. media fraction, and rates (ml/h) over each of `window` (hours, comma-separated, default
+    1,3,24). Responses look like
+
+        {"units": {unit: {"timestamp": ..., "media_ml": ..., "alt_media_ml": ..., "waste_ml": ...,
+                          "liquid_volume_ml": ..., "alt_media_fraction": ...,
+                          "rates": {"3": {"media_ml_per_hour": ..., ...}, ...}}, ...}}
+    """
+    windows = parse_windows(request.args.get("window", "1,3,24"))
 
-        json_result["all"] = aggregate
-        return attach_cache_control(jsonify(json_result))
+    try:
+        summaries = dosing_ledger_summaries(experiment, windows)
+    except sqlite3.OperationalError as e:
+        publish_to_error_log(str(e), "get_dosing_ledger")
+        abort(400, str(e))
 
-    except Exception as e:
-        publish_to_error_log(str(e), "get_media_rates")
-        abort(500, str(e))
+    return attach_cache_control(jsonify({"units": summaries}), max_age=5)
 
 
 ## CALIBRATIONS
@@ -859,6 +3052,24 @@ def get_calibration(pioreactor_unit, device, cal_name) -> ResponseReturnValue:
     return create_task_response(task)
 
 
+def change_calibrations(
+    pioreactor_unit: str, method: str, endpoint: str, json: dict | None = None
+) -> Result:
+    """
+    Send a request that changes calibrations to one worker, or to all of them, and forget the
+    leader's cached active calibrations of those units once it's done.
+    """
+    is_broadcast = pioreactor_unit == UNIVERSAL_IDENTIFIER
+    return tasks.change_calibrations_across_cluster(
+        method,
+        endpoint,
+        get_all_workers() if is_broadcast else [pioreactor_unit],
+        json,
+        invalidate_all=is_broadcast,
+        cache_path=str(current_app.config.get("CALIBRATION_CACHE", DEFAULT_CALIBRATION_CACHE)),
+    )
+
+
 @api.route("/workers/<pioreactor_unit>/calibrations/<device>", methods=["POST"])
 def create_calibration(pioreactor_unit, device) -> ResponseReturnValue:
     yaml_data = request.get_json()["calibration_data"]
@@ -875,45 +3086,32 @@ def create_calibration(pioreactor_unit, device) -> ResponseReturnValue:
             description=f"YAML data is not correct, or required calibration struct missing: {str(e)}",
         )
 
-    if pioreactor_unit == UNIVERSAL_IDENTIFIER:
-        task = broadcast_post_across_cluster(f"/unit_api/calibrations/{device}", request.get_json())
-    else:
-        task = tasks.multicast_post_across_cluster(
-            f"/unit_api/calibrations/{device}", [pioreactor_unit], request.get_json()
-        )
+    # this may overwrite an active calibration
+    task = change_calibrations(
+        pioreactor_unit, "POST", f"/unit_api/calibrations/{device}", request.get_json()
+    )
     return create_task_response(task)
 
 
 @api.route("/workers/<pioreactor_unit>/active_calibrations/<device>/<cal_name>", methods=["PATCH"])
 def set_active_calibration(pioreactor_unit, device, cal_name) -> ResponseReturnValue:
-    if pioreactor_unit == UNIVERSAL_IDENTIFIER:
-        task = broadcast_patch_across_cluster(f"/unit_api/active_calibrations/{device}/{cal_name}")
-    else:
-        task = tasks.multicast_patch_across_cluster(
-            f"/unit_api/active_calibrations/{device}/{cal_name}", [pioreactor_unit]
-        )
+    task = change_calibrations(
+        pioreactor_unit, "PATCH", f"/unit_api/active_calibrations/{device}/{cal_name}"
+    )
     return create_task_response(task)
 
 
 @api.route("/workers/<pioreactor_unit>/active_calibrations/<device>", methods=["DELETE"])
 def remove_active_status_calibration(pioreactor_unit, device) -> ResponseReturnValue:
-    if pioreactor_unit == UNIVERSAL_IDENTIFIER:
-        task = broadcast_delete_across_cluster(f"/unit_api/active_calibrations/{device}")
-    else:
-        task = tasks.multicast_delete_across_cluster(
-            f"/unit_api/active_calibrations/{device}", [pioreactor_unit]
-        )
+    task = change_calibrations(pioreactor_unit, "DELETE", f"/unit_api/active_calibrations/{device}")
     return create_task_response(task)
 
 
 @api.route("/workers/<pioreactor_unit>/calibrations/<device>/<cal_name>", methods=["DELETE"])
 def delete_calibration(pioreactor_unit, device, cal_name) -> ResponseReturnValue:
-    if pioreactor_unit == UNIVERSAL_IDENTIFIER:
-        task = broadcast_delete_across_cluster(f"/unit_api/calibrations/{device}/{cal_name}")
-    else:
-        task = tasks.multicast_delete_across_cluster(
-            f"/unit_api/calibrations/{device}/{cal_name}", [pioreactor_unit]
-        )
+    task = change_calibrations(
+        pioreactor_unit, "DELETE", f"/unit_api/calibrations/{device}/{cal_name}"
+    )
     return create_task_response(task)
 
 
@@ -1157,25 +3355,26 @@ def get_job_contrib() -> ResponseReturnValue:
         abort(400, str(e))
 
 
+def load_chart_descriptors() -> dict[str, structs.ChartDescriptor]:
+    chart_path_default = Path(env["WWW"]) / "contrib" / "charts"
+    chart_path_plugins = Path(env["DOT_PIOREACTOR"]) / "plugins" / "ui" / "contrib" / "charts"
+    files = sorted(chart_path_default.glob("*.y*ml")) + sorted(chart_path_plugins.glob("*.y*ml"))
+
+    # we dedup based on chart 'chart_key'.
+    parsed_yaml = {}
+    for file in files:
+        try:
+            decoded_yaml = yaml_decode(file.read_bytes(), type=structs.ChartDescriptor)
+            parsed_yaml[decoded_yaml.chart_key] = decoded_yaml
+        except (ValidationError, DecodeError) as e:
+            publish_to_error_log(f"Yaml error in {Path(file).name}: {e}", "get_charts_contrib")
+    return parsed_yaml
+
+
 @api.route("/contrib/charts", methods=["GET"])
 def get_charts_contrib() -> ResponseReturnValue:
     try:
-        chart_path_default = Path(env["WWW"]) / "contrib" / "charts"
-        chart_path_plugins = Path(env["DOT_PIOREACTOR"]) / "plugins" / "ui" / "contrib" / "charts"
-        files = sorted(chart_path_default.glob("*.y*ml")) + sorted(
-            chart_path_plugins.glob("*.y*ml")
-        )
-
-        # we dedup based on chart 'chart_key'.
-        parsed_yaml = {}
-        for file in files:
-            try:
-                decoded_yaml = yaml_decode(file.read_bytes(), type=structs.ChartDescriptor)
-                parsed_yaml[decoded_yaml.chart_key] = decoded_yaml
-            except (ValidationError, DecodeError) as e:
-                publish_to_error_log(f"Yaml error in {Path(file).name}: {e}", "get_charts_contrib")
-
-        return attach_cache_control(jsonify(list(parsed_yaml.values())))
+        return attach_cache_control(jsonify(list(load_chart_descriptors().values())))
 
     except Exception as e:
         publish_to_error_log(str(e), "get_charts_contrib")
@@ -1363,6 +3562,9 @@ def create_experiment() -> ResponseReturnValue:
 @api.route("/experiments/<experiment>", methods=["DELETE"])
 def delete_experiment(experiment: str) -> ResponseReturnValue:
     row_count = modify_app_db("DELETE FROM experiments WHERE experiment=?;", (experiment,))
+    # a new experiment with the same name must not be served these tiles.
+    with TileCache(current_app.config.get("TILE_CACHE", DEFAULT_TILE_CACHE)) as cache:
+        cache.delete_experiment(experiment)
     broadcast_post_across_cluster("/unit_api/jobs/stop", params={"experiment": experiment})
 
     if row_count > 0:
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Convert raw OD readings (voltages) into OD with each unit's active OD calibration, on the leader.
+
+Active calibrations live on the workers (see unit_api's /active_calibrations), so the leader keeps
+a copy of each unit's response in a ResultCache. Entries are deleted once a calibration was set,
+unset or deleted through the leader's API (see tasks.change_calibrations_across_cluster), and
+otherwise expire after TTL_SECONDS, for calibrations changed on the worker itself (ex: with the
+CLI).
+
+Refreshing an expired entry waits at most FETCH_TIMEOUT_SECONDS for the workers. Units that don't
+answer in time keep their expired entry (up to STALE_SECONDS old), so a slow worker delays a
+request by a few seconds at most, and doesn't make its series lose their calibration.
+"""
+from __future__ import annotations
+
+import typing as t
+from pathlib import Path
+
+import numpy as np
+from huey.exceptions import HueyException
+from huey.exceptions import TaskException
+from msgspec import DecodeError
+from msgspec import ValidationError
+from msgspec.json import decode
+from msgspec.json import encode
+from pioreactor import exc
+from pioreactor.structs import ODCalibration
+
+from . import tasks
+from .config import CACHE_DIR
+from .result_cache import ResultCache
+
+DEFAULT_PATH = CACHE_DIR / "active_calibrations.sqlite"
+TTL_SECONDS = 60.0
+STALE_SECONDS = 24 * 3600.0
+# each worker's request, and the whole multicast, including waiting for a huey worker.
+WORKER_TIMEOUT_SECONDS = 2.0
+FETCH_TIMEOUT_SECONDS = 4.0
+# points the calibration curve is evaluated at, to find each voltage's initial OD guess.
+GRID_SIZE = 1025
+
+stats = {"hits": 0, "misses": 0}
+
+
+def fetch_active_calibrations(units: list[str]) -> dict[str, dict | None]:
+    """
+    Each unit's response from /unit_api/active_calibrations, or None if the unit didn't respond.
+    """
+    try:
+        return tasks.multicast_get_across_cluster(
+            "/unit_api/active_calibrations", units, timeout=WORKER_TIMEOUT_SECONDS
+        ).get(blocking=True, timeout=FETCH_TIMEOUT_SECONDS)
+    except (HueyException, TaskException):
+        return {unit: None for unit in units}
+
+
+def active_od_calibrations(
+    units: list[str], path: Path | str = DEFAULT_PATH
+) -> dict[str, ODCalibration]:
+    """
+    The active OD calibration of each unit that has one. Units whose cache entry expired, and that
+    don't answer in time, get their previous calibration.
+    """
+    responses: dict[str, bytes] = {}
+    with ResultCache(
+        path, ttl_seconds=TTL_SECONDS, stats=stats, keep_stale_seconds=STALE_SECONDS
+    ) as cache:
+        for unit in units:
+            hit = cache.get(unit, "")
+            if hit is not None:
+                responses[unit] = hit[1]
+
+        missing = [unit for unit in units if unit not in responses]
+        if missing:
+            for unit, response in fetch_active_calibrations(missing).items():
+                if response is None:
+                    # not refreshed: try again on the next request
+                    stale = cache.get_stale(unit)
+                    if stale is not None:
+                        responses[unit] = stale[1]
+                    continue
+                responses[unit] = encode(response)
+                cache.set(unit, "", "application/json", responses[unit])
+
+    calibrations = {}
+    for unit, body in responses.items():
+        try:
+            od_calibration = decode(body).get("od")
+            if od_calibration is not None:
+                calibrations[unit] = decode(encode(od_calibration), type=ODCalibration)
+        except (DecodeError, ValidationError, AttributeError):
+            continue
+    return calibrations
+
+
+def invalidate_active_calibrations(
+    units: list[str] | None = None, path: Path | str = DEFAULT_PATH
+) -> None:
+    """Forget the cached calibrations of units, or of all units if units is None."""
+    with ResultCache(
+        path, ttl_seconds=TTL_SECONDS, stats=stats, keep_stale_seconds=STALE_SECONDS
+    ) as cache:
+        cache.delete(units)
+
+
+def voltages_to_od(calibration: ODCalibration, voltages: np.ndarray) -> np.ndarray:
+    """
+    Invert the calibration curve (OD -> voltage) over a whole array of voltages. Like the od_reading
+    job, ODs are trimmed to the calibration's recorded OD range.
+
+    Curves that are monotonic over the recorded range (the usual case) are inverted by interpolating
+    along the curve evaluated on a grid, then refined with Newton steps. Other curves fall back to
+    solving for each distinct voltage, like the od_reading job does.
+    """
+    if calibration.curve_type != "poly" or not calibration.curve_data_:
+        raise ValueError(f"Can't apply calibration {calibration.calibration_name}.")
+
+    poly = np.asarray(calibration.curve_data_, dtype=np.float64)
+    recorded_od = calibration.recorded_data["x"]
+    if not recorded_od:
+        raise ValueError(f"Calibration {calibration.calibration_name} has no recorded data.")
+    min_od, max_od = float(min(recorded_od)), float(max(recorded_od))
+
+    grid = np.linspace(min_od, max_od, GRID_SIZE)
+    curve = np.polyval(poly, grid)
+    slopes = np.diff(curve)
+
+    if np.all(slopes > 0) or np.all(slopes < 0):
+        if slopes[0] < 0:
+            grid, curve = grid[::-1], curve[::-1]
+        od = np.interp(voltages, curve, grid)  # voltages off the curve are trimmed to the range
+
+        derivative = np.polyder(poly)
+        with np.errstate(all="ignore"):
+            for _ in range(2):
+                step = (np.polyval(poly, od) - voltages) / np.polyval(derivative, od)
+                od = np.clip(od - np.where(np.isfinite(step), step, 0.0), min_od, max_od)
+        return od
+
+    def solve(voltage: float) -> float:
+        try:
+            return calibration.y_to_x(voltage, enforce_bounds=True)
+        except exc.SolutionBelowDomainError:
+            return min_od
+        except exc.SolutionAboveDomainError:
+            return max_od
+        except exc.NoSolutionsFoundError:
+            if voltage <= min(calibration.recorded_data["y"]):
+                return min_od
+            elif voltage > max(calibration.recorded_data["y"]):
+                return max_od
+            return np.nan
+
+    distinct, inverse = np.unique(voltages, return_inverse=True)
+    return np.array([solve(float(v)) for v in distinct], dtype=np.float64)[inverse]
+
+
+def calibrate_series(
+    series: t.Iterable[str],
+    y: np.ndarray,
+    slices: list[slice],
+    calibrations: dict[str, ODCalibration],
+) -> dict[str, str]:
+    """
+    Calibrate, in place, each unit-channel series of y that has a calibration for its channel.
+    Returns {series: calibration name} of the calibrated series.
+    """
+    calibrated = {}
+    for name, series_slice in zip(series, slices):
+        unit, _, channel = name.rpartition("-")
+        calibration = calibrations.get(unit)
+        if calibration is None or calibration.pd_channel != channel:
+            continue
+        y[series_slice] = voltages_to_od(calibration, y[series_slice])
+        calibrated[name] = calibration.calibration_name
+    return calibrated
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+A running ledger of each unit's dosing: after every dosing event, the cumulative media, alt. media
+and waste pumped, and the estimated liquid volume and alt. media fraction, see
+/api/experiments/<experiment>/dosing_ledger and /api/experiments/<experiment>/media_rates.
+
+The ledger is maintained incrementally by a periodic huey task (see tasks.py), from dosing_events'
+ROWIDs like the rollups. Volumes and fractions follow the same rules as the dosing automations'
+calculators. Events usually arrive in order, so each run only appends, but a late event (with an
+older timestamp) makes its unit's ledger be recomputed from that event onwards.
+
+Rates over a window are then the difference of two cumulative sums, each found by one index
+lookup, instead of summing the window's events.
+"""
+from __future__ import annotations
+
+import sqlite3
+import typing as t
+
+from .watermarks import CREATE_WATERMARKS_TABLE
+from .watermarks import fetch_all
+from .watermarks import next_batch
+from .watermarks import save_watermark
+
+# max number of new dosing events that one update will read. Bounds the back-fill.
+BATCH_SIZE = 50_000
+
+# applied by schema.apply_schema_changes
+CREATE_DOSING_LEDGER_TABLES = f"""
+    CREATE TABLE IF NOT EXISTS dosing_ledger (
+        experiment         TEXT NOT NULL,
+        pioreactor_unit    TEXT NOT NULL,
+        timestamp          TEXT NOT NULL,
+        event_rowid        INTEGER NOT NULL, -- ROWID in dosing_events
+        event              TEXT NOT NULL,
+        volume_change_ml   REAL NOT NULL,
+        source_of_event    TEXT,
+        media_ml           REAL NOT NULL,    -- cumulative, including this event
+        alt_media_ml       REAL NOT NULL,
+        waste_ml           REAL NOT NULL,
+        liquid_volume_ml   REAL NOT NULL,    -- estimated, after this event
+        alt_media_fraction REAL NOT NULL,
+        PRIMARY KEY (experiment, pioreactor_unit, timestamp, event_rowid)
+    ) WITHOUT ROWID;
+
+    {CREATE_WATERMARKS_TABLE.format(table='dosing_ledger_watermarks')}
+"""
+
+LEDGER_COLUMNS = (
+    "experiment",
+    "pioreactor_unit",
+    "timestamp",
+    "event_rowid",
+    "event",
+    "volume_change_ml",
+    "source_of_event",
+    "media_ml",
+    "alt_media_ml",
+    "waste_ml",
+    "liquid_volume_ml",
+    "alt_media_fraction",
+)
+
+
+class LedgerState(t.NamedTuple):
+    media_ml: float
+    alt_media_ml: float
+    waste_ml: float
+    liquid_volume_ml: float
+    alt_media_fraction: float
+
+
+class VialDefaults(t.NamedTuple):
+    # from the [bioreactor] section of the config
+    initial_volume_ml: float = 14.0
+    max_volume_ml: float = 14.0
+    initial_alt_media_fraction: float = 0.0
+
+    def initial_state(self) -> LedgerState:
+        return LedgerState(0.0, 0.0, 0.0, self.initial_volume_ml, self.initial_alt_media_fraction)
+
+
+def vial_defaults(config) -> VialDefaults:
+    return VialDefaults(
+        initial_volume_ml=config.getfloat("bioreactor", "initial_volume_ml", fallback=14.0),
+        max_volume_ml=config.getfloat("bioreactor", "max_volume_ml", fallback=14.0),
+        initial_alt_media_fraction=config.getfloat(
+            "bioreactor", "initial_alt_media_fraction", fallback=0.0
+        ),
+    )
+
+
+def apply_event(
+    state: LedgerState,
+    event: str,
+    volume_ml: float,
+    source_of_event: str | None,
+    max_volume_ml: float,
+) -> LedgerState:
+    """
+    The state after one dosing event, with the same rules as pioreactor's ThroughputCalculator,
+    LiquidVolumeCalculator and AltMediaFractionCalculator.
+    """
+    media, alt_media, waste, volume, fraction = state
+
+    if event == "remove_waste":
+        waste += volume_ml
+        if source_of_event == "manually":
+            volume = max(volume - volume_ml, 0.0)
+        elif volume > max_volume_ml:
+            # only what's above the outflow tube is removed.
+            volume = max(volume - volume_ml, max_volume_ml, 0.0)
+        return LedgerState(media, alt_media, waste, volume, fraction)
+
+    if event == "add_alt_media":
+        alt_media += volume_ml
+        alt_media_added = volume_ml
+    else:
+        # other additions, ex: add_salty_media, dilute the alt. media like media does.
+        if event == "add_media":
+            media += volume_ml
+        alt_media_added = 0.0
+
+    if volume + volume_ml > 0:
+        fraction = min(max((fraction * volume + alt_media_added) / (volume + volume_ml), 0.0), 1.0)
+    volume = max(volume + volume_ml, 0.0)
+    return LedgerState(media, alt_media, waste, volume, fraction)
+
+
+def update_dosing_ledger(con: sqlite3.Connection, defaults: VialDefaults = VialDefaults()) -> int:
+    """
+    Add any new dosing events to the ledger. Returns the number of events processed.
+    """
+
+    batch = next_batch(con, "dosing_ledger_watermarks", "dosing_events", BATCH_SIZE)
+    if batch is None:
+        # table doesn't exist on this leader (yet).
+        return 0
+
+    with con:
+        if batch.restarted:
+            con.execute("DELETE FROM dosing_ledger")
+
+        new_events: dict[tuple[str, str], list[tuple]] = {}
+        for experiment, unit, timestamp, rowid, event, volume, source in fetch_all(
+            con,
+            """
+            SELECT experiment, pioreactor_unit, timestamp, ROWID, event, volume_change_ml, source_of_event
+            FROM dosing_events
+            WHERE ROWID > ? AND ROWID <= ?
+            """,
+            (batch.last_rowid, batch.upper_rowid),
+        ):
+            new_events.setdefault((experiment, unit), []).append(
+                (timestamp, rowid, event, volume, source)
+            )
+
+        for (experiment, unit), events in new_events.items():
+            since = min(events)[:2]  # (timestamp, rowid) of the earliest new event
+
+            previous = fetch_all(
+                con,
+                """
+                SELECT media_ml, alt_media_ml, waste_ml, liquid_volume_ml, alt_media_fraction
+                FROM dosing_ledger
+                WHERE experiment=? AND pioreactor_unit=? AND (timestamp, event_rowid) < (?, ?)
+                ORDER BY timestamp DESC, event_rowid DESC
+                LIMIT 1
+                """,
+                (experiment, unit, *since),
+            )
+            state = LedgerState(*previous[0]) if previous else defaults.initial_state()
+
+            # events already in the ledger, after a late one, are recomputed.
+            later = fetch_all(
+                con,
+                """
+                SELECT timestamp, event_rowid, event, volume_change_ml, source_of_event
+                FROM dosing_ledger
+                WHERE experiment=? AND pioreactor_unit=? AND (timestamp, event_rowid) >= (?, ?)
+                """,
+                (experiment, unit, *since),
+            )
+
+            rows = []
+            for timestamp, rowid, event, volume, source in sorted(events + later):
+                state = apply_event(state, event, volume, source, defaults.max_volume_ml)
+                rows.append((experiment, unit, timestamp, rowid, event, volume, source, *state))
+
+            con.executemany(
+                f"""
+                INSERT OR REPLACE INTO dosing_ledger ({', '.join(LEDGER_COLUMNS)})
+                VALUES ({', '.join('?' for _ in LEDGER_COLUMNS)})
+                """,
+                rows,
+            )
+
+        save_watermark(con, "dosing_ledger_watermarks", "dosing_events", batch)
+
+    return batch.size
+
+
+LATEST_STATE_QUERY = """
+    SELECT timestamp, media_ml, alt_media_ml, waste_ml, liquid_volume_ml, alt_media_fraction
+    FROM dosing_ledger
+    WHERE experiment=? AND pioreactor_unit=?
+    ORDER BY timestamp DESC, event_rowid DESC
+    LIMIT 1;
+"""
+
+# a unit's state after its last event before a timestamp, from the primary key.
+STATE_BEFORE_QUERY = """
+    SELECT timestamp, media_ml, alt_media_ml, waste_ml, liquid_volume_ml, alt_media_fraction
+    FROM dosing_ledger
+    WHERE experiment=? AND pioreactor_unit=? AND timestamp < ?
+    ORDER BY timestamp DESC, event_rowid DESC
+    LIMIT 1;
+"""
+
+
+def tail_query(experiment: str, watermark: int | None) -> tuple[str, tuple]:
+    """
+    SQL (and its args) for an experiment's dosing events not in the ledger yet. If the ledger was
+    never updated, that's all of the experiment's events.
+    """
+    if watermark is None:
+        return (
+            """
+            SELECT pioreactor_unit, timestamp, ROWID AS event_rowid, event, volume_change_ml, source_of_event
+            FROM dosing_events
+            WHERE experiment=?
+            """,
+            (experiment,),
+        )
+    # without NOT INDEXED, SQLite prefers the experiment index, and scans all of the experiment's
+    # events instead of only the new ROWIDs.
+    return (
+        """
+        SELECT pioreactor_unit, timestamp, ROWID AS event_rowid, event, volume_change_ml, source_of_event
+        FROM dosing_events NOT INDEXED
+        WHERE experiment=? AND ROWID > ?
+        """,
+        (experiment, watermark),
+    )
+
+
+def summarize_unit(
+    latest: dict[str, t.Any] | None,
+    before_windows: dict[float, dict[str, t.Any] | None],
+    cutoffs: dict[float, str],
+    tail: list[tuple],
+    defaults: VialDefaults = VialDefaults(),
+) -> dict[str, t.Any]:
+    """
+    A unit's cumulative volumes, estimated liquid volume and alt. media fraction, and its rates
+    (ml/h) over each window. latest is the unit's last ledger row, before_windows[hours] its last
+    ledger row before cutoffs[hours], and tail its (timestamp, ROWID, event, volume_change_ml,
+    source_of_event) events not in the ledger yet.
+
+    Tail events are applied after the ledger's, so a late one's effect on the liquid volume and
+    alt. media fraction is approximate until the next update places it in order. Cumulative volumes
+    and rates are exact.
+    """
+
+    def state_of(row: dict[str, t.Any] | None) -> LedgerState:
+        if row is None:
+            return defaults.initial_state()
+        return LedgerState(*(row[field] for field in LedgerState._fields))
+
+    state = state_of(latest)
+    timestamp = latest["timestamp"] if latest else None
+    tail = sorted(tail)
+    for event_timestamp, _, event, volume, source in tail:
+        state = apply_event(state, event, volume, source, defaults.max_volume_ml)
+        timestamp = max(timestamp or event_timestamp, event_timestamp)
+
+    rates = {}
+    for hours, cutoff in cutoffs.items():
+        before = state_of(before_windows.get(hours))
+        for _, _, event, volume, source in (e for e in tail if e[0] < cutoff):
+            # only the cumulative sums are used here, so the order of the events doesn't matter.
+            before = apply_event(before, event, volume, source, defaults.max_volume_ml)
+        rates[f"{hours:g}"] = {
+            "media_ml_per_hour": (state.media_ml - before.media_ml) / hours,
+            "alt_media_ml_per_hour": (state.alt_media_ml - before.alt_media_ml) / hours,
+            "waste_ml_per_hour": (state.waste_ml - before.waste_ml) / hours,
+        }
+
+    return {"timestamp": timestamp, **state._asdict(), "rates": rates}
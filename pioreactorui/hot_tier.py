@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+An optional, in-process copy of the last few hours of the most requested readings (OD, normalized
+OD, growth rates and temperatures), so that the dashboards' recent windows aren't re-read from
+the SD card on every poll. Enabled with `hot_tier_hours` in the [ui] section of the config.
+
+Each series (a unit, or unit-channel for OD) is a pair of NumPy ring buffers of epoch milliseconds
+and values. They're filled by the leader's paho client, from the same MQTT messages that are
+written to the database, and seeded from the database each time the client (re)connects.
+
+A window is only answered from memory if it's covered: each (data_source, experiment) knows since
+when it has every row, which is when the subscription started, or the start of the seed, and moves
+forward when a ring is full and drops its oldest points. Windows longer than `hot_tier_hours` never
+are. Other windows are read from SQLite.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import typing as t
+from time import time
+
+import numpy as np
+import paho.mqtt.client as mqtt
+from msgspec import DecodeError
+from msgspec.json import decode
+
+from .time_series import to_timestamps
+
+# the fastest readings (OD) are every few seconds: rings hold this many points per hour.
+POINTS_PER_HOUR = 3600 // 2
+# messages can reach the broker a little after their timestamp (ex: the workers' clocks drift).
+COVERAGE_MARGIN_MS = 30_000
+# check for rings of experiments that stopped publishing every this many messages.
+PRUNE_EVERY_N_MESSAGES = 10_000
+
+
+class HotTierSource(t.NamedTuple):
+    data_source: str
+    column: str
+    topics: tuple[str, ...]  # under pioreactor/<unit>/<experiment>/
+    payload_key: str
+    is_partitioned_by_sensor: bool = False
+
+
+HOT_TIER_SOURCES = {
+    source.data_source: source
+    for source in (
+        HotTierSource(
+            "od_readings", "od_reading", ("od_reading/od1", "od_reading/od2"), "od", True
+        ),
+        HotTierSource(
+            "od_readings_filtered",
+            "normalized_od_reading",
+            ("growth_rate_calculating/od_filtered",),
+            "od_filtered",
+        ),
+        HotTierSource(
+            "growth_rates", "rate", ("growth_rate_calculating/growth_rate",), "growth_rate"
+        ),
+        HotTierSource(
+            "temperature_readings",
+            "temperature_c",
+            ("temperature_automation/temperature",),
+            "temperature",
+        ),
+    )
+}
+
+
+def to_epoch_ms(timestamp: str) -> int:
+    return int(np.datetime64(timestamp.rstrip("Z"), "ms").astype(np.int64))
+
+
+class Ring:
+    """The last `capacity` (epoch ms, value) points of a series, in timestamp order."""
+
+    def __init__(self, capacity: int) -> None:
+        self.x = np.empty(capacity, dtype=np.int64)
+        self.y = np.empty(capacity, dtype=np.float64)
+        # how many points were ever appended: the next point's sequence number
+        self.count = 0
+
+    def append(self, x: int, y: float) -> bool:
+        """Appends the point, unless it isn't newer than the last one. Returns whether it was."""
+        if self.count and x <= self.x[(self.count - 1) % len(self.x)]:
+            return False
+        self.x[self.count % len(self.x)] = x
+        self.y[self.count % len(self.y)] = y
+        self.count += 1
+        return True
+
+    def points(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(x, y, sequence numbers) of the points held, oldest first."""
+        capacity = len(self.x)
+        first = max(self.count - capacity, 0)
+        order = np.arange(first, self.count) % capacity
+        return self.x[order], self.y[order], np.arange(first, self.count)
+
+    def oldest(self) -> int | None:
+        if self.count == 0:
+            return None
+        return int(self.x[max(self.count - len(self.x), 0) % len(self.x)])
+
+    def newest(self) -> int | None:
+        if self.count == 0:
+            return None
+        return int(self.x[(self.count - 1) % len(self.x)])
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= len(self.x)
+
+
+class HotTier:
+    def __init__(self, hours: float = 0.0, database: str | None = None) -> None:
+        self.hours = hours
+        self.database = database
+        self.capacity = max(round(hours * POINTS_PER_HOUR), 1)
+        self._lock = threading.Lock()
+        self._rings: dict[tuple[str, str, str], Ring] = {}  # (data_source, experiment, series)
+        # (data_source, experiment) -> every row since, in epoch ms
+        self._covered_since: dict[tuple[str, str], int] = {}
+        self._subscribed_at: int | None = None
+        # incremented on each (re)connection, so that an older seed doesn't claim any coverage
+        self._connection = 0
+        self._n_messages = 0
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.hours > 0
+
+    def topic_filters(self) -> list[str]:
+        return [
+            f"pioreactor/+/+/{topic}"
+            for source in HOT_TIER_SOURCES.values()
+            for topic in source.topics
+        ]
+
+    def subscribe(self, client: mqtt.Client) -> None:
+        """
+        Starts receiving readings. Everything from now (plus COVERAGE_MARGIN_MS) on is covered.
+        The broker forgets our subscriptions if the connection drops, and messages were missed in
+        the meantime: this is called again on each connection, which drops the coverage.
+        """
+        with self._lock:
+            self._connection += 1
+            self._covered_since.clear()
+            self._subscribed_at = int(time() * 1000) + COVERAGE_MARGIN_MS
+        for topic_filter in self.topic_filters():
+            client.message_callback_add(topic_filter, self.on_message)
+            client.subscribe(topic_filter)
+
+    def on_connect(self, client: mqtt.Client, *args, **kwargs) -> None:
+        """
+        Subscribe, then seed the rings from the database in the background. The seed waits
+        COVERAGE_MARGIN_MS, so that the readings published before we subscribed are in the database.
+        """
+        self.subscribe(client)
+        seeding = threading.Timer(COVERAGE_MARGIN_MS / 1000, self.seed_from_database)
+        seeding.daemon = True
+        seeding.start()
+
+    def seed_from_database(self) -> None:
+        if self.database is None:
+            return
+        try:
+            con = sqlite3.connect(f"file:{self.database}?mode=ro", uri=True, timeout=15)
+            try:
+                self.seed(con)
+            finally:
+                con.close()
+        except sqlite3.Error:
+            # the windows are then only covered since we subscribed.
+            pass
+
+    def on_message(self, client, userdata, message: mqtt.MQTTMessage) -> None:
+        if message.retain:
+            # retained messages are old: already in the seed, or before our coverage.
+            return
+
+        levels = message.topic.split("/")
+        if len(levels) < 5:
+            return
+        unit, experiment, topic = levels[1], levels[2], "/".join(levels[3:])
+        source = next(
+            (source for source in HOT_TIER_SOURCES.values() if topic in source.topics), None
+        )
+        if source is None:
+            return
+
+        try:
+            payload = decode(message.payload)
+            x = to_epoch_ms(payload["timestamp"])
+            y = float(payload[source.payload_key])
+        except (DecodeError, KeyError, TypeError, ValueError):
+            return
+
+        series = unit
+        if source.is_partitioned_by_sensor:
+            series += "-" + levels[-1].replace("od", "")
+        self.add(source.data_source, experiment, series, x, y)
+
+    def add(self, data_source: str, experiment: str, series: str, x: int, y: float) -> None:
+        with self._lock:
+            key = (data_source, experiment, series)
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = Ring(self.capacity)
+            oldest = ring.oldest() if ring.is_full else None
+            if ring.append(x, y) and oldest is not None:
+                # the point overwritten is no longer covered
+                self._cover_from(data_source, experiment, oldest + 1)
+
+            self._n_messages += 1
+            if self._n_messages % PRUNE_EVERY_N_MESSAGES == 0:
+                self._prune(x)
+
+    def _cover_from(self, data_source: str, experiment: str, since: int) -> None:
+        key = (data_source, experiment)
+        covered_since = self._covered_since.get(key, self._subscribed_at or since)
+        self._covered_since[key] = max(covered_since, since)
+
+    def _prune(self, now: int) -> None:
+        # forget the series that stopped publishing, ex: of finished experiments
+        cutoff = now - int(self.hours * 3_600_000)
+        for key, ring in list(self._rings.items()):
+            if (ring.newest() or 0) < cutoff:
+                del self._rings[key]
+
+    def seed(self, con: sqlite3.Connection, experiments: t.Iterable[str] | None = None) -> None:
+        """
+        Fill the rings with the last `hours` of the experiments' rows, merged with any points
+        already received. Default is the experiments with assigned workers. All of an experiment's
+        units are seeded, like the messages received (and the database) have all of them.
+        """
+        with self._lock:
+            connection = self._connection
+        seed_from = int(time() * 1000) - int(self.hours * 3_600_000)
+        if experiments is None:
+            cur = con.cursor()
+            cur.row_factory = None
+            experiments = [
+                experiment
+                for (experiment,) in cur.execute(
+                    "SELECT DISTINCT experiment FROM experiment_worker_assignments"
+                )
+            ]
+            cur.close()
+        for experiment in experiments:
+            for data_source in HOT_TIER_SOURCES:
+                self.seed_experiment(con, data_source, experiment, seed_from, connection)
+
+    def seed_experiment(
+        self,
+        con: sqlite3.Connection,
+        data_source: str,
+        experiment: str,
+        seed_from: int,
+        connection: int,
+    ) -> None:
+        source = HOT_TIER_SOURCES[data_source]
+        series_expression = (
+            "pioreactor_unit || '-' || channel"
+            if source.is_partitioned_by_sensor
+            else "pioreactor_unit"
+        )
+        cur = con.cursor()
+        cur.row_factory = None
+        try:
+            rows = cur.execute(
+                f"""
+                SELECT {series_expression}, timestamp, {source.column}
+                FROM {data_source}
+                WHERE experiment=? AND
+                    timestamp >= ? AND
+                    {source.column} IS NOT NULL;
+                """,
+                (experiment, to_timestamps(np.array([seed_from]))[0]),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return  # table doesn't exist (yet)
+        finally:
+            cur.close()
+
+        by_series: dict[str, list[tuple[int, float]]] = {}
+        for series, timestamp, y in rows:
+            by_series.setdefault(series, []).append((to_epoch_ms(timestamp), float(y)))
+
+        with self._lock:
+            for series, points in by_series.items():
+                key = (data_source, experiment, series)
+                ring = self._rings.get(key)
+                if ring is not None:
+                    received = ring.points()
+                    points.extend(zip(received[0].tolist(), received[1].tolist()))
+                ring = self._rings[key] = Ring(self.capacity)
+                for x, y in sorted(points):
+                    ring.append(x, y)
+
+            if connection != self._connection:
+                # we reconnected during the seed, and may have missed messages in between.
+                return
+            # full rings have dropped their oldest points, seeded or received.
+            self._covered_since[(data_source, experiment)] = max(
+                [seed_from]
+                + [
+                    (ring.oldest() or 0) + 1
+                    for (ds, exp, _), ring in self._rings.items()
+                    if ds == data_source and exp == experiment and ring.is_full
+                ]
+            )
+
+    def read(
+        self,
+        data_source: str,
+        experiment: str,
+        since: int,
+        unit: str | None = None,
+        filter_mod_n: float = 1.0,
+        decimals: int = 7,
+        now: int | None = None,
+    ) -> tuple[tuple, tuple, np.ndarray, np.ndarray] | None:
+        """
+        The (series, timestamp, epoch ms, y) columns of the rows after since (epoch ms), sorted by
+        series, then timestamp, like time_series_columns. Returns None if they aren't all in
+        memory. Rows are thinned to about 1/filter_mod_n, keyed on their sequence number.
+
+        Windows starting more than `hours` before now (epoch ms) are never covered: rings that
+        aren't full can hold older points, but _prune drops the series without any recent ones.
+        """
+        if not self.is_enabled or data_source not in HOT_TIER_SOURCES:
+            return None
+
+        now = int(time() * 1000) if now is None else now
+        partitioned = HOT_TIER_SOURCES[data_source].is_partitioned_by_sensor
+        with self._lock:
+            covered_since = self._covered_since.get((data_source, experiment), self._subscribed_at)
+            if covered_since is None or since < max(covered_since, now - self.hours * 3_600_000):
+                return None
+            points = [
+                (series, *ring.points())
+                for (ds, exp, series), ring in sorted(self._rings.items())
+                if ds == data_source
+                and exp == experiment
+                and (unit is None or unit == (series.rpartition("-")[0] if partitioned else series))
+            ]
+
+        names, xs, ys = [], [], []
+        for series, x, y, sequence in points:
+            keep = x > since
+            if filter_mod_n > 1:
+                keep &= np.modf(sequence * 0.61803398875)[0] < 1.0 / filter_mod_n
+            names.extend([series] * int(keep.sum()))
+            xs.append(x[keep])
+            ys.append(y[keep])
+
+        x_ = np.concatenate(xs) if xs else np.empty(0, dtype=np.int64)
+        y_ = np.round(np.concatenate(ys), decimals) if ys else np.empty(0)
+        return tuple(names), tuple(to_timestamps(x_)), x_.astype(np.float64), y_
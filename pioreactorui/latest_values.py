@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+The latest value of each metric (OD, growth rate, temperature, dosing...) of each unit, for the
+overview cards, see /api/experiments/<experiment>/latest.
+
+Like the rollups, the latest_values table is maintained incrementally by a periodic huey task (see
+tasks.py): each run only reads raw rows with a ROWID above the last processed ROWID, and upserts the
+newest row of each (experiment, unit, metric). Rows that arrive late, with older timestamps, never
+replace newer values.
+
+Readers combine the table with the few raw rows added since the last run (see tail_query), so
+values are never a minute behind.
+"""
+from __future__ import annotations
+
+import sqlite3
+import typing as t
+
+from .watermarks import CREATE_WATERMARKS_TABLE
+from .watermarks import next_batch
+from .watermarks import save_watermark
+
+# raw table -> (SQL expression naming the metric, SQL expression of its value), ...
+LATEST_VALUE_SOURCES: dict[str, tuple[tuple[str, str], ...]] = {
+    "od_readings": (("'od_reading_' || channel", "od_reading"),),
+    "od_readings_filtered": (("'normalized_od'", "normalized_od_reading"),),
+    "growth_rates": (("'growth_rate'", "rate"),),
+    "temperature_readings": (("'temperature_c'", "temperature_c"),),
+    "alt_media_fractions": (("'alt_media_fraction'", "alt_media_fraction"),),
+    "dosing_events": (
+        ("'dosing_event'", "event"),
+        ("'dosing_volume_change_ml'", "volume_change_ml"),
+    ),
+}
+
+# max number of new raw rows, per source, that one update will read. Bounds the back-fill.
+BATCH_SIZE = 200_000
+
+# applied by schema.apply_schema_changes
+CREATE_LATEST_VALUES_TABLES = f"""
+    CREATE TABLE IF NOT EXISTS latest_values (
+        experiment      TEXT NOT NULL,
+        pioreactor_unit TEXT NOT NULL,
+        metric          TEXT NOT NULL,
+        timestamp       TEXT NOT NULL,
+        value,          -- REAL, or TEXT for ex: dosing_event
+        PRIMARY KEY (experiment, pioreactor_unit, metric)
+    ) WITHOUT ROWID;
+
+    {CREATE_WATERMARKS_TABLE.format(table='latest_values_watermarks')}
+"""
+
+
+def newest_rows_query(data_source: str, where: str, use_indexes: bool = True) -> str:
+    """
+    The newest (experiment, pioreactor_unit, metric, timestamp, value) of each metric in the rows
+    matching where. Relies on SQLite's bare columns: with max(timestamp), the other columns come
+    from the row with the max timestamp.
+    """
+    return "\nUNION ALL\n".join(
+        f"""
+        SELECT experiment, pioreactor_unit, {metric} as metric, max(timestamp) as timestamp, {value} as value
+        FROM {data_source} {"" if use_indexes else "NOT INDEXED"}
+        WHERE {where} AND {value} IS NOT NULL
+        GROUP BY 1, 2, 3
+        """
+        for metric, value in LATEST_VALUE_SOURCES[data_source]
+    )
+
+
+def update_latest_values(con: sqlite3.Connection) -> dict[str, int]:
+    """
+    Upsert the newest values among any new raw rows into latest_values. Returns the number of raw
+    rows processed per source.
+    """
+    processed = {}
+
+    for data_source in LATEST_VALUE_SOURCES:
+        batch = next_batch(con, "latest_values_watermarks", data_source, BATCH_SIZE)
+        if batch is None:
+            # table doesn't exist on this leader (yet).
+            continue
+
+        with con:
+            # after a restart, values of the renumbered rows are upserted again, and only replace
+            # older ones.
+            con.execute(
+                f"""
+                INSERT INTO latest_values (experiment, pioreactor_unit, metric, timestamp, value)
+                SELECT experiment, pioreactor_unit, metric, timestamp, value
+                FROM ({newest_rows_query(data_source, "ROWID > ? AND ROWID <= ?", use_indexes=False)})
+                WHERE true
+                ON CONFLICT (experiment, pioreactor_unit, metric) DO UPDATE SET
+                    timestamp = excluded.timestamp,
+                    value = excluded.value
+                WHERE excluded.timestamp >= latest_values.timestamp;
+                """,
+                (batch.last_rowid, batch.upper_rowid) * len(LATEST_VALUE_SOURCES[data_source]),
+            )
+            save_watermark(con, "latest_values_watermarks", data_source, batch)
+
+        processed[data_source] = batch.size
+
+    return processed
+
+
+def tail_query(data_source: str, experiment: str, watermark: int | None) -> tuple[str, tuple]:
+    """
+    SQL (and its args) for an experiment's newest values among the raw rows not in latest_values
+    yet. If the source hasn't caught up (or was never processed), that's the newest values of all its
+    rows, read from its (experiment, pioreactor_unit, timestamp) index.
+    """
+    n_metrics = len(LATEST_VALUE_SOURCES[data_source])
+    if watermark is None:
+        return newest_rows_query(data_source, "experiment=?"), (experiment,) * n_metrics
+    # without NOT INDEXED, SQLite prefers the experiment index, and scans all of the experiment's
+    # rows instead of only the new ROWIDs.
+    return (
+        newest_rows_query(data_source, "experiment=? AND ROWID > ?", use_indexes=False),
+        (experiment, watermark) * n_metrics,
+    )
+
+
+def combine_latest_values(rows: t.Iterable[dict[str, t.Any]]) -> dict[str, dict[str, t.Any]]:
+    """
+    {unit: {metric: {"value": ..., "timestamp": ...}}} of the newest of each unit's metrics.
+    """
+    units: dict[str, dict[str, t.Any]] = {}
+    for row in rows:
+        metrics = units.setdefault(row["pioreactor_unit"], {})
+        current = metrics.get(row["metric"])
+        if current is None or row["timestamp"] >= current["timestamp"]:
+            metrics[row["metric"]] = {"value": row["value"], "timestamp": row["timestamp"]}
+    return units
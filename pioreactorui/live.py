@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Fan out MQTT messages to any number of live viewers (see /api/experiments/<experiment>/live).
+
+The leader's paho client subscribes to each topic once, no matter how many viewers want it, and
+each viewer gets its own bounded queue of (topic, payload) messages. When the last viewer of a
+topic leaves, the topic is unsubscribed.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import typing as t
+
+import paho.mqtt.client as mqtt
+from msgspec import DecodeError
+from msgspec.json import decode
+from msgspec.json import encode
+from pioreactor.utils.timing import current_utc_timestamp
+
+from .structs import ChartDescriptor
+
+# a viewer that falls this far behind (ex: a stalled browser tab) misses messages, rather than
+# growing the server's memory.
+MAX_QUEUED_MESSAGES = 1_000
+# send an SSE comment this often, so proxies and browsers don't close idle streams.
+HEARTBEAT_SECONDS = 15.0
+
+
+class LiveFanout:
+    def __init__(self, client: mqtt.Client) -> None:
+        self.client = client
+        self._lock = threading.Lock()
+        self._viewers: dict[str, set[queue.Queue]] = {}  # topic filter -> viewers' queues
+        self.dropped = 0
+
+    def subscribe(self, topics: t.Iterable[str]) -> queue.Queue:
+        viewer: queue.Queue = queue.Queue(maxsize=MAX_QUEUED_MESSAGES)
+        with self._lock:
+            for topic in set(topics):
+                if topic not in self._viewers:
+                    self._viewers[topic] = set()
+                    self.client.message_callback_add(topic, self.on_message)
+                    self.client.subscribe(topic)
+                self._viewers[topic].add(viewer)
+        return viewer
+
+    def unsubscribe(self, viewer: queue.Queue) -> None:
+        with self._lock:
+            for topic, viewers in list(self._viewers.items()):
+                viewers.discard(viewer)
+                if not viewers:
+                    del self._viewers[topic]
+                    self.client.message_callback_remove(topic)
+                    self.client.unsubscribe(topic)
+
+    def resubscribe(self, *args, **kwargs) -> None:
+        """
+        The broker forgets our subscriptions if the connection drops. Used as the client's on_connect.
+        """
+        with self._lock:
+            for topic in self._viewers:
+                self.client.subscribe(topic)
+
+    def on_message(self, client, userdata, message: mqtt.MQTTMessage) -> None:
+        if message.retain:
+            # retained messages are old, and viewers already have them from the database.
+            return
+
+        with self._lock:
+            viewers = set().union(
+                *(
+                    viewers
+                    for topic, viewers in self._viewers.items()
+                    if mqtt.topic_matches_sub(topic, message.topic)
+                )
+            )
+
+        for viewer in viewers:
+            try:
+                viewer.put_nowait((message.topic, message.payload))
+            except queue.Full:
+                self.dropped += 1
+
+    def topics(self) -> list[str]:
+        with self._lock:
+            return list(self._viewers)
+
+
+def chart_point(
+    chart: ChartDescriptor, is_partitioned_by_sensor: bool, topic: str, payload: bytes
+) -> bytes | None:
+    """
+    Parse an MQTT message for a chart the same way the UI's charts do, into a
+    {"series": ..., "x": timestamp, "y": value} JSON object. Returns None if the message isn't
+    valid for this chart.
+
+    series matches the series of the time_series endpoints: the unit, or unit-channel for OD charts.
+    """
+    try:
+        if chart.payload_key:
+            message = decode(payload)
+            timestamp = message["timestamp"]
+            y = float(message[chart.payload_key])
+        else:
+            timestamp = current_utc_timestamp()
+            y = float(payload)
+    except (DecodeError, KeyError, TypeError, ValueError):
+        return None
+
+    levels = topic.split("/")
+    series = levels[1]
+    if is_partitioned_by_sensor:
+        series += "-" + levels[4].replace("raw_od", "").replace("od", "")
+
+    return encode({"series": series, "x": timestamp, "y": y})
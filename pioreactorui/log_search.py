@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Full-text search of the logs' message and task, see /api/logs/search.
+
+logs_fts is an external-content FTS5 index: it only stores the index, and reads the text back from
+logs by ROWID. Triggers on logs keep it in sync from the moment they're created. The rows that were
+already there are back-filled in ROWID batches by a periodic huey task (see tasks.py), so that
+indexing months of logs doesn't lock the database for long.
+
+A row is in the index if its ROWID is below the back-fill's next_rowid, or at or above
+backfill_below (the ROWIDs the triggers handle). The triggers skip the rows in between, which the
+back-fill will get to, so that no row is indexed twice and no row is deleted from the index before
+it was added (which corrupts an external-content index).
+
+The index maps ROWIDs to logs, so it's only valid while the logs keep their ROWIDs. Each update
+checks that the newest log it saw last time is still at that ROWID (see watermarks.row_fingerprint),
+and rebuilds the index otherwise (ex: the logs table was rebuilt or vacuumed, or the log deleted).
+"""
+from __future__ import annotations
+
+import sqlite3
+
+from .watermarks import fetch_row
+from .watermarks import row_fingerprint
+
+# max number of logs that one update will back-fill.
+BATCH_SIZE = 100_000
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+IS_INDEXED = """(
+    {rowid} < (SELECT next_rowid FROM logs_fts_backfill) OR
+    {rowid} >= (SELECT backfill_below FROM logs_fts_backfill)
+)"""
+
+CREATE_LOG_SEARCH_INDEX = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+        message, task, content='logs', content_rowid='rowid', tokenize='unicode61'
+    );
+
+    CREATE TABLE IF NOT EXISTS logs_fts_backfill (
+        id             INTEGER PRIMARY KEY CHECK (id = 0),
+        backfill_below INTEGER NOT NULL, -- ROWIDs from here on are indexed by the triggers
+        next_rowid     INTEGER NOT NULL, -- ROWIDs below are back-filled
+        checked_rowid  INTEGER NOT NULL, -- the newest ROWID at the last update
+        checked_row    TEXT              -- fingerprint of the newest log at or below checked_rowid
+    );
+
+    CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs
+    WHEN {IS_INDEXED.format(rowid="new.ROWID")}
+    BEGIN
+        INSERT INTO logs_fts (rowid, message, task) VALUES (new.ROWID, new.message, new.task);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs
+    WHEN {IS_INDEXED.format(rowid="old.ROWID")}
+    BEGIN
+        INSERT INTO logs_fts (logs_fts, rowid, message, task) VALUES ('delete', old.ROWID, old.message, old.task);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS logs_fts_update AFTER UPDATE OF message, task ON logs
+    WHEN {IS_INDEXED.format(rowid="old.ROWID")}
+    BEGIN
+        INSERT INTO logs_fts (logs_fts, rowid, message, task) VALUES ('delete', old.ROWID, old.message, old.task);
+        INSERT INTO logs_fts (rowid, message, task) VALUES (new.ROWID, new.message, new.task);
+    END;
+"""
+
+
+def update_log_search_index(con: sqlite3.Connection) -> int:
+    """
+    Create the index and its triggers if needed, and back-fill the next batch of older logs.
+    Returns the number of logs back-filled.
+    """
+    with con:
+        # no log can be inserted between reading max(ROWID) and creating the triggers.
+        con.execute("BEGIN IMMEDIATE")
+        (max_rowid,) = fetch_row(con, "SELECT coalesce(max(ROWID), 0) FROM logs")
+        row = None
+        try:
+            row = fetch_row(
+                con,
+                "SELECT backfill_below, next_rowid, checked_rowid, checked_row FROM logs_fts_backfill",
+            )
+        except sqlite3.OperationalError:
+            pass  # the index doesn't exist yet
+
+        if row is not None and (
+            max_rowid + 1 < row[0] or row_fingerprint(con, "logs", row[2]) != row[3]
+        ):
+            # ROWIDs were renumbered, or logs the index points to were deleted. Start over.
+            row = None
+
+        if row is None:
+            con.execute("DROP TABLE IF EXISTS logs_fts_backfill")
+            # executescript would commit our transaction, so one statement at a time.
+            for statement in CREATE_LOG_SEARCH_INDEX.split(";\n\n"):
+                con.execute(statement)
+            con.execute("INSERT INTO logs_fts (logs_fts) VALUES ('delete-all')")
+            con.execute(
+                """
+                INSERT INTO logs_fts_backfill (id, backfill_below, next_rowid, checked_rowid, checked_row)
+                VALUES (0, ?, 1, ?, ?)
+                """,
+                (max_rowid + 1, max_rowid, row_fingerprint(con, "logs", max_rowid)),
+            )
+            row = (max_rowid + 1, 1, max_rowid, None)
+
+        backfill_below, next_rowid, checked_rowid, _ = row
+        upper_rowid = min(backfill_below, next_rowid + BATCH_SIZE)
+        con.execute(
+            """
+            INSERT INTO logs_fts (rowid, message, task)
+            SELECT ROWID, message, task FROM logs WHERE ROWID >= ? AND ROWID < ?
+            """,
+            (next_rowid, upper_rowid),
+        )
+        con.execute("UPDATE logs_fts_backfill SET next_rowid=?", (upper_rowid,))
+        if checked_rowid != max_rowid:
+            con.execute(
+                "UPDATE logs_fts_backfill SET checked_rowid=?, checked_row=?",
+                (max_rowid, row_fingerprint(con, "logs", max_rowid)),
+            )
+
+    return upper_rowid - next_rowid
+
+
+def to_match_expression(q: str) -> str:
+    """
+    The FTS5 query of plain search terms: logs matching all the terms, in any order. Each term is
+    quoted, so that punctuation (ex: `OD:` or `-`) isn't read as FTS5 syntax.
+    """
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+# Pages are keyed by (timestamp, ROWID), newest first, instead of by bm25 rank: a log's rank depends
+# on all the indexed logs (their count and average length), so it changes as logs are added or
+# back-filled, and a log could move across the cursor between two pages.
+def encode_cursor(timestamp: str, rowid: int) -> str:
+    return f"{timestamp},{rowid}"
+
+
+def parse_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        timestamp, rowid = cursor.rsplit(",", 1)
+        return timestamp, int(rowid)
+    except ValueError:
+        raise ValueError(f"Invalid cursor `{cursor}`.")
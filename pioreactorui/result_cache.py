@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+A small cache of time series responses, shared by all the web server's processes.
+
+Entries live in a SQLite file under CACHE_DIR (/tmp, a tmpfs on the Pi), and are only served if
+their TTL hasn't passed and their source hasn't changed since they were computed. Changes are
+detected with the source table's high-water ROWID (cheap: SQLite reads it from the end of the
+table's b-tree), plus when the rollups were last updated for the built-in series. PRAGMA
+data_version can't be used for this: it's only comparable within a single connection.
+"""
+from __future__ import annotations
+
+import sqlite3
+import typing as t
+from os import getpid
+from pathlib import Path
+from time import time
+
+from .config import CACHE_DIR
+
+DEFAULT_PATH = CACHE_DIR / "time_series_results.sqlite"
+TTL_SECONDS = 30.0
+
+# per-process counters, see /api/time_series/cache_stats
+stats = {"hits": 0, "misses": 0}
+
+
+def get_stats() -> dict[str, t.Any]:
+    return stats | {"pid": getpid()}
+
+
+class ResultCache:
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_PATH,
+        ttl_seconds: float = TTL_SECONDS,
+        stats: dict[str, int] = stats,
+        keep_stale_seconds: float = 0.0,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stats = stats
+        # expired entries are kept this much longer, for get_stale
+        self.keep_stale_seconds = keep_stale_seconds
+
+    def __enter__(self) -> ResultCache:
+        self.conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+        self.conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = 0;
+            CREATE TABLE IF NOT EXISTS results (
+                key        TEXT PRIMARY KEY,
+                version    TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                mimetype   TEXT NOT NULL,
+                body       BLOB NOT NULL
+            );
+            """
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_val, tb) -> None:
+        self.conn.close()
+
+    def get(self, key: str, version: str) -> tuple[str, bytes] | None:
+        row = self.conn.execute(
+            "SELECT mimetype, body FROM results WHERE key=? AND version=? AND expires_at>?",
+            (key, version, time()),
+        ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return row
+
+    def get_stale(self, key: str) -> tuple[str, bytes] | None:
+        """The key's entry even if it expired (up to keep_stale_seconds ago) or is of another version."""
+        return self.conn.execute(
+            "SELECT mimetype, body FROM results WHERE key=? AND expires_at>?",
+            (key, time() - self.keep_stale_seconds),
+        ).fetchone()
+
+    def set(self, key: str, version: str, mimetype: str, body: bytes) -> None:
+        now = time()
+        self.conn.execute(
+            "DELETE FROM results WHERE expires_at<=?", (now - self.keep_stale_seconds,)
+        )
+        self.conn.execute(
+            """
+            INSERT INTO results (key, version, expires_at, mimetype, body) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                version=excluded.version,
+                expires_at=excluded.expires_at,
+                mimetype=excluded.mimetype,
+                body=excluded.body
+            """,
+            (key, version, now + self.ttl_seconds, mimetype, body),
+        )
+
+    def delete(self, keys: t.Iterable[str] | None = None) -> None:
+        """Delete these keys' entries, or all entries if keys is None."""
+        if keys is None:
+            self.conn.execute("DELETE FROM results")
+        else:
+            self.conn.executemany("DELETE FROM results WHERE key=?", ((key,) for key in keys))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-aggregated (min, max, sum, count) buckets of the built-in time series (BUILTIN_TIME_SERIES),
+at 1 minute, 10 minute and 1 hour resolutions. Long lookbacks read these instead of scanning
+millions of raw rows.
+
+The rollups are maintained incrementally by a periodic huey task (see tasks.py): each run only
+aggregates raw rows with a ROWID above the last processed ROWID, and merges them into the existing
+buckets with an upsert. Late-arriving rows are therefore never missed.
+"""
+from __future__ import annotations
+
+import sqlite3
+
+from .time_series import BUILTIN_TIME_SERIES
+from .watermarks import CREATE_WATERMARKS_TABLE
+from .watermarks import next_batch
+from .watermarks import save_watermark
+
+RESOLUTIONS = {"1m": 60, "10m": 600, "1h": 3600}
+
+# lookbacks at or below this many hours are always served from the raw tables.
+RAW_LOOKBACK_HOURS = 12.0
+# otherwise, pick the finest resolution that keeps each unit's series under this many buckets.
+MAX_BUCKETS_PER_SERIES = 2000
+# max number of new raw rows, per source, that one update will aggregate. Bounds the back-fill.
+BATCH_SIZE = 200_000
+# don't trust rollups that haven't been updated recently (ex: huey isn't running).
+MAX_STALENESS_MINUTES = 10
+
+# applied by schema.apply_schema_changes
+CREATE_ROLLUP_TABLES = f"""
+    CREATE TABLE IF NOT EXISTS ts_rollups (
+        data_source  TEXT NOT NULL,
+        experiment   TEXT NOT NULL,
+        resolution   INTEGER NOT NULL, -- bucket width, in seconds
+        series       TEXT NOT NULL,    -- usually the unit, or unit-channel
+        bucket_start TEXT NOT NULL,
+        min_value    REAL NOT NULL,
+        max_value    REAL NOT NULL,
+        sum_value    REAL NOT NULL,
+        count        INTEGER NOT NULL,
+        PRIMARY KEY (data_source, experiment, resolution, series, bucket_start)
+    ) WITHOUT ROWID;
+
+    {CREATE_WATERMARKS_TABLE.format(table='ts_rollup_watermarks')}
+"""
+
+
+def choose_resolution(lookback_hours: float) -> str | None:
+    """
+    Returns a key of RESOLUTIONS, or None if the raw table should be used.
+    """
+    if lookback_hours <= RAW_LOOKBACK_HOURS:
+        return None
+
+    for name, seconds in RESOLUTIONS.items():
+        if lookback_hours * 3600 / seconds <= MAX_BUCKETS_PER_SERIES:
+            return name
+    return "1h"
+
+
+def update_rollups(con: sqlite3.Connection) -> dict[str, int]:
+    """
+    Aggregate any new raw rows into ts_rollups. Returns the number of raw rows processed per source.
+    """
+    processed = {}
+
+    for source in BUILTIN_TIME_SERIES.values():
+        batch = next_batch(con, "ts_rollup_watermarks", source.data_source, BATCH_SIZE)
+        if batch is None:
+            # table doesn't exist on this leader (yet).
+            continue
+
+        with con:
+            if batch.restarted:
+                con.execute("DELETE FROM ts_rollups WHERE data_source=?", (source.data_source,))
+
+            for resolution in RESOLUTIONS.values():
+                con.execute(
+                    f"""
+                    INSERT INTO ts_rollups (data_source, experiment, resolution, series, bucket_start, min_value, max_value, sum_value, count)
+                    SELECT
+                        ?,
+                        experiment,
+                        ?,
+                        {source.unit_expression},
+                        STRFTIME('%Y-%m-%dT%H:%M:%S.000Z', (CAST(STRFTIME('%s', timestamp) AS INTEGER) / ?) * ?, 'unixepoch') as bucket_start,
+                        min({source.column}),
+                        max({source.column}),
+                        sum({source.column}),
+                        count({source.column})
+                    FROM {source.data_source}
+                    WHERE ROWID > ? AND ROWID <= ? AND {source.column} IS NOT NULL
+                    GROUP BY 2, 4, 5
+                    ON CONFLICT (data_source, experiment, resolution, series, bucket_start) DO UPDATE SET
+                        min_value = min(min_value, excluded.min_value),
+                        max_value = max(max_value, excluded.max_value),
+                        sum_value = sum_value + excluded.sum_value,
+                        count = count + excluded.count;
+                    """,
+                    (
+                        source.data_source,
+                        resolution,
+                        resolution,
+                        resolution,
+                        batch.last_rowid,
+                        batch.upper_rowid,
+                    ),
+                )
+
+            save_watermark(con, "ts_rollup_watermarks", source.data_source, batch)
+
+        processed[source.data_source] = batch.size
+
+    return processed
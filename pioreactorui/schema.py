@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+The UI's own changes to the leader's database schema: the read models' tables, and the indexes the
+UI's queries need on pioreactor's tables.
+
+create_tables.sql (from CustoPiZer) creates pioreactor's tables. The changes below are applied on
+top, each once and in order, and recorded in ui_schema_changes. The huey consumer applies the
+pending ones when it starts (see tasks.py), so after each install or update, instead of checking
+on every run of the periodic tasks. Building an index over a large table holds the database's write
+lock for a while, but only that once.
+
+The log search index isn't here: it's created, and rebuilt if the logs' ROWIDs were renumbered,
+together with its back-fill state (see log_search.py).
+"""
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+from .dosing_ledger import CREATE_DOSING_LEDGER_TABLES
+from .latest_values import CREATE_LATEST_VALUES_TABLES
+from .rollups import CREATE_ROLLUP_TABLES
+from .watermarks import fetch_all
+
+SQL_DIR = Path(__file__).parent.parent / "sql"
+
+# (name, SQL script), in the order they're applied. Never rename or edit an applied change: add one.
+SCHEMA_CHANGES: tuple[tuple[str, str], ...] = (
+    ("timeline_indexes", (SQL_DIR / "timeline_indexes.sql").read_text()),
+    ("rollup_tables", CREATE_ROLLUP_TABLES),
+    ("latest_values_tables", CREATE_LATEST_VALUES_TABLES),
+    ("dosing_ledger_tables", CREATE_DOSING_LEDGER_TABLES),
+)
+
+
+def apply_schema_changes(con: sqlite3.Connection) -> list[str]:
+    """
+    Apply the schema changes that weren't yet, each in its own transaction. Returns their names.
+    """
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ui_schema_changes (
+            name       TEXT PRIMARY KEY,
+            applied_at TEXT NOT NULL
+        );
+        """
+    )
+    con.commit()
+    applied = {name for (name,) in fetch_all(con, "SELECT name FROM ui_schema_changes")}
+
+    newly_applied = []
+    for name, script in SCHEMA_CHANGES:
+        if name in applied:
+            continue
+        try:
+            # executescript commits any open transaction first, so the change and its record are
+            # one transaction of their own.
+            con.executescript(
+                f"""
+                BEGIN IMMEDIATE;
+                {script}
+                INSERT INTO ui_schema_changes (name, applied_at)
+                VALUES ('{name}', STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW'));
+                COMMIT;
+                """
+            )
+        except sqlite3.Error:
+            con.rollback()
+            raise
+        newly_applied.append(name)
+
+    return newly_applied
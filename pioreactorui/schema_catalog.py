@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+A per-process catalog of the database's tables and views, their columns and their indexes, read
+from PRAGMA table_info / index_list / index_info.
+
+The catalog is only re-read when PRAGMA schema_version changes (ex: a plugin adds a table), so
+looking up a table is a dict lookup, not a query against sqlite_master.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+from msgspec import Struct
+
+
+class TableInfo(Struct, frozen=True):  # type: ignore
+    name: str
+    columns: frozenset[str]  # lowercased
+    is_view: bool
+    has_rowid: bool
+    indexes: tuple[tuple[str, ...], ...]  # lowercased columns of each (non-partial) index
+
+    def has_columns(self, *columns: str) -> bool:
+        return all(column.lower() in self.columns for column in columns)
+
+    def has_index_on(self, *columns: str) -> bool:
+        """True if an index starts with these columns, in this order."""
+        prefix = tuple(column.lower() for column in columns)
+        return any(index[: len(prefix)] == prefix for index in self.indexes)
+
+    @property
+    def thinning_key(self) -> str:
+        """
+        An integer that's cheap to compute per row, for the golden-ratio thinning. Views and
+        WITHOUT ROWID tables don't have a ROWID, and we avoid `row_number() OVER ()` as it
+        materializes every row before thinning.
+        """
+        if self.has_rowid:
+            return "ROWID"
+        return "CAST(julianday(timestamp) * 86400000.0 AS INTEGER)"
+
+    @property
+    def filter_by_unit(self) -> bool:
+        """
+        With only an (experiment, pioreactor_unit, timestamp) index, a timestamp range can only use
+        the index if the units are given too, ex: `pioreactor_unit IN (...)`.
+        """
+        return not self.has_index_on("experiment", "timestamp") and self.has_index_on(
+            "experiment", "pioreactor_unit", "timestamp"
+        )
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def read_tables(con: sqlite3.Connection) -> dict[str, TableInfo]:
+    cur = con.cursor()
+    cur.row_factory = None
+
+    tables = {}
+    for name, type_, sql in cur.execute(
+        "SELECT name, type, sql FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+    ).fetchall():
+        columns = frozenset(
+            column_name.lower()
+            for _, column_name, *_ in cur.execute(f"PRAGMA table_info({_quote(name)})").fetchall()
+        )
+        indexes = []
+        for _, index_name, _, _, is_partial in cur.execute(
+            f"PRAGMA index_list({_quote(name)})"
+        ).fetchall():
+            if is_partial:
+                continue
+            indexes.append(
+                tuple(
+                    (column_name or "").lower()
+                    for _, _, column_name in cur.execute(
+                        f"PRAGMA index_info({_quote(index_name)})"
+                    ).fetchall()
+                )
+            )
+
+        is_view = type_ == "view"
+        tables[name] = TableInfo(
+            name=name,
+            columns=columns,
+            is_view=is_view,
+            has_rowid=not is_view and "WITHOUT ROWID" not in (sql or "").upper(),
+            indexes=tuple(indexes),
+        )
+
+    cur.close()
+    return tables
+
+
+class SchemaCatalog:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version: tuple[str, int] | None = None
+        self._tables: dict[str, TableInfo] = {}
+
+    def tables(self, con: sqlite3.Connection) -> dict[str, TableInfo]:
+        cur = con.cursor()
+        cur.row_factory = None
+        database = next(
+            file for _, name, file in cur.execute("PRAGMA database_list") if name == "main"
+        )
+        (schema_version,) = cur.execute("PRAGMA schema_version").fetchone()
+        cur.close()
+
+        with self._lock:
+            if self._version != (database, schema_version):
+                self._tables = read_tables(con)
+                self._version = (database, schema_version)
+            return self._tables
+
+
+catalog = SchemaCatalog()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Run one read query per shard (ex: per unit) in parallel, across a small pool of threads that each
+hold their own read-only SQLite connection. sqlite3 releases the GIL while SQLite steps through a
+query, so shards really do run on separate cores.
+
+Shards are read from separate connections, so they aren't guaranteed to see the same snapshot of
+the database.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+# the leader is usually a Raspberry Pi with 4 cores.
+MAX_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pioreactorui-shard")
+_local = threading.local()
+
+
+def _get_read_only_connection(database: str) -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    con = connections.get(database)
+    if con is None:
+        con = connections[database] = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+        con.executescript(
+            """
+            PRAGMA temp_store = 2;  -- stop writing small files to disk, use mem
+            PRAGMA busy_timeout = 15000;
+            PRAGMA cache_size = -4000;
+        """
+        )
+    return con
+
+
+def _fetch_shard(database: str, query: str, args: tuple) -> list[tuple]:
+    cur = _get_read_only_connection(database).execute(query, args)
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def map_query(database: str, query: str, shard_args: t.Sequence[tuple]) -> list[list[tuple]]:
+    """
+    Returns the rows of query for each args in shard_args, in the same order as shard_args.
+    """
+    futures = [_executor.submit(_fetch_shard, database, query, args) for args in shard_args]
+    return [future.result() for future in futures]
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed payloads of the experiment overview, so that any number of viewers cost one set of
+queries per refresh, see /api/experiments/<experiment>/dashboard.
+
+A periodic huey task (see tasks.py) requests the overview's default endpoints through a Flask test
+client, for each experiment with assigned workers, and stores the responses together in a SQLite
+file under CACHE_DIR, shared by all the web server's processes. Payloads are exactly what the
+endpoints return, with their default parameters (ex: each chart's own lookback).
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import typing as t
+from pathlib import Path
+from time import time
+
+from msgspec.json import encode
+
+from .config import CACHE_DIR
+
+if t.TYPE_CHECKING:
+    from flask.testing import FlaskClient
+
+# snapshots are only computed by huey's task, see tasks.py
+logger = logging.getLogger("huey.consumer")
+
+DEFAULT_PATH = CACHE_DIR / "dashboard_snapshots.sqlite"
+
+# the overview's requests, by payload name
+DASHBOARD_PAYLOADS = {
+    "charts": "/api/experiments/{experiment}/charts",
+    "latest": "/api/experiments/{experiment}/latest",
+    "media_rates": "/api/experiments/{experiment}/media_rates",
+    "recent_logs": "/api/experiments/{experiment}/recent_logs",
+}
+
+
+def _connect(path: Path | str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None, timeout=5)
+    conn.executescript(
+        """
+        PRAGMA journal_mode = WAL;
+        PRAGMA synchronous = 0;
+        CREATE TABLE IF NOT EXISTS snapshots (
+            experiment  TEXT PRIMARY KEY,
+            computed_at REAL NOT NULL, -- unix time
+            body        BLOB NOT NULL  -- {name: payload, ...}
+        );
+        """
+    )
+    return conn
+
+
+def compute_snapshot(client: FlaskClient, experiment: str) -> bytes:
+    """
+    The {name: payload} JSON of the experiment's overview. Payloads whose endpoint failed are left
+    out (and logged), so that the UI requests them itself.
+    """
+    parts = []
+    for name, path in DASHBOARD_PAYLOADS.items():
+        response = client.get(path.format(experiment=experiment))
+        if response.status_code == 200:
+            parts.append(encode(name) + b":" + response.get_data())
+        else:
+            logger.warning(
+                f"Left {name} out of {experiment}'s dashboard snapshot: {path.format(experiment=experiment)} returned {response.status}."
+            )
+    return b"{" + b",".join(parts) + b"}"
+
+
+def refresh_snapshots(client: FlaskClient, path: Path | str = DEFAULT_PATH) -> list[str]:
+    """
+    Recompute the snapshot of each experiment with assigned workers, and forget the others'.
+    Returns the experiments refreshed.
+    """
+    assignments = client.get("/api/experiments/assignment_count").get_json()
+    experiments = [row["experiment"] for row in assignments if row["worker_count"] > 0]
+
+    snapshots = [
+        (experiment, time(), compute_snapshot(client, experiment)) for experiment in experiments
+    ]
+
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                """
+                INSERT INTO snapshots (experiment, computed_at, body) VALUES (?, ?, ?)
+                ON CONFLICT (experiment) DO UPDATE SET
+                    computed_at=excluded.computed_at,
+                    body=excluded.body
+                """,
+                snapshots,
+            )
+            conn.execute(
+                f"DELETE FROM snapshots WHERE experiment NOT IN ({', '.join('?' for _ in experiments)})",
+                experiments,
+            )
+    finally:
+        conn.close()
+    return experiments
+
+
+def read_snapshot(experiment: str, path: Path | str = DEFAULT_PATH) -> tuple[float, bytes] | None:
+    """(computed_at, body) of the experiment's snapshot, or None if there isn't one."""
+    # read-only: no DDL on the read path, and the file is only created by refresh_snapshots.
+    try:
+        conn = sqlite3.connect(f"{Path(path).absolute().as_uri()}?mode=ro", uri=True, timeout=5)
+    except sqlite3.OperationalError:
+        return None  # the task hasn't run yet
+
+    try:
+        return conn.execute(
+            "SELECT computed_at, body FROM snapshots WHERE experiment=?", (experiment,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None  # no snapshots table yet
+    finally:
+        conn.close()
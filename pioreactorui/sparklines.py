@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Tiny SVG line charts of each unit's recent readings, rendered on the leader, so that pages showing
+many units (ex: the experiment overview's cards) don't download full time series to draw a trend.
+See /api/experiments/<experiment>/sparklines/<data_source>.
+
+Series are downsampled to about one point per horizontal pixel before being drawn. All of an
+experiment's sparklines share the same time axis, so gaps and late starts line up across units.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+DEFAULT_WIDTH = 100
+DEFAULT_HEIGHT = 24
+MAX_WIDTH = 1_000
+MAX_HEIGHT = 200
+STROKE_WIDTH = 1.5
+
+
+def sparkline_path(
+    x: np.ndarray, y: np.ndarray, width: int, height: int, x_domain: tuple[float, float]
+) -> str:
+    """
+    SVG path data of the points, sorted by x, scaled to a width x height box. x is placed on the
+    shared x_domain, and y on the series' own range, pointing up. Flat series are drawn in the middle.
+    """
+    if len(x) == 0:
+        return ""
+
+    x_min, x_max = x_domain
+    px = (x - x_min) / (x_max - x_min) * width if x_max > x_min else np.zeros(len(x))
+
+    # keep the stroke inside the box
+    padding = STROKE_WIDTH / 2
+    y_min, y_max = float(y.min()), float(y.max())
+    if y_max > y_min:
+        py = padding + (y_max - y) / (y_max - y_min) * (height - 2 * padding)
+    else:
+        py = np.full(len(y), height / 2)
+
+    if len(px) == 1:
+        # a lone point is drawn as a dot
+        return f"M{px[0]:.1f},{py[0]:.1f}h0"
+    return "M" + "L".join(f"{a:.1f},{b:.1f}" for a, b in zip(px.tolist(), py.tolist()))
+
+
+def render_sparkline(path: str, width: int, height: int) -> str:
+    """
+    A standalone SVG document of the path. The line is drawn in currentColor, so it takes the color
+    of the surrounding text when inlined.
+    """
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}"><path d="{path}" fill="none" stroke="currentColor" '
+        f'stroke-width="{STROKE_WIDTH}" stroke-linecap="round" stroke-linejoin="round"/></svg>'
+    )
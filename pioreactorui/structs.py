@@ -81,6 +81,18 @@ class ChartDescriptor(Struct, forbid_unknown_fields=True):  # type: ignore
         "stepAfter",
         "stepBefore",
     ] = "stepAfter"
+    # change_points for piecewise constant series (ex: LED intensities): only send their steps
+    encoding: t.Literal["rows", "change_points"] = "rows"
+
+
+#### Time series
+
+
+class TimeSeriesSource(Struct, frozen=True):  # type: ignore
+    data_source: str  # SQL table
+    column: str  # column in sql store
+    unit_expression: str = "pioreactor_unit"  # SQL expression that names each series
+    decimals: int = 7
 
 
 class ArgsOptionsEnvs(Struct):
@@ -3,6 +3,9 @@ from __future__ import annotations
 
 import logging
 import os
+import sqlite3
+from contextlib import contextmanager
+from functools import cache
 from logging import handlers
 from shlex import join
 from subprocess import check_call
@@ -11,7 +14,10 @@ from subprocess import Popen
 from subprocess import run
 from subprocess import STDOUT
 from typing import Any
+from typing import Iterator
 
+from huey import crontab
+from huey.exceptions import TaskLockedException
 from msgspec import DecodeError
 from pioreactor import whoami
 from pioreactor.config import config
@@ -27,6 +33,12 @@ from .config import CACHE_DIR
 from .config import env
 from .config import huey
 from .config import is_testing_env
+from .dosing_ledger import update_dosing_ledger
+from .dosing_ledger import vial_defaults
+from .latest_values import update_latest_values
+from .log_search import update_log_search_index
+from .rollups import update_rollups
+from .schema import apply_schema_changes
 
 
 logger = logging.getLogger("huey.consumer")
@@ -85,6 +97,100 @@ def pio_run(*args: str, env: dict[str, str] = {}) -> bool:
     return True
 
 
+@contextmanager
+def _connect_to_database() -> Iterator[sqlite3.Connection]:
+    con = sqlite3.connect(config.get("storage", "database"))
+    try:
+        con.executescript(
+            """
+            PRAGMA synchronous = 1; -- aka NORMAL, recommended when using WAL
+            PRAGMA busy_timeout = 15000;
+        """
+        )
+        yield con
+    finally:
+        con.close()
+
+
+@huey.on_startup()
+def apply_pending_schema_changes() -> None:
+    # runs in each worker when the consumer starts, ex: after an update. One of them applies the
+    # changes, the others skip them.
+    if not whoami.am_I_leader():
+        return
+
+    try:
+        with huey.lock_task("schema-changes-lock"):
+            with _connect_to_database() as con:
+                applied = apply_schema_changes(con)
+    except TaskLockedException:
+        return
+    except sqlite3.Error as e:
+        logger.error(f"Failed to apply the UI's schema changes: {e}")
+        return
+
+    if applied:
+        logger.info(f"Applied schema changes: {applied}")
+
+
+@huey.periodic_task(crontab(minute="*"))
+@huey.lock_task("read-models-lock")
+def update_read_models() -> dict[str, Any]:
+    """
+    Process new raw rows into the rollups, latest values, dosing ledger and log search index, one
+    after the other on one connection. Returns the number of raw rows each processed.
+    """
+    # only the leader has the time series, dosing_events and logs tables.
+    if not whoami.am_I_leader():
+        return {}
+
+    updates = {
+        "rollups": update_rollups,
+        "latest_values": update_latest_values,
+        "dosing_ledger": lambda con: update_dosing_ledger(con, vial_defaults(config)),
+        "log_search": update_log_search_index,
+    }
+
+    processed: dict[str, Any] = {}
+    with _connect_to_database() as con:
+        for name, update in updates.items():
+            try:
+                processed[name] = update(con)
+            except sqlite3.Error as e:
+                # ex: the database was locked for longer than busy_timeout. Retried next minute,
+                # and the others still run.
+                logger.warning(f"Failed to update {name}: {e}")
+
+    logger.debug(f"Updated read models: {processed}")
+    return processed
+
+
+@cache
+def _snapshots_app():
+    # built once per huey worker process, not every minute. Imported here, as the app's modules
+    # import this one.
+    from . import create_app
+
+    return create_app(connect_to_mqtt=False)
+
+
+@huey.periodic_task(crontab(minute="*"))
+@huey.lock_task("dashboard-snapshots-lock")
+def refresh_dashboard_snapshots() -> list[str]:
+    # only the leader serves the dashboard.
+    if not whoami.am_I_leader():
+        return []
+
+    # imported here, as the app's modules import this one.
+    from .snapshots import refresh_snapshots
+
+    with _snapshots_app().test_client() as client:
+        experiments = refresh_snapshots(client)
+
+    logger.debug(f"Refreshed dashboard snapshots of {experiments}.")
+    return experiments
+
+
 @huey.task()
 def add_new_pioreactor(new_pioreactor_name: str, version: str, model: str) -> bool:
     command = [PIO_EXECUTABLE, "workers", "add", new_pioreactor_name, "-v", version, "-m", model]
@@ -502,3 +608,33 @@ def multicast_delete_across_cluster(
     return {
         worker: response for (worker, response) in tasks.get(blocking=True, timeout=30)
     }  # add a timeout so that we don't hold up a thread forever.
+
+
+@huey.task(priority=5)
+def change_calibrations_across_cluster(
+    method: str,
+    endpoint: str,
+    workers: list[str],
+    json: dict | None = None,
+    invalidate_all: bool = False,
+    cache_path: str | None = None,
+) -> dict[str, Any]:
+    """
+    Send a request that changes the workers' calibrations, then forget the leader's cached copies
+    of their active calibrations (see calibrations.py), or of all units if invalidate_all. Forgetting
+    them before the workers have changed would let a request in between cache the old ones again.
+    """
+    from .calibrations import DEFAULT_PATH as DEFAULT_CALIBRATION_CACHE
+    from .calibrations import invalidate_active_calibrations
+
+    multicast = {
+        "POST": multicast_post_across_cluster,
+        "PATCH": multicast_patch_across_cluster,
+        "DELETE": multicast_delete_across_cluster,
+    }[method]
+    try:
+        return multicast.call_local(endpoint, workers, json=json)
+    finally:
+        invalidate_active_calibrations(
+            None if invalidate_all else workers, cache_path or DEFAULT_CALIBRATION_CACHE
+        )
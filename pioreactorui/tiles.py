@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Time series addressed by fixed, aligned time tiles instead of a lookback from NOW, see
+/api/experiments/<experiment>/tiles/...
+
+Tile `index` of a level covers [index * width, (index + 1) * width) in UTC epoch milliseconds, so a
+tile's URL always means the same rows. Once a tile is fully in the past (plus SETTLE_SECONDS, for
+rows that arrive late), and for tiles read from the rollups, once an update of the rollups has run
+since, its response can't change anymore: it's served with an immutable Cache-Control and kept in
+an on-disk TileCache.
+
+The TileCache is next to the database instead of in CACHE_DIR (a tmpfs on the Pi), as its entries
+never expire. It's bounded to MAX_CACHE_BYTES, evicting the oldest tiles first.
+"""
+from __future__ import annotations
+
+import sqlite3
+import typing as t
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+from time import time
+
+from pioreactor.config import config
+
+DEFAULT_PATH = Path(config.get("storage", "database")).parent / "time_series_tiles.sqlite"
+MAX_CACHE_BYTES = 128 * 1024 * 1024
+SETTLE_SECONDS = 300
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# per series, for tiles read from the raw tables.
+TILE_MAX_POINTS = 1_000
+
+
+class TileLevel(t.NamedTuple):
+    width_ms: int
+    resolution: str | None  # key of rollups.RESOLUTIONS read for the built-in series, or raw
+
+
+TILE_LEVELS = (
+    TileLevel(15 * 60_000, None),
+    TileLevel(3_600_000, None),
+    TileLevel(6 * 3_600_000, "1m"),
+    TileLevel(24 * 3_600_000, "10m"),
+    TileLevel(7 * 24 * 3_600_000, "1h"),
+)
+
+
+# the end of the last tile of each level is at most the last millisecond datetime can represent.
+MAX_EPOCH_MS = int(datetime(9999, 12, 31, 23, 59, 59, 999000, timezone.utc).timestamp() * 1000)
+
+
+def _to_timestamp(epoch_ms: int) -> str:
+    # to the microsecond, like the database's timestamps. Timestamps are compared as strings, and a
+    # row at ...:00.000500Z sorts before a bound written as ...:00.000Z, so it'd fall in the tile
+    # before. Tile bounds are whole seconds, so bucket_starts (...:00.000Z) compare right with these.
+    return datetime.fromtimestamp(epoch_ms / 1000, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def max_tile_index(level: TileLevel) -> int:
+    return MAX_EPOCH_MS // level.width_ms - 1
+
+
+def tile_range(level: TileLevel, index: int) -> tuple[str, str]:
+    """The [start, end) timestamps of a tile."""
+    return _to_timestamp(index * level.width_ms), _to_timestamp((index + 1) * level.width_ms)
+
+
+def tile_settles_at(level: TileLevel, index: int) -> float:
+    """The unix time from which the tile's rows won't change anymore: SETTLE_SECONDS after its end."""
+    return (index + 1) * level.width_ms / 1000 + SETTLE_SECONDS
+
+
+def tile_is_complete(level: TileLevel, index: int, now: float | None = None) -> bool:
+    """True if the tile ended at least SETTLE_SECONDS ago, so its rows won't change anymore."""
+    now = time() if now is None else now
+    return tile_settles_at(level, index) <= now
+
+
+class TileCache:
+    def __init__(self, path: Path | str = DEFAULT_PATH, max_bytes: int = MAX_CACHE_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def __enter__(self) -> TileCache:
+        self.conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+        self.conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = 1;
+            CREATE TABLE IF NOT EXISTS tiles (
+                key        TEXT PRIMARY KEY,
+                experiment TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                body       BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tiles_created_at_ix ON tiles (created_at);
+            CREATE INDEX IF NOT EXISTS tiles_experiment_ix ON tiles (experiment);
+            """
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_val, tb) -> None:
+        self.conn.close()
+
+    def get(self, key: str) -> bytes | None:
+        row = self.conn.execute("SELECT body FROM tiles WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, experiment: str, body: bytes) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tiles (key, experiment, created_at, body) VALUES (?, ?, ?, ?)",
+            (key, experiment, time(), body),
+        )
+        if self.size() > self.max_bytes:
+            # evict the oldest quarter of the tiles
+            self.conn.execute(
+                """
+                DELETE FROM tiles WHERE key IN (
+                    SELECT key FROM tiles ORDER BY created_at LIMIT (SELECT count(*) / 4 + 1 FROM tiles)
+                )
+                """
+            )
+
+    def size(self) -> int:
+        """Bytes used by the cache's file, without its free pages. Doesn't read the tiles."""
+        (page_size,) = self.conn.execute("PRAGMA page_size").fetchone()
+        (page_count,) = self.conn.execute("PRAGMA page_count").fetchone()
+        (freelist_count,) = self.conn.execute("PRAGMA freelist_count").fetchone()
+        return page_size * (page_count - freelist_count)
+
+    def delete_experiment(self, experiment: str) -> None:
+        self.conn.execute("DELETE FROM tiles WHERE experiment=?", (experiment,))
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized helpers for shaping time series before they are sent to the UI.
+
+The functions in here work on NumPy arrays that have already been pulled out of SQLite, and
+know nothing about Flask or the database.
+"""
+from __future__ import annotations
+
+import itertools
+import re
+import typing as t
+import warnings
+from operator import itemgetter
+
+import numpy as np
+from msgspec.json import encode
+
+from .structs import TimeSeriesSource
+
+BUILTIN_TIME_SERIES = {
+    source.data_source: source
+    for source in (
+        TimeSeriesSource("growth_rates", "rate", decimals=5),
+        TimeSeriesSource("temperature_readings", "temperature_c", decimals=2),
+        TimeSeriesSource("od_readings_filtered", "normalized_od_reading"),
+        TimeSeriesSource("od_readings", "od_reading", "pioreactor_unit || '-' || channel"),
+        TimeSeriesSource("raw_od_readings", "od_reading", "pioreactor_unit || '-' || channel"),
+    )
+}
+
+COLUMNAR_MIMETYPE = "application/x-pioreactor-columns"
+BUCKET_STATISTICS = ("mean", "min", "max", "count", "sum", "first", "last")
+BUCKET_UNITS_MS = {"s": 1_000, "m": 60_000, "h": 3_600_000, "d": 86_400_000}
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+ENCODINGS = ("rows", "change_points")
+DEFAULT_MAX_POINTS = 720
+MAX_POINTS_LIMIT = 10_000
+MAX_OVERLAY_SERIES = 200
+STREAM_CHUNK_ROWS = 2_000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets. Returns the (sorted) indices of the points to keep.
+
+    The first and last points are always kept. Interior points are split into n_out - 2
+    equal-count buckets, and from each bucket we keep the point that forms the largest triangle
+    with the previously kept point and the mean of the next bucket. The bucket means are computed
+    up front with cumulative sums, so the per-bucket work is a single vectorized expression.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x - x[0]  # keep the cumulative sums below well-conditioned
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    starts, ends = edges[:-1], edges[1:]
+
+    csx = np.concatenate(([0.0], np.cumsum(x)))
+    csy = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    mean_x = (csx[ends] - csx[starts]) / counts
+    mean_y = (csy[ends] - csy[starts]) / counts
+
+    # the "next bucket" of the last bucket is the final point.
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    indices = np.empty(n_out, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for b in range(n_out - 2):
+        s, e = starts[b], ends[b]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[b]) * (y[s:e] - ay) - (ax - x[s:e]) * (next_y[b] - ay))
+        a = s + int(np.argmax(area))
+        indices[b + 1] = a
+
+    return indices
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Keep the min and max of each equal-width time bucket (plus the endpoints), so spikes and
+    dips always survive. Returns sorted indices, at most n_out of them.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    n_buckets = (n_out - 2) // 2
+    span = x[-1] - x[0]
+    if span <= 0:
+        bucket = (np.arange(n) * n_buckets) // n
+    else:
+        bucket = np.minimum(((x - x[0]) / span * n_buckets).astype(np.intp), n_buckets - 1)
+
+    order = np.lexsort((y, bucket))  # by bucket, then by value
+    sorted_bucket = bucket[order]
+    first = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+
+    return np.union1d(np.union1d(order[first], order[last]), (0, n - 1))
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, method: str, max_points: int) -> np.ndarray:
+    if method == "lttb":
+        return lttb_indices(x, y, max_points)
+    elif method == "minmax":
+        return minmax_indices(x, y, max_points)
+    else:
+        raise ValueError(f"Unknown downsample method {method}")
+
+
+def split_by_unit(units: np.ndarray) -> list[slice]:
+    """
+    `units` must be sorted (or at least grouped). Returns one slice per contiguous run.
+    """
+    if len(units) == 0:
+        return []
+    boundaries = np.flatnonzero(units[1:] != units[:-1]) + 1
+    starts = np.r_[0, boundaries]
+    ends = np.r_[boundaries, len(units)]
+    return [slice(int(s), int(e)) for s, e in zip(starts, ends)]
+
+
+class Since(t.NamedTuple):
+    """
+    A poll's cursor: the newest timestamp already sent of each series. Units publish
+    independently, so one unit's rows can arrive after another unit's newer rows: each series is
+    only filtered by its own cursor. Series without one (ex: a unit that started publishing after
+    the last poll) are read from the floor, the oldest cursor.
+    """
+
+    cursors: dict[str, str]
+    floor: str
+
+    def of(self, series: str) -> str:
+        return self.cursors.get(series, self.floor)
+
+
+def next_cursors(since: Since | None, newest: t.Iterable[tuple[str, str]]) -> dict[str, str]:
+    """
+    The cursor to return to the client: since's cursors, updated with the (series, newest
+    timestamp) of the series that were sent.
+    """
+    cursors = dict(since.cursors) if since is not None else {}
+    cursors.update(newest)
+    return cursors
+
+
+def change_points(y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Run-length encoding of a piecewise constant series (ex: LED intensities). Returns the indices of
+    the rows kept, and how many rows each kept row stands for: itself and the rows up to the next
+    kept row. A row is kept if its value differs from the previous row's, and the last row is always
+    kept, so that the last step is drawn up to it.
+    """
+    n = len(y)
+    if n == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    keep = np.empty(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    keep[1:-1] = y[1:-1] != y[:-2]
+    indices = np.flatnonzero(keep)
+    return indices, np.diff(indices, append=n)
+
+
+def parse_bucket(bucket: str) -> int:
+    """
+    Parse a bucket width like `30s`, `10m`, `1h` or `1d` into milliseconds.
+    """
+    number, unit = bucket[:-1], bucket[-1:]
+    if unit not in BUCKET_UNITS_MS or not number.isdigit() or int(number) == 0:
+        raise ValueError(f"bucket must look like 30s, 10m, 1h or 1d, not `{bucket}`.")
+    return int(number) * BUCKET_UNITS_MS[unit]
+
+
+def bucket_statistics(
+    x: np.ndarray, y: np.ndarray, bucket_ms: int, stats: t.Iterable[str]
+) -> dict[str, np.ndarray]:
+    """
+    Per-bucket statistics of one series, in a single pass. x is epoch milliseconds, sorted. Buckets
+    are aligned to multiples of bucket_ms since the epoch, and empty buckets are skipped.
+
+    Returns {"start": bucket starts (epoch ms), stat: values, ...}.
+    """
+    stats = list(stats)
+    for stat in stats:
+        if stat not in BUCKET_STATISTICS:
+            raise ValueError(f"Unknown statistic {stat}")
+    if len(x) == 0:
+        return {"start": x[:0]} | {stat: y[:0] for stat in stats}
+
+    buckets = x // bucket_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(x)]
+
+    result = {"start": buckets[starts] * bucket_ms}
+    for stat in stats:
+        if stat == "count":
+            result[stat] = ends - starts
+        elif stat == "sum":
+            result[stat] = np.add.reduceat(y, starts)
+        elif stat == "mean":
+            result[stat] = np.add.reduceat(y, starts) / (ends - starts)
+        elif stat == "min":
+            result[stat] = np.minimum.reduceat(y, starts)
+        elif stat == "max":
+            result[stat] = np.maximum.reduceat(y, starts)
+        elif stat == "first":
+            result[stat] = y[starts]
+        elif stat == "last":
+            result[stat] = y[ends - 1]
+    return result
+
+
+def replicate_group(label: str) -> str:
+    """
+    The replicate group of a unit label: the label without a trailing replicate number, ex:
+    `control-1`, `control 2` and `control_03` are all in group `control`.
+    """
+    return re.sub(r"[\s_-]*\d+$", "", label.strip()) or label
+
+
+def replicate_bands(
+    series: list[tuple[np.ndarray, np.ndarray]], bucket_ms: int
+) -> dict[str, np.ndarray]:
+    """
+    Band statistics across the replicates of a group. Each replicate's (epoch ms, value) series is
+    averaged per bucket, the bucket means are aligned into a (replicates x buckets) matrix, and the
+    statistics are taken down each column, ignoring replicates with no data in that bucket.
+
+    Returns {"start", "mean", "sd", "p10", "p50", "p90", "n"}, one value per bucket.
+    """
+    per_replicate = [bucket_statistics(x, y, bucket_ms, ["mean"]) for x, y in series]
+    starts = np.unique(
+        np.concatenate([b["start"] for b in per_replicate] or [np.empty(0, np.int64)])
+    )
+
+    matrix = np.full((len(per_replicate), len(starts)), np.nan)
+    for row, b in zip(matrix, per_replicate):
+        row[np.searchsorted(starts, b["start"])] = b["mean"]
+
+    n = np.sum(~np.isnan(matrix), axis=0)
+    with warnings.catch_warnings():
+        # buckets with only one replicate have no sd
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean = np.nanmean(matrix, axis=0)
+        sd = np.nanstd(matrix, axis=0, ddof=1)
+        # reshaped, as NumPy drops the leading axis when there are no buckets
+        p10, p50, p90 = np.nanpercentile(matrix, [10, 50, 90], axis=0).reshape(3, len(starts))
+    return {"start": starts, "mean": mean, "sd": sd, "p10": p10, "p50": p50, "p90": p90, "n": n}
+
+
+def resample(x: np.ndarray, y: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """
+    Linearly interpolate a sorted series onto grid. Grid points outside the series' range are NaN,
+    not extrapolated.
+    """
+    if len(x) == 0:
+        return np.full(len(grid), np.nan)
+    return np.interp(grid, x, y, left=np.nan, right=np.nan)
+
+
+def to_timestamps(x: np.ndarray) -> list[str]:
+    """
+    Epoch milliseconds to timestamps like 2024-01-01T00:00:00.000Z.
+    """
+    return [f"{ts}Z" for ts in np.datetime_as_string(x.astype("datetime64[ms]"), unit="ms")]
+
+
+def parse_concatenated(csv: str | None, dtype=np.float64) -> np.ndarray:
+    """
+    Parse the output of SQLite's group_concat into an array, without creating a Python object per value.
+    """
+    if not csv:
+        return np.empty(0, dtype=dtype)
+    return np.fromstring(csv, dtype=dtype, sep=",")
+
+
+def parse_concatenated_series(
+    x_csv: str | None, y_csv: str | None, x_dtype=np.float64
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a series' x and y from group_concat, sorted by x. SQLite doesn't guarantee that
+    group_concat keeps the order of its subquery, only that x and y are concatenated in the same
+    order.
+    """
+    x = parse_concatenated(x_csv, dtype=x_dtype)
+    y = parse_concatenated(y_csv)
+    order = np.argsort(x, kind="stable")
+    return x[order], y[order]
+
+
+def encode_columns(
+    series: list[tuple[str, np.ndarray, np.ndarray]], metadata: dict[str, t.Any]
+) -> bytes:
+    """
+    Encode (name, epoch milliseconds, values) triples as the application/x-pioreactor-columns format:
+
+        b"PIOC" | uint32 header length | JSON header, space padded | body
+
+    All integers are little-endian. The header is
+
+        {"version": 1, "series": [{"name": ..., "length": n, "x_offset": ..., "y_offset": ...}, ...], **metadata}
+
+    and offsets are relative to the start of the body. Each series' x is an int64 array of epoch
+    milliseconds and y is a float32 array. Every array starts on an 8-byte boundary of the body (and
+    the body starts on an 8-byte boundary of the payload), so clients can wrap them directly in
+    BigInt64Array / Float32Array views.
+    """
+    chunks: list[bytes] = []
+    descriptors: list[dict[str, t.Any]] = []
+    offset = 0
+    for name, x, y in series:
+        x_bytes = np.asarray(x, dtype="<i8").tobytes()
+        y_bytes = np.asarray(y, dtype="<f4").tobytes()
+        y_padding = -len(y_bytes) % 8
+        descriptors.append(
+            {"name": name, "length": len(x), "x_offset": offset, "y_offset": offset + len(x_bytes)}
+        )
+        chunks.extend((x_bytes, y_bytes, b"\x00" * y_padding))
+        offset += len(x_bytes) + len(y_bytes) + y_padding
+
+    header = encode({"version": 1, "series": descriptors} | metadata)
+    header += b" " * (-(len(header) + 8) % 8)
+    return b"".join([b"PIOC", len(header).to_bytes(4, "little"), header, *chunks])
+
+
+def stream_series_json(
+    rows: t.Iterable[tuple],
+    since: Since | None = None,
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+    **fields: t.Any,
+) -> t.Iterator[bytes]:
+    """
+    Write the {"data": ..., "series": ..., "cursor": ...} payload incrementally, from (series,
+    timestamp, y) rows sorted by series, then timestamp. Only chunk_rows rows are held at once, and
+    each chunk is yielded as soon as it's encoded. `data` comes first, as a series' name is only
+    known once its rows are read. fields (ex: resolution) are added at the end.
+    """
+    cursor = next_cursors(since, ())
+    names: list[str] = []
+    rows = iter(rows)
+    yield b'{"data":['
+
+    while chunk := list(itertools.islice(rows, chunk_rows)):
+        parts = []
+        for name, group in itertools.groupby(chunk, key=itemgetter(0)):
+            points = [{"x": timestamp, "y": y} for _, timestamp, y in group]
+            if names and names[-1] == name:
+                parts.append(b",")  # continues the previous chunk's series
+            else:
+                parts.append(b"],[" if names else b"[")
+                names.append(name)
+            parts.append(encode(points)[1:-1])
+            # rows are sorted by timestamp within a series, so the last one is its newest.
+            cursor[name] = points[-1]["x"]
+        yield b"".join(parts)
+
+    yield (b"]]," if names else b"],") + encode({"series": names, "cursor": cursor, **fields})[1:]
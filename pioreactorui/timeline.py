@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+An experiment's events (dosing, LED and PWM changes, logs) as one stream in timestamp order, see
+/api/experiments/<experiment>/timeline.
+
+Each source table is read by its own cursor, ordered by (timestamp, ROWID) so that SQLite can walk
+an (experiment, timestamp) index instead of sorting (see sql/timeline_indexes.sql, applied by
+schema.py), and the cursors are merged lazily with a heap: a page of n events steps each cursor at
+most n + 1 times, no matter how long the experiment is.
+
+Pages are keyset-paginated: the cursor is the (timestamp, source, ROWID) of the last event sent,
+and the next page starts strictly after it.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import typing as t
+
+from msgspec import Struct
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1_000
+
+
+class TimelineSource(Struct, frozen=True):  # type: ignore
+    type: str  # the events' type, in the response
+    table: str
+    columns: tuple[str, ...]  # returned as each event's details
+
+
+TIMELINE_SOURCES = (
+    TimelineSource("dosing", "dosing_events", ("event", "volume_change_ml", "source_of_event")),
+    TimelineSource("led", "led_change_events", ("channel", "intensity", "source_of_event")),
+    TimelineSource(
+        "pwm", "pwm_dcs", ("channel_1", "channel_2", "channel_3", "channel_4", "channel_5")
+    ),
+    TimelineSource("log", "logs", ("level", "message", "task", "source")),
+)
+
+
+class TimelineCursor(t.NamedTuple):
+    timestamp: str
+    source: int  # index into TIMELINE_SOURCES
+    rowid: int
+
+
+def encode_cursor(cursor: TimelineCursor) -> str:
+    return f"{cursor.timestamp},{TIMELINE_SOURCES[cursor.source].type},{cursor.rowid}"
+
+
+def parse_cursor(cursor: str) -> TimelineCursor:
+    try:
+        timestamp, type_, rowid = cursor.split(",")
+        source = next(i for i, s in enumerate(TIMELINE_SOURCES) if s.type == type_)
+        return TimelineCursor(timestamp, source, int(rowid))
+    except (ValueError, StopIteration):
+        raise ValueError(f"Invalid cursor `{cursor}`.")
+
+
+def timeline_query(
+    index: int,
+    experiment: str,
+    start: str | None,
+    end: str | None,
+    after: TimelineCursor | None,
+    extra_filter: str = "",
+) -> tuple[str, tuple]:
+    """
+    SQL (and its args) for one source's events in [start, end) that come after the cursor in the
+    merged order.
+    """
+    source = TIMELINE_SOURCES[index]
+
+    filters: list[str] = ["experiment=?"]
+    args: list[t.Any] = [experiment]
+    if start is not None:
+        filters.append("timestamp >= ?")
+        args.append(start)
+    if end is not None:
+        filters.append("timestamp < ?")
+        args.append(end)
+
+    if after is None:
+        pass
+    elif index > after.source:
+        filters.append("timestamp >= ?")
+        args.append(after.timestamp)
+    elif index < after.source:
+        filters.append("timestamp > ?")
+        args.append(after.timestamp)
+    else:
+        filters.append("(timestamp, ROWID) > (?, ?)")
+        args.extend((after.timestamp, after.rowid))
+
+    if extra_filter:
+        filters.append(extra_filter)
+
+    query = f"""
+        SELECT timestamp, ROWID, pioreactor_unit, {', '.join(source.columns)}
+        FROM {source.table}
+        WHERE {' AND '.join(filters)}
+        ORDER BY timestamp, ROWID;
+    """
+    return query, tuple(args)
+
+
+def _keyed(index: int, stream: t.Iterable[tuple]) -> t.Iterator[tuple[str, int, int, tuple]]:
+    # (timestamp, source, ROWID) is unique, so rows themselves are never compared.
+    for row in stream:
+        yield row[0], index, row[1], row
+
+
+def merge_timelines(
+    streams: t.Sequence[t.Iterable[tuple]], limit: int
+) -> tuple[list[dict[str, t.Any]], TimelineCursor | None]:
+    """
+    k-way merge of each source's (timestamp, ROWID, pioreactor_unit, *columns) rows, in the order of
+    TIMELINE_SOURCES. Returns up to limit events, and the cursor of the next page, or None if there
+    are no more events.
+    """
+    merged = iter(heapq.merge(*(_keyed(index, stream) for index, stream in enumerate(streams))))
+
+    events = []
+    last = None
+    for timestamp, index, rowid, row in itertools.islice(merged, limit):
+        source = TIMELINE_SOURCES[index]
+        events.append(
+            {
+                "timestamp": timestamp,
+                "type": source.type,
+                "pioreactor_unit": row[2],
+                "details": dict(zip(source.columns, row[3:])),
+            }
+        )
+        last = TimelineCursor(timestamp, index, rowid)
+
+    has_more = next(merged, None) is not None
+    return events, last if has_more else None
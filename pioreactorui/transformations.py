@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Evaluate charts' y_transformation on the leader, over a whole column at once.
+
+Charts describe their transformation as a JavaScript arrow function, like `(y) => 24 * y`. Only a
+small, arithmetic subset of JavaScript is accepted here:
+
+ - numbers, the function's parameter, parentheses
+ - the operators + - * / % ** (and unary - and +)
+ - Math's constants and functions, like Math.PI, Math.log(y) or Math.pow(y, 2)
+
+This subset happens to also be valid Python, so it's parsed with the ast module and only the node
+types above are allowed through. Anything else (names, attribute access, indexing, comparisons,
+keywords...) raises a ValueError, in which case the UI keeps applying the transformation itself.
+"""
+from __future__ import annotations
+
+import ast
+import re
+import typing as t
+from functools import lru_cache
+
+import numpy as np
+
+MAX_EXPRESSION_LENGTH = 500
+
+MATH_CONSTANTS = {
+    "E": np.e,
+    "LN2": np.log(2),
+    "LN10": np.log(10),
+    "LOG2E": np.log2(np.e),
+    "LOG10E": np.log10(np.e),
+    "PI": np.pi,
+    "SQRT1_2": np.sqrt(0.5),
+    "SQRT2": np.sqrt(2),
+}
+
+MATH_FUNCTIONS: dict[str, t.Callable[..., np.ndarray]] = {
+    "abs": np.abs,
+    "ceil": np.ceil,
+    "cos": np.cos,
+    "exp": np.exp,
+    "expm1": np.expm1,
+    "floor": np.floor,
+    "log": np.log,
+    "log10": np.log10,
+    "log1p": np.log1p,
+    "log2": np.log2,
+    "max": np.maximum,
+    "min": np.minimum,
+    "pow": np.power,
+    "round": lambda y: np.floor(y + 0.5),  # JS rounds halves up, np.round rounds to even
+    "sign": np.sign,
+    "sin": np.sin,
+    "sqrt": np.sqrt,
+    "tan": np.tan,
+    "trunc": np.trunc,
+}
+
+BINARY_OPERATORS: dict[type, t.Callable[[t.Any, t.Any], np.ndarray]] = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Mod: np.fmod,  # JS's % takes the sign of the dividend, like fmod
+    ast.Pow: np.power,
+}
+
+_ARROW_FUNCTION = re.compile(
+    r"""
+    \s*(?:\(\s*(?P<parenthesized>[A-Za-z_]\w*)\s*\)|(?P<bare>[A-Za-z_]\w*))\s*=>\s*
+    (?:\{\s*return\s+(?P<block>.+?);?\s*\}|(?P<expression>.+?))\s*;?\s*
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+Evaluator = t.Callable[[np.ndarray], t.Any]
+
+
+def _compile_node(node: ast.AST, parameter: str) -> Evaluator:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = float(node.value)  # no arbitrary-precision integer arithmetic, ex: 9 ** 9 ** 9
+        return lambda y: value
+
+    elif isinstance(node, ast.Name) and node.id == parameter:
+        return lambda y: y
+
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _compile_node(node.operand, parameter)
+        if isinstance(node.op, ast.USub):
+            return lambda y: np.negative(operand(y))
+        return operand
+
+    elif isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        operator = BINARY_OPERATORS[type(node.op)]
+        left, right = _compile_node(node.left, parameter), _compile_node(node.right, parameter)
+        return lambda y: operator(left(y), right(y))
+
+    elif (
+        isinstance(node, ast.Attribute)
+        and isinstance(node.value, ast.Name)
+        and node.value.id == "Math"
+        and node.attr in MATH_CONSTANTS
+    ):
+        value = float(MATH_CONSTANTS[node.attr])
+        return lambda y: value
+
+    elif (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "Math"
+        and node.func.attr in MATH_FUNCTIONS
+        and not node.keywords
+    ):
+        name = node.func.attr
+        function = MATH_FUNCTIONS[name]
+        arguments = [_compile_node(argument, parameter) for argument in node.args]
+        if name in ("min", "max") and len(arguments) >= 1:
+            # Math.min and Math.max are variadic
+            return lambda y: _reduce(function, [argument(y) for argument in arguments])
+        elif len(arguments) == (2 if name == "pow" else 1):
+            return lambda y: function(*(argument(y) for argument in arguments))
+
+    raise ValueError(f"`{ast.unparse(node)}` isn't allowed in a y_transformation.")
+
+
+def _reduce(function: t.Callable[[t.Any, t.Any], t.Any], values: list[t.Any]) -> t.Any:
+    result = values[0]
+    for value in values[1:]:
+        result = function(result, value)
+    return result
+
+
+@lru_cache(maxsize=128)
+def compile_transformation(source: str) -> t.Callable[[np.ndarray], np.ndarray] | None:
+    """
+    Compile a y_transformation like `(y) => 24 * y` into a function of a float array. Returns None
+    for the identity, `(y) => y`. Raises ValueError if source isn't in the subset described above.
+    """
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"y_transformation is longer than {MAX_EXPRESSION_LENGTH} characters.")
+
+    match = _ARROW_FUNCTION.fullmatch(source)
+    if match is None:
+        raise ValueError(
+            f"y_transformation `{source}` isn't an arrow function, like (y) => 24 * y."
+        )
+
+    parameter = match.group("parenthesized") or match.group("bare")
+    expression = match.group("block") or match.group("expression")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except (SyntaxError, RecursionError):
+        raise ValueError(f"Can't parse y_transformation `{source}`.")
+
+    if isinstance(tree.body, ast.Name) and tree.body.id == parameter:
+        return None
+
+    evaluate = _compile_node(tree.body, parameter)
+
+    def transformation(y: np.ndarray) -> np.ndarray:
+        with np.errstate(all="ignore"):
+            # like JS, 1/0 is Infinity and Math.log(-1) is NaN
+            return np.broadcast_to(evaluate(y), np.shape(y)).astype(np.float64)
+
+    return transformation
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+ROWID watermarks of the read models maintained incrementally from raw tables (see rollups.py,
+latest_values.py and dosing_ledger.py), all updated by one periodic huey task (see tasks.py).
+
+A watermark is the last ROWID a read model processed, per raw table, and a fingerprint of the newest
+row at or below it. SQLite can renumber ROWIDs (ex: a VACUUM compacting the gaps left by deleted
+rows), and comparing max(ROWID) with the watermark misses it once new rows pushed max(ROWID) back
+up. Instead, if that row's fingerprint changed, the read model starts over. Deleting the row also
+makes it start over, which is harmless.
+"""
+from __future__ import annotations
+
+import sqlite3
+import typing as t
+from hashlib import blake2b
+
+CREATE_WATERMARKS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        data_source  TEXT PRIMARY KEY,
+        last_rowid   INTEGER NOT NULL,
+        last_row     TEXT,             -- fingerprint of the newest row at or below last_rowid
+        is_caught_up INTEGER NOT NULL,
+        updated_at   TEXT NOT NULL
+    );
+"""
+
+
+def fetch_row(con: sqlite3.Connection, query: str, args=()) -> t.Any:
+    # independent of whatever row_factory the connection has.
+    cur = con.cursor()
+    cur.row_factory = None
+    row = cur.execute(query, args).fetchone()
+    cur.close()
+    return row
+
+
+def fetch_scalar(con: sqlite3.Connection, query: str, args=()) -> t.Any:
+    row = fetch_row(con, query, args)
+    return row[0] if row else None
+
+
+def fetch_all(con: sqlite3.Connection, query: str, args=()) -> list[tuple]:
+    cur = con.cursor()
+    cur.row_factory = None
+    rows = cur.execute(query, args).fetchall()
+    cur.close()
+    return rows
+
+
+def row_fingerprint(con: sqlite3.Connection, table: str, rowid: int) -> str | None:
+    """
+    A fingerprint of the newest row of table at or below rowid (including its ROWID), or None if
+    there's none.
+    """
+    row = fetch_row(
+        con, f"SELECT ROWID, * FROM {table} WHERE ROWID <= ? ORDER BY ROWID DESC LIMIT 1", (rowid,)
+    )
+    if row is None:
+        return None
+    return blake2b(repr(row).encode(), digest_size=8).hexdigest()
+
+
+class Batch(t.NamedTuple):
+    last_rowid: int  # ROWIDs above were never processed
+    upper_rowid: int  # this batch is the ROWIDs in (last_rowid, upper_rowid]
+    max_rowid: int
+    restarted: bool  # ROWIDs were renumbered: discard what was processed, and start over
+
+    @property
+    def is_caught_up(self) -> bool:
+        return self.upper_rowid == self.max_rowid
+
+    @property
+    def size(self) -> int:
+        return self.upper_rowid - self.last_rowid
+
+
+def next_batch(
+    con: sqlite3.Connection, watermarks_table: str, data_source: str, batch_size: int
+) -> Batch | None:
+    """
+    The next batch of data_source's ROWIDs to process, or None if data_source doesn't exist (yet).
+    """
+    try:
+        max_rowid = fetch_scalar(con, f"SELECT coalesce(max(ROWID), 0) FROM {data_source}")
+    except sqlite3.OperationalError:
+        return None
+
+    last_rowid, last_row = fetch_row(
+        con,
+        f"SELECT last_rowid, last_row FROM {watermarks_table} WHERE data_source=?",
+        (data_source,),
+    ) or (0, None)
+
+    restarted = last_rowid > 0 and row_fingerprint(con, data_source, last_rowid) != last_row
+    if restarted:
+        last_rowid = 0
+
+    return Batch(last_rowid, min(max_rowid, last_rowid + batch_size), max_rowid, restarted)
+
+
+def save_watermark(
+    con: sqlite3.Connection, watermarks_table: str, data_source: str, batch: Batch
+) -> None:
+    """Record that the batch was processed, in the same transaction as processing it."""
+    con.execute(
+        f"""
+        INSERT INTO {watermarks_table} (data_source, last_rowid, last_row, is_caught_up, updated_at)
+        VALUES (?, ?, ?, ?, STRFTIME('%Y-%m-%dT%H:%M:%f000Z', 'NOW'))
+        ON CONFLICT (data_source) DO UPDATE SET
+            last_rowid = excluded.last_rowid,
+            last_row = excluded.last_row,
+            is_caught_up = excluded.is_caught_up,
+            updated_at = excluded.updated_at;
+        """,
+        (
+            data_source,
+            batch.upper_rowid,
+            row_fingerprint(con, data_source, batch.upper_rowid),
+            int(batch.is_caught_up),
+        ),
+    )
@@ -0,0 +1,10 @@
+-- Indexes for /api/experiments/<experiment>/timeline (see pioreactorui/timeline.py): each event table
+-- is read in (experiment, timestamp) order, without sorting the experiment's rows first.
+--
+-- Building them reads the whole tables and holds the database's write lock, so they are a one-time
+-- schema change, applied by the huey consumer when it starts after an install or update (see
+-- pioreactorui/schema.py).
+CREATE INDEX IF NOT EXISTS dosing_events_timeline_ix ON dosing_events (experiment, timestamp);
+CREATE INDEX IF NOT EXISTS led_change_events_timeline_ix ON led_change_events (experiment, timestamp);
+CREATE INDEX IF NOT EXISTS pwm_dcs_timeline_ix ON pwm_dcs (experiment, timestamp);
+CREATE INDEX IF NOT EXISTS logs_timeline_ix ON logs (experiment, timestamp);
@@ -15,14 +15,19 @@ from pioreactor.mureq import Response
 
 from pioreactorui import _make_dicts
 from pioreactorui import create_app
+from pioreactorui.schema import apply_schema_changes
 
 
 @pytest.fixture()
-def app():
+def app(tmp_path):
     app = create_app()
     app.config.update(
         {
             "TESTING": True,
+            "TIME_SERIES_CACHE": tmp_path / "time_series_results.sqlite",
+            "CALIBRATION_CACHE": tmp_path / "active_calibrations.sqlite",
+            "DASHBOARD_SNAPSHOTS": tmp_path / "dashboard_snapshots.sqlite",
+            "TILE_CACHE": tmp_path / "time_series_tiles.sqlite",
         }
     )
 
@@ -37,6 +42,7 @@ def app():
             db = g._app_database = sqlite3.connect(":memory:")
             db.row_factory = _make_dicts
             db.executescript(table_statements)  # Set up schema
+            apply_schema_changes(db)
             with app.open_resource("tests/example_data.sql") as f:
                 db.executescript(f.read().decode("utf8"))
 
@@ -67,8 +73,10 @@ class CapturedRequest:
 
 
 @contextlib.contextmanager
-def capture_requests():
+def capture_requests(responses: dict[str, bytes] | None = None):
+    # responses: bodies to return, by path. Other requests get {"mocked": "response"}.
     bucket = []
+    responses = responses or {}
 
     def mock_request(method, url, **kwargs):
         # Capture the request details
@@ -79,7 +87,7 @@ def capture_requests():
             json = to_builtins(json)
         bucket.append(CapturedRequest(method, url, headers, body, json))
         # Return a mock response object
-        return Response(url, 200, {}, b'{"mocked": "response"}')
+        return Response(url, 200, {}, responses.get(urlparse(url).path, b'{"mocked": "response"}'))
 
     # Patch the mureq.request method
     with patch("pioreactor.mureq.request", side_effect=mock_request):
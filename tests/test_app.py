@@ -2,8 +2,12 @@
 from __future__ import annotations
 
 import os
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
 
 import pytest
+from flask import g
 
 from .conftest import capture_requests
 from pioreactorui.config import huey
@@ -13,6 +17,21 @@ IN_GITHUB_ACTIONS = os.getenv("GITHUB_ACTIONS") == "true"
 huey.immediate = True
 
 
+def insert_recent_rows(table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    # the sample data is too old for any lookback, so time series tests add their own.
+    placeholders = ", ".join("?" for _ in columns)
+    g._app_database.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+    )
+    g._app_database.commit()
+
+
+def recent_timestamp(minutes_ago: float) -> str:
+    # same format as pioreactor's timestamps, see pioreactor.utils.timing.to_iso_format
+    dt = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
 def test_latest_experiment_endpoint(client):
     response = client.get("/api/experiments/latest")
 
@@ -148,6 +167,423 @@ def test_upsert_unit_labels(client):
     assert data["unit1"] == "Updated Reactor 1"
 
 
+def test_timeline_merges_events_in_timestamp_order(client):
+    insert_recent_rows(
+        "dosing_events",
+        (
+            "experiment",
+            "pioreactor_unit",
+            "timestamp",
+            "event",
+            "volume_change_ml",
+            "source_of_event",
+        ),
+        [
+            ("exp1", "unit1", "2024-01-01T00:00:01.000Z", "add_media", 1.0, "chemostat"),
+            ("exp1", "unit1", "2024-01-01T00:00:03.000Z", "remove_waste", 1.0, "chemostat"),
+            ("exp2", "unit3", "2024-01-01T00:00:02.000Z", "add_media", 1.0, "chemostat"),
+        ],
+    )
+    insert_recent_rows(
+        "led_change_events",
+        ("experiment", "pioreactor_unit", "timestamp", "channel", "intensity", "source_of_event"),
+        [("exp1", "unit2", "2024-01-01T00:00:02.000Z", "A", 50.0, "led_automation")],
+    )
+    insert_recent_rows(
+        "logs",
+        ("experiment", "pioreactor_unit", "timestamp", "message", "source", "level", "task"),
+        [
+            ("exp1", "unit1", "2024-01-01T00:00:01.000Z", "Dosed", "app", "INFO", "dosing"),
+            ("exp1", "unit1", "2024-01-01T00:00:02.000Z", "Debugging", "app", "DEBUG", "dosing"),
+            ("exp1", "unit1", "2024-01-01T00:00:04.000Z", "Done", "app", "INFO", "dosing"),
+        ],
+    )
+
+    url = "/api/experiments/exp1/timeline?start=2024-01-01T00:00:00.000Z"
+    data = client.get(url).get_json()
+    assert data["cursor"] is None
+    assert [(event["type"], event["timestamp"][17:19]) for event in data["events"]] == [
+        ("dosing", "01"),
+        ("log", "01"),
+        ("led", "02"),
+        ("dosing", "03"),
+        ("log", "04"),
+    ]
+    assert data["events"][2]["details"] == {
+        "channel": "A",
+        "intensity": 50.0,
+        "source_of_event": "led_automation",
+    }
+
+    # keyset pages, of the merged stream
+    pages, cursor = [], ""
+    while cursor is not None:
+        page = client.get(url + "&limit=2" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        cursor = page["cursor"]
+        pages.append(page["events"])
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [event for page in pages for event in page] == data["events"]
+
+    data = client.get(url + "&end=2024-01-01T00:00:03.000Z&min_level=DEBUG").get_json()
+    assert [event["type"] for event in data["events"]] == ["dosing", "log", "led", "log"]
+
+    for query in ("start=yesterday", "limit=0", "cursor=abc"):
+        response = client.get(f"/api/experiments/exp1/timeline?{query}")
+        assert response.status_code == 400
+
+    # each source is read in the order of its index, see sql/timeline_indexes.sql, applied once
+    from pioreactorui.schema import apply_schema_changes
+
+    assert apply_schema_changes(g._app_database) == []
+    from pioreactorui.timeline import timeline_query
+    from pioreactorui.timeline import TIMELINE_SOURCES
+
+    for index, source in enumerate(TIMELINE_SOURCES):
+        query, args = timeline_query(index, "exp1", "2024-01-01T00:00:00.000Z", None, None)
+        plan = " ".join(
+            row["detail"] for row in g._app_database.execute("EXPLAIN QUERY PLAN " + query, args)
+        )
+        assert f"{source.table}_timeline_ix" in plan and "TEMP B-TREE" not in plan
+
+
+def test_log_search(client, monkeypatch):
+    from urllib.parse import quote
+
+    from pioreactorui import log_search
+
+    columns = ("experiment", "pioreactor_unit", "timestamp", "message", "source", "level", "task")
+    insert_recent_rows(
+        "logs",
+        columns,
+        [
+            (
+                "exp1",
+                "unit1",
+                "2024-01-01T00:00:01.000Z",
+                "Pump media: 1.0mL",
+                "app",
+                "INFO",
+                "dosing_automation",
+            ),
+            (
+                "exp1",
+                "unit2",
+                "2024-01-01T00:00:02.000Z",
+                "Unable to reach pump",
+                "app",
+                "ERROR",
+                "add_media",
+            ),
+            (
+                "exp2",
+                "unit3",
+                "2024-01-01T00:00:03.000Z",
+                "Pump pump pump",
+                "app",
+                "DEBUG",
+                "add_media",
+            ),
+            (
+                "exp1",
+                "$broadcast",
+                "2024-01-01T00:00:04.000Z",
+                "Pump calibrations updated",
+                "app",
+                "NOTICE",
+                "calibrations",
+            ),
+        ],
+    )
+
+    assert client.get("/api/logs/search?q=pump").status_code == 503
+
+    monkeypatch.setattr(log_search, "BATCH_SIZE", 3)
+    assert log_search.update_log_search_index(g._app_database) == 3  # of the 7 logs
+    # new logs are indexed by the triggers
+    insert_recent_rows(
+        "logs",
+        columns,
+        [
+            (
+                "exp1",
+                "unit1",
+                "2024-01-01T00:00:05.000Z",
+                "Pump media: 0.5mL",
+                "app",
+                "INFO",
+                "dosing_automation",
+            )
+        ],
+    )
+
+    data = client.get("/api/logs/search?q=pump").get_json()
+    assert data["complete"] is False
+    assert [hit["timestamp"][17:19] for hit in data["hits"]] == ["05"]
+
+    while log_search.update_log_search_index(g._app_database):
+        pass
+
+    data = client.get("/api/logs/search?q=pump&min_level=DEBUG").get_json()
+    assert data["complete"] is True
+    assert data["cursor"] is None
+    # newest first
+    assert [hit["timestamp"][17:19] for hit in data["hits"]] == ["05", "04", "03", "02", "01"]
+
+    # the best match first, in one page
+    best = client.get("/api/logs/search?q=pump&min_level=DEBUG&order=best&limit=2").get_json()
+    assert best["cursor"] is None
+    assert best["hits"][0] == {
+        "timestamp": "2024-01-01T00:00:03.000Z",
+        "level": "DEBUG",
+        "pioreactor_unit": "unit3",
+        "message": "Pump pump pump",
+        "task": "add_media",
+        "experiment": "exp2",
+    }
+    assert len(best["hits"]) == 2
+
+    # keyset pages, unaffected by logs added in between (which change every log's bm25 rank)
+    pages, cursor = [], ""
+    while cursor is not None:
+        page = client.get(
+            "/api/logs/search?q=pump&min_level=DEBUG&limit=2"
+            + (f"&cursor={quote(cursor)}" if cursor else "")
+        ).get_json()
+        cursor = page["cursor"]
+        pages.append(page["hits"])
+        insert_recent_rows(
+            "logs", columns, [("exp1", "unit1", recent_timestamp(0), "pump", "app", "INFO", "")]
+        )
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [hit for page in pages for hit in page] == data["hits"]
+    g._app_database.execute("DELETE FROM logs WHERE message='pump'")
+    g._app_database.commit()
+
+    def search(query: str) -> list[str]:
+        hits = client.get(f"/api/logs/search?{query}").get_json()["hits"]
+        return sorted(hit["timestamp"][17:19] for hit in hits)
+
+    assert search("q=pump&experiment=exp1") == ["01", "02", "04", "05"]
+    assert search("q=pump&unit=unit1") == ["01", "04", "05"]  # and the logs sent to all units
+    assert search("q=pump&min_level=ERROR") == ["02"]
+    assert search("q=media+1.0mL") == ["01"]
+    assert search("q=add_media") == ["02"]  # tasks are searched too
+    assert search("q=mixing") == ["00"]  # the sample data, back-filled
+
+    g._app_database.execute("DELETE FROM logs WHERE message='Unable to reach pump'")
+    g._app_database.execute(
+        "UPDATE logs SET message='Started blending' WHERE message='Started mixing'"
+    )
+    g._app_database.commit()
+    assert search("q=pump&min_level=ERROR") == []
+    assert search("q=blending") == ["00"]
+    assert search("q=mixing") == []
+
+    # the logs are rebuilt without firing the triggers, renumbering their ROWIDs like a VACUUM
+    # can, and new logs then push max(ROWID) back up: the index is rebuilt too.
+    for trigger in ("insert", "delete", "update"):
+        g._app_database.execute(f"DROP TRIGGER logs_fts_{trigger}")
+    g._app_database.executescript(
+        """
+        CREATE TEMP TABLE kept_logs AS SELECT * FROM logs WHERE message != 'Started blending';
+        DELETE FROM logs;
+        INSERT INTO logs SELECT * FROM kept_logs;
+        """
+    )
+    insert_recent_rows(
+        "logs",
+        columns,
+        [
+            ("exp1", "unit1", f"2024-01-01T00:00:0{i}.000Z", "Stirring", "app", "INFO", "stirring")
+            for i in range(6, 9)
+        ],
+    )
+    while log_search.update_log_search_index(g._app_database):
+        pass
+    assert search("q=blending") == []
+    assert search("q=stirring") == ["06", "07", "08"]
+    assert search("q=pump&min_level=DEBUG") == ["01", "03", "04", "05"]
+
+    for query in (
+        "q=",
+        "q=pump&limit=0",
+        "q=pump&cursor=abc",
+        "q=pump&order=worst",
+        "q=pump&order=best&cursor=2024-01-01T00:00:01.000Z,1",
+    ):
+        assert client.get(f"/api/logs/search?{query}").status_code == 400
+
+
+def test_latest_values_of_each_unit(client):
+    from pioreactorui.latest_values import update_latest_values
+
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [
+            ("exp1", "unit1", recent_timestamp(3), 0.1),
+            ("exp1", "unit1", recent_timestamp(2), 0.2),
+            ("exp1", "unit2", recent_timestamp(2), 0.5),
+            ("exp2", "unit3", recent_timestamp(1), 0.9),
+        ],
+    )
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [("exp1", "unit1", recent_timestamp(2), 0.05, 90, 2)],
+    )
+
+    # before the table is maintained, values are read from the raw tables
+    before = client.get("/api/experiments/exp1/latest").get_json()["units"]
+    assert before["unit1"]["growth_rate"]["value"] == 0.2
+    assert before["unit1"]["od_reading_2"]["value"] == 0.05
+
+    assert update_latest_values(g._app_database)["growth_rates"] > 0
+
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [
+            ("exp1", "unit2", recent_timestamp(1), 0.6),
+            ("exp1", "unit1", recent_timestamp(10), 0.0),  # arrives late
+        ],
+    )
+    insert_recent_rows(
+        "dosing_events",
+        (
+            "experiment",
+            "pioreactor_unit",
+            "timestamp",
+            "event",
+            "volume_change_ml",
+            "source_of_event",
+        ),
+        [("exp1", "unit2", recent_timestamp(1), "add_media", 1.0, "chemostat")],
+    )
+
+    # the rows added since the last update are included too
+    for _ in range(2):
+        units = client.get("/api/experiments/exp1/latest").get_json()["units"]
+        assert sorted(units) == ["unit1", "unit2"]
+        assert units["unit1"]["growth_rate"]["value"] == 0.2
+        assert units["unit2"]["growth_rate"]["value"] == 0.6
+        assert units["unit2"]["dosing_event"]["value"] == "add_media"
+        assert units["unit2"]["dosing_volume_change_ml"]["value"] == 1.0
+        assert units["unit1"]["od_reading_2"] == before["unit1"]["od_reading_2"]
+
+        update_latest_values(g._app_database)
+
+
+def test_media_rates_and_dosing_ledger(client):
+    from pioreactorui.dosing_ledger import update_dosing_ledger
+
+    columns = (
+        "experiment",
+        "pioreactor_unit",
+        "timestamp",
+        "event",
+        "volume_change_ml",
+        "source_of_event",
+    )
+    insert_recent_rows(
+        "dosing_events",
+        columns,
+        [
+            ("exp1", "unit1", recent_timestamp(200), "add_media", 1.0, "chemostat"),
+            ("exp1", "unit1", recent_timestamp(60), "add_media", 1.0, "chemostat"),
+            ("exp1", "unit1", recent_timestamp(30), "add_alt_media", 0.5, "chemostat"),
+            ("exp1", "unit1", recent_timestamp(29), "remove_waste", 1.5, "chemostat"),
+            ("exp1", "unit2", recent_timestamp(10), "add_media", 3.0, "manually"),
+            ("exp2", "unit3", recent_timestamp(10), "add_media", 9.0, "chemostat"),
+        ],
+    )
+
+    # before the ledger is maintained, it's computed from the raw events
+    rates = client.get("/api/experiments/exp1/media_rates").get_json()
+    assert rates["unit1"] == {
+        "mediaRate": pytest.approx(1 / 3),
+        "altMediaRate": pytest.approx(0.5 / 3),
+    }
+    assert rates["unit2"] == {"mediaRate": pytest.approx(1.0), "altMediaRate": 0.0}
+    assert rates["all"]["mediaRate"] == pytest.approx(4 / 3)
+
+    assert update_dosing_ledger(g._app_database) > 0
+    assert client.get("/api/experiments/exp1/media_rates").get_json() == rates
+
+    # arrives late, and isn't in the ledger yet
+    insert_recent_rows(
+        "dosing_events",
+        columns,
+        [("exp1", "unit1", recent_timestamp(90), "add_media", 1.5, "chemostat")],
+    )
+    for _ in range(2):
+        rates = client.get("/api/experiments/exp1/media_rates?window=2").get_json()
+        assert rates["unit1"]["mediaRate"] == pytest.approx(2.5 / 2)
+
+        ledger = client.get("/api/experiments/exp1/dosing_ledger?window=1,3").get_json()["units"]
+        assert sorted(ledger) == ["unit1", "unit2"]
+        unit1 = ledger["unit1"]
+        assert unit1["media_ml"] == pytest.approx(3.5)
+        assert unit1["alt_media_ml"] == pytest.approx(0.5)
+        assert unit1["waste_ml"] == pytest.approx(1.5)
+        assert unit1["rates"]["3"]["media_ml_per_hour"] == pytest.approx(2.5 / 3)
+        assert unit1["rates"]["1"]["waste_ml_per_hour"] == pytest.approx(1.5)
+        assert ledger["unit2"]["liquid_volume_ml"] == pytest.approx(17.0)
+
+        update_dosing_ledger(g._app_database)
+
+    # the late event was placed in order
+    unit1 = client.get("/api/experiments/exp1/dosing_ledger").get_json()["units"]["unit1"]
+    # 14ml + 4ml added, then only the 2.5ml above the outflow (14ml) is removed
+    assert unit1["liquid_volume_ml"] == pytest.approx(16.5)
+    assert unit1["alt_media_fraction"] == pytest.approx(0.5 / 18)
+
+    assert client.get("/api/experiments/exp1/dosing_ledger?window=0").status_code == 400
+
+
+def test_dashboard_snapshots(app, client, monkeypatch, caplog):
+    from pioreactorui import api
+    from pioreactorui import snapshots
+    from pioreactorui.snapshots import refresh_snapshots
+
+    monkeypatch.setitem(api.env, "WWW", os.path.dirname(os.path.dirname(__file__)))
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [("exp1", "unit1", recent_timestamp(30 - i), 0.1 * i) for i in range(10)],
+    )
+
+    # before the task has run, and without creating the file
+    path = app.config["DASHBOARD_SNAPSHOTS"]
+    assert client.get("/api/experiments/exp1/dashboard").status_code == 404
+    assert not os.path.exists(path)
+
+    # a failing payload is left out, and logged
+    monkeypatch.setitem(
+        snapshots.DASHBOARD_PAYLOADS, "broken", "/api/experiments/{experiment}/nope"
+    )
+    experiments = refresh_snapshots(client, path)
+    assert "exp1" in experiments
+    assert "Left broken out of exp1's dashboard snapshot" in caplog.text
+
+    response = client.get("/api/experiments/exp1/dashboard")
+    assert response.status_code == 200
+    assert int(response.headers["Age"]) >= 0
+    snapshot = response.get_json()
+    assert 0 <= snapshot["age_seconds"] < 60
+    assert snapshot["computed_at"].endswith("Z")
+
+    payloads = snapshot["payloads"]
+    assert sorted(payloads) == ["charts", "latest", "media_rates", "recent_logs"]
+    assert payloads["charts"] == client.get("/api/experiments/exp1/charts").get_json()
+    assert payloads["latest"]["units"]["unit1"]["growth_rate"]["value"] == 0.9
+
+    # snapshots of experiments that no longer have workers are dropped
+    client.delete("/api/experiments/exp1/workers")
+    assert "exp1" not in refresh_snapshots(client, path)
+    assert client.get("/api/experiments/exp1/dashboard").status_code == 404
+
+
 @pytest.mark.xfail(reason="need to mock datetime")
 def test_get_logs_for_unit_and_experiment(client):
     response = client.get("/api/workers/unit1/experiments/exp1/logs")
@@ -408,3 +844,1271 @@ def test_get_settings_api(client):
         r = client.get(r.json["result_url_path"])
         settings_per_unit = r.json["result"]
         assert settings_per_unit["unit1"]["settings"]["target_rpm"] == 500.0
+
+
+def test_downsampled_growth_rates_are_bounded_and_keep_spikes(client):
+    rows = []
+    for unit in ("unit1", "unit2"):
+        for i in range(2_000):
+            rate = 0.5 if (unit == "unit1" and i == 1_000) else 0.01
+            rows.append(("exp1", unit, recent_timestamp(120 - i * 0.05), rate))
+    insert_recent_rows("growth_rates", ("experiment", "pioreactor_unit", "timestamp", "rate"), rows)
+
+    for method in ("lttb", "minmax"):
+        response = client.get(
+            f"/api/experiments/exp1/time_series/growth_rates?downsample={method}&max_points=100"
+        )
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["series"] == ["unit1", "unit2"]
+        assert all(len(points) <= 100 for points in data["data"])
+        assert max(point["y"] for point in data["data"][0]) == 0.5
+
+        timestamps = [point["x"] for point in data["data"][0]]
+        assert timestamps == sorted(timestamps)
+
+
+def test_downsampled_od_readings_are_keyed_by_unit_and_channel(client):
+    rows = [
+        ("exp1", "unit1", recent_timestamp(60 - i), 0.1 + i / 1000, 90, channel)
+        for i in range(50)
+        for channel in (1, 2)
+    ]
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        rows,
+    )
+
+    response = client.get("/api/experiments/exp1/time_series/od_readings?downsample=lttb")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["series"] == ["unit1-1", "unit1-2"]
+    assert len(data["data"][0]) == 50
+
+
+def test_invalid_downsample_method(client):
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?downsample=mean")
+    assert response.status_code == 400
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/growth_rates?downsample=lttb&max_points=many"
+    )
+    assert response.status_code == 400
+
+
+def test_downsampled_fallback_time_series(client):
+    rows = [("exp1", "unit1", recent_timestamp(30 - i * 0.01), i / 3000) for i in range(3_000)]
+    insert_recent_rows(
+        "alt_media_fractions",
+        ("experiment", "pioreactor_unit", "timestamp", "alt_media_fraction"),
+        rows,
+    )
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/alt_media_fractions/alt_media_fraction?downsample=minmax&max_points=50"
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["series"] == ["unit1"]
+    assert len(data["data"][0]) <= 50
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/not_a_table/not_a_column?downsample=lttb"
+    )
+    assert response.status_code == 400
+
+
+def test_time_series_since_cursor_only_returns_newer_rows(client):
+    import json
+    from urllib.parse import quote
+
+    insert_recent_rows(
+        "temperature_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "temperature_c"),
+        [
+            ("exp1", unit, recent_timestamp(10 - i - offset), 30.0 + i)
+            for i in range(5)
+            for unit, offset in (("unit1", 0), ("unit2", 2))
+        ],
+    )
+
+    response = client.get("/api/experiments/exp1/time_series/temperature_readings?filter_mod_N=1")
+    first = response.get_json()
+    assert sum(len(points) for points in first["data"]) == 10
+    cursor = first["cursor"]
+    assert cursor == {unit: points[-1]["x"] for unit, points in zip(first["series"], first["data"])}
+    assert cursor["unit2"] > cursor["unit1"]
+
+    # nothing new yet
+    response = client.get(
+        "/api/experiments/exp1/time_series/temperature_readings?filter_mod_N=1&since="
+        + quote(json.dumps(cursor))
+    )
+    data = response.get_json()
+    assert data["series"] == []
+    assert data["cursor"] == cursor
+
+    # unit1's row arrives late: it's older than unit2's newest row, but newer than unit1's.
+    late = recent_timestamp(5)
+    assert cursor["unit1"] < late < cursor["unit2"]
+    insert_recent_rows(
+        "temperature_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "temperature_c"),
+        [("exp1", "unit1", late, 40.0)],
+    )
+    for extra in ("filter_mod_N=1", "downsample=lttb", "filter_mod_N=1&parallel=1"):
+        response = client.get(
+            f"/api/experiments/exp1/time_series/temperature_readings?{extra}&since="
+            + quote(json.dumps(cursor))
+        )
+        data = response.get_json()
+        assert data["series"] == ["unit1"]
+        assert [point["y"] for point in data["data"][0]] == [40.0]
+        assert data["cursor"] == cursor | {"unit1": late}
+
+    # a single timestamp applies to every series, and is read in the tables' format
+    response = client.get(
+        "/api/experiments/exp1/time_series/temperature_readings?filter_mod_N=1&since="
+        + late.replace("Z", "000Z")
+    )
+    data = response.get_json()
+    assert data["series"] == ["unit2"]
+    assert data["cursor"] == {"unit2": cursor["unit2"]}
+
+
+def test_time_series_since_must_be_a_timestamp(client):
+    for since in ("yesterday", "2024-01-01", "2024-01-01T00:00:00+02:00", '{"unit1": 1}'):
+        response = client.get(f"/api/experiments/exp1/time_series/growth_rates?since={since}")
+        assert response.status_code == 400
+
+
+def test_long_lookbacks_read_rollups(client):
+    from pioreactorui.rollups import update_rollups
+
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [
+            ("exp1", "unit1", recent_timestamp(20 * 60 - i), 0.01 * (i % 2))
+            for i in range(0, 1200, 2)
+        ],
+    )
+
+    # rollups don't exist yet, so we fall back to the raw table
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?lookback=24")
+    assert response.get_json()["resolution"] == "raw"
+
+    assert update_rollups(g._app_database)["growth_rates"] == 600 + 4  # includes the sample data
+
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?lookback=24")
+    data = response.get_json()
+    assert data["resolution"] == "1m"
+    assert data["series"] == ["unit1"]
+    assert len(data["data"][0]) == 600
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/growth_rates?lookback=24&resolution=1h"
+    )
+    data = response.get_json()
+    assert data["resolution"] == "1h"
+    assert 20 <= len(data["data"][0]) <= 21
+    assert all(0 <= point["y"] <= 0.01 for point in data["data"][0])
+
+    # new rows are merged into the existing buckets
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [("exp1", "unit1", recent_timestamp(0), 1.0)],
+    )
+    assert update_rollups(g._app_database)["growth_rates"] == 1
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?lookback=24")
+    assert response.get_json()["data"][0][-1]["y"] == 1.0
+
+    # the table is rebuilt without the zeros, renumbering its ROWIDs, and new rows then push
+    # max(ROWID) back above the watermark
+    g._app_database.executescript(
+        """
+        CREATE TEMP TABLE kept AS SELECT * FROM growth_rates WHERE rate != 0.0;
+        DELETE FROM growth_rates;
+        INSERT INTO growth_rates SELECT * FROM kept;
+        """
+    )
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [("exp1", "unit2", recent_timestamp(i / 2), 0.5) for i in range(1000)],
+    )
+    (n_rows,) = (
+        g._app_database.execute("SELECT count(*) AS n FROM growth_rates").fetchone().values()
+    )
+    assert update_rollups(g._app_database)["growth_rates"] == n_rows
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?lookback=24")
+    assert response.get_json()["series"] == ["unit1", "unit2"]
+    assert all(point["y"] > 0 for point in response.get_json()["data"][0])
+
+    # short lookbacks, and polls with a cursor, stay on the raw table
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?lookback=4")
+    assert response.get_json()["resolution"] == "raw"
+    response = client.get(
+        f"/api/experiments/exp1/time_series/growth_rates?lookback=24&since={recent_timestamp(5)}"
+    )
+    assert response.get_json()["resolution"] == "raw"
+
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?resolution=2m")
+    assert response.status_code == 400
+
+
+def decode_columns(payload: bytes) -> tuple[dict, dict]:
+    import json
+
+    import numpy as np
+
+    assert payload[:4] == b"PIOC"
+    header_length = int.from_bytes(payload[4:8], "little")
+    header = json.loads(payload[8 : 8 + header_length])
+    body = payload[8 + header_length :]
+    assert (8 + header_length) % 8 == 0
+
+    series = {}
+    for s in header["series"]:
+        x = np.frombuffer(body, dtype="<i8", count=s["length"], offset=s["x_offset"])
+        y = np.frombuffer(body, dtype="<f4", count=s["length"], offset=s["y_offset"])
+        series[s["name"]] = (x, y)
+    return header, series
+
+
+def test_columnar_time_series(client):
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [
+            ("exp1", "unit1", recent_timestamp(60 - i), 0.1 + i / 100, 90, channel)
+            for i in range(51)
+            for channel in (1, 2)
+        ],
+    )
+    headers = {"Accept": "application/x-pioreactor-columns"}
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/od_readings?filter_mod_N=1", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-pioreactor-columns"
+    assert "Accept" in response.headers["Vary"]
+
+    header, series = decode_columns(response.data)
+    assert header["resolution"] == "raw"
+    assert sorted(series) == ["unit1-1", "unit1-2"]
+    x, y = series["unit1-1"]
+    assert len(x) == 51
+    assert (x[1:] > x[:-1]).all()
+    assert abs(x[-1] / 1000 - datetime.now(timezone.utc).timestamp() - (-10 * 60)) < 60
+    assert abs(y[-1] - 0.6) < 1e-6
+
+    # the JSON version has the same points
+    json_data = client.get("/api/experiments/exp1/time_series/od_readings?filter_mod_N=1").json
+    assert header["cursor"] == json_data["cursor"]
+    assert [p["y"] for p in json_data["data"][0]] == pytest.approx(y.tolist(), rel=1e-6)
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/od_readings?downsample=lttb&max_points=10",
+        headers=headers,
+    )
+    header, series = decode_columns(response.data)
+    assert all(len(x) == 10 for x, _ in series.values())
+
+
+def test_columnar_fallback_time_series(client):
+    insert_recent_rows(
+        "alt_media_fractions",
+        ("experiment", "pioreactor_unit", "timestamp", "alt_media_fraction"),
+        [("exp1", "unit1", recent_timestamp(30 - i), i / 30) for i in range(30)],
+    )
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/alt_media_fractions/alt_media_fraction?filter_mod_N=1",
+        headers={"Accept": "application/x-pioreactor-columns"},
+    )
+    header, series = decode_columns(response.data)
+    assert list(series) == ["unit1"]
+    assert len(series["unit1"][0]) == 30
+
+    # empty experiments are still valid payloads
+    response = client.get(
+        "/api/experiments/exp2/time_series/alt_media_fractions/alt_media_fraction",
+        headers={"Accept": "application/x-pioreactor-columns"},
+    )
+    header, series = decode_columns(response.data)
+    assert series == {} and header["cursor"] == {}
+
+
+def test_streamed_time_series_match_the_buffered_ones(client):
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [
+            ("exp1", unit, recent_timestamp(60 - i), 0.1 + i / 100, 90, channel)
+            for i in range(40)
+            for unit in ("unit2", "unit1")
+            for channel in (1, 2)
+        ],
+    )
+    insert_recent_rows(
+        "alt_media_fractions",
+        ("experiment", "pioreactor_unit", "timestamp", "alt_media_fraction"),
+        [
+            ("exp1", unit, recent_timestamp(30 - i), i / 30)
+            for i in range(30)
+            for unit in ("unit1", "unit2")
+        ],
+    )
+
+    for path in (
+        "/api/experiments/exp1/time_series/od_readings?filter_mod_N=1&lookback=2",
+        "/api/experiments/exp1/time_series/growth_rates?filter_mod_N=1",
+        "/api/experiments/exp1/time_series/alt_media_fractions/alt_media_fraction?filter_mod_N=1",
+        "/api/workers/unit2/experiments/exp1/time_series/od_readings?filter_mod_N=1&lookback=2",
+        "/api/experiments/exp2/time_series/growth_rates",
+    ):
+        buffered = client.get(path).get_json()
+        response = client.get(path + "&stream=1" if "?" in path else path + "?stream=1")
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert "X-Cache" not in response.headers
+        assert response.get_json() == buffered
+
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?stream=maybe")
+    assert response.status_code == 400
+
+
+def test_time_series_tiles(client, monkeypatch):
+    from pioreactorui.rollups import update_rollups
+    from pioreactorui.tiles import TILE_LEVELS
+
+    width = TILE_LEVELS[0].width_ms
+    now_ms = datetime.now(timezone.utc).timestamp() * 1000
+    past_tile = int(now_ms // width) - 2
+
+    def tile_timestamp(index: int, minutes: float) -> str:
+        # like pioreactor's timestamps, to the millisecond
+        dt = datetime.fromtimestamp(index * width / 1000 + minutes * 60, timezone.utc)
+        return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [("exp1", "unit1", tile_timestamp(past_tile, i), 0.1 * i) for i in range(-1, 16)]
+        + [("exp1", "unit1", recent_timestamp(0), 9.0)]
+        # to the microsecond, just after the tile's start
+        + [("exp1", "unit1", tile_timestamp(past_tile, 0).replace(".000Z", ".000500Z"), 0.05)],
+    )
+
+    response = client.get(f"/api/experiments/exp1/tiles/growth_rates/0/{past_tile}")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.headers["X-Cache"] == "MISS"
+    tile = response.get_json()
+    assert tile["complete"] and tile["resolution"] == "raw"
+    assert tile["tile"]["level"] == 0 and tile["tile"]["index"] == past_tile
+    # only the tile's [start, end) rows
+    assert sorted(p["y"] for p in tile["data"][0]) == pytest.approx(
+        [0.0, 0.05] + [0.1 * i for i in range(1, 15)]
+    )
+    previous_tile = client.get(f"/api/experiments/exp1/tiles/growth_rates/0/{past_tile - 1}")
+    assert [p["y"] for p in previous_tile.get_json()["data"][0]] == pytest.approx([-0.1])
+
+    # complete tiles are kept as they were
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [("exp1", "unit1", tile_timestamp(past_tile, 7.5), 100.0)],
+    )
+    response = client.get(f"/api/experiments/exp1/tiles/growth_rates/0/{past_tile}")
+    assert response.headers["X-Cache"] == "HIT"
+    assert response.get_json() == tile
+
+    # the current tile isn't final
+    response = client.get(f"/api/experiments/exp1/tiles/growth_rates/0/{past_tile + 2}")
+    assert response.headers["Cache-Control"] == "public, max-age=5"
+    assert response.get_json()["complete"] is False
+    assert response.get_json()["data"][0][-1]["y"] == 9.0
+
+    # coarser levels read the rollups
+    update_rollups(g._app_database)
+    hourly_index = int(now_ms // TILE_LEVELS[2].width_ms)
+    tile = client.get(f"/api/experiments/exp1/tiles/growth_rates/2/{hourly_index}").get_json()
+    assert tile["resolution"] == "1m"
+
+    # a settled tile is only final once the rollups were updated after it settled
+    from pioreactorui import api
+    from pioreactorui.tiles import tile_settles_at
+
+    monkeypatch.setattr(api, "MAX_STALENESS_MINUTES", 10**6)
+    settled_index = hourly_index - 2
+    settles_at = tile_settles_at(TILE_LEVELS[2], settled_index)
+    g._app_database.execute(
+        "UPDATE ts_rollup_watermarks SET updated_at=STRFTIME('%Y-%m-%dT%H:%M:%f000Z', ?, 'unixepoch')",
+        (settles_at - 60,),
+    )
+    g._app_database.commit()
+    response = client.get(f"/api/experiments/exp1/tiles/growth_rates/2/{settled_index}")
+    assert response.headers["Cache-Control"] == "public, max-age=5"
+    assert response.get_json()["resolution"] == "1m"
+    assert response.get_json()["complete"] is False
+
+    update_rollups(g._app_database)
+    response = client.get(f"/api/experiments/exp1/tiles/growth_rates/2/{settled_index}")
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.get_json()["complete"] is True
+
+    tile = client.get(f"/api/experiments/exp1/tiles/growth_rates/rate/0/{past_tile + 2}").get_json()
+    assert tile["series"] == ["unit1"]
+
+    assert (
+        client.get(f"/api/experiments/exp1/tiles/growth_rates/{len(TILE_LEVELS)}/0").status_code
+        == 404
+    )
+    assert client.get("/api/experiments/exp1/tiles/growth_rates/0/-1").status_code == 404
+    assert client.get("/api/experiments/exp1/tiles/growth_rates/0/10000000000").status_code == 400
+    assert client.get("/api/experiments/exp1/tiles/growth_rates/rate/4/10**20").status_code == 404
+    assert (
+        client.get(f"/api/experiments/exp1/tiles/growth_rates/rate/4/{10**20}").status_code == 400
+    )
+    assert client.get("/api/experiments/exp1/tiles/not_a_table/x/0/0").status_code == 400
+    assert len(client.get("/api/time_series/tile_levels").get_json()) == len(TILE_LEVELS)
+
+
+def test_time_series_results_are_cached_until_new_rows_arrive(client):
+    insert_recent_rows(
+        "temperature_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "temperature_c"),
+        [("exp1", "unit1", recent_timestamp(10 - i), 30.0 + i) for i in range(5)],
+    )
+    url = "/api/experiments/exp1/time_series/temperature_readings?filter_mod_N=1"
+    hits = client.get("/api/time_series/cache_stats").get_json()["hits"]
+
+    first = client.get(url)
+    assert first.headers["X-Cache"] == "MISS"
+    second = client.get(url)
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json() == first.get_json()
+    assert "Accept" in second.headers["Vary"]
+    assert client.get("/api/time_series/cache_stats").get_json()["hits"] == hits + 1
+
+    # the other format is cached separately
+    columnar = client.get(url, headers={"Accept": "application/x-pioreactor-columns"})
+    assert columnar.headers["X-Cache"] == "MISS"
+    assert columnar.mimetype == "application/x-pioreactor-columns"
+
+    insert_recent_rows(
+        "temperature_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "temperature_c"),
+        [("exp1", "unit1", recent_timestamp(0), 40.0)],
+    )
+    third = client.get(url)
+    assert third.headers["X-Cache"] == "MISS"
+    assert third.get_json()["data"][0][-1]["y"] == 40.0
+
+    # polls with a cursor, and failed requests, skip the cache
+    response = client.get(url + f"&since={recent_timestamp(5)}")
+    assert "X-Cache" not in response.headers
+    response = client.get("/api/experiments/exp1/time_series/not_a_table/not_a_column")
+    assert response.status_code == 400
+
+
+def test_get_several_charts_in_one_request(client, monkeypatch):
+    from pioreactorui import api
+
+    monkeypatch.setitem(api.env, "WWW", os.path.dirname(os.path.dirname(__file__)))
+
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [("exp1", "unit1", recent_timestamp(60 - i * 0.01), 0.1, 90, 2) for i in range(3_000)],
+    )
+    insert_recent_rows(
+        "alt_media_fractions",
+        ("experiment", "pioreactor_unit", "timestamp", "alt_media_fraction"),
+        [("exp1", "unit1", recent_timestamp(30 - i), i / 30) for i in range(30)],
+    )
+
+    response = client.get(
+        "/api/experiments/exp1/charts?keys=optical_density,fraction_of_volume_that_is_alternative_media&max_points=200"
+    )
+    assert response.status_code == 200
+    charts = response.get_json()
+    assert list(charts) == ["optical_density", "fraction_of_volume_that_is_alternative_media"]
+
+    # optical_density is down_sample: true, and its lookback is read from the config
+    assert charts["optical_density"]["series"] == ["unit1-2"]
+    assert len(charts["optical_density"]["data"][0]) == 200
+    # alt_media_fraction isn't downsampled
+    assert len(charts["fraction_of_volume_that_is_alternative_media"]["data"][0]) == 30
+
+    # same as the individual endpoint
+    single = client.get(
+        "/api/experiments/exp1/time_series/alt_media_fractions/alt_media_fraction?filter_mod_N=1"
+    ).get_json()
+    assert single["data"] == charts["fraction_of_volume_that_is_alternative_media"]["data"]
+
+    response = client.get("/api/experiments/exp1/charts")
+    assert "implied_daily_growth_rate" in response.get_json()
+
+    response = client.get("/api/experiments/exp1/charts?keys=temperature,not_a_chart")
+    assert response.status_code == 404
+
+    # long lookbacks of built-in series are read from the rollups, like the individual endpoints
+    from pioreactorui.rollups import choose_resolution
+    from pioreactorui.rollups import update_rollups
+
+    update_rollups(g._app_database)
+    charts = client.get(
+        "/api/experiments/exp1/charts?keys=optical_density,fraction_of_volume_that_is_alternative_media&lookback=24&max_points=50"
+    ).get_json()
+    assert list(charts) == ["optical_density", "fraction_of_volume_that_is_alternative_media"]
+    assert charts["optical_density"]["resolution"] == choose_resolution(24)
+    single = client.get(
+        "/api/experiments/exp1/time_series/od_readings?lookback=24&downsample=lttb&max_points=50"
+    ).get_json()
+    assert single == charts["optical_density"]
+    assert charts["fraction_of_volume_that_is_alternative_media"]["resolution"] == "raw"
+
+
+def test_charts_apply_their_y_transformation(client, monkeypatch):
+    from pioreactorui import api
+
+    monkeypatch.setitem(api.env, "WWW", os.path.dirname(os.path.dirname(__file__)))
+
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [("exp1", "unit1", recent_timestamp(30 - i), 0.1 * i) for i in range(10)],
+    )
+
+    charts = client.get(
+        "/api/experiments/exp1/charts?keys=implied_growth_rate,implied_daily_growth_rate&lookback=1"
+    ).get_json()
+    hourly, daily = charts["implied_growth_rate"], charts["implied_daily_growth_rate"]
+    assert "transformed" not in hourly  # (y) => y
+    assert daily["transformed"] is True  # (y) => 24 * y
+    assert [point["y"] for point in daily["data"][0]] == [
+        round(24 * point["y"], 5) for point in hourly["data"][0]
+    ]
+
+
+def test_step_series_are_encoded_as_change_points(client, monkeypatch):
+    from pioreactorui import api
+    from pioreactorui.structs import ChartDescriptor
+
+    duty_cycles = [0.0, 0.0, 0.0, 5.0, 5.0, 5.0, 5.0, 0.0, 0.0]
+    insert_recent_rows(
+        "pwm_dcs",
+        ("experiment", "pioreactor_unit", "timestamp", "channel_1"),
+        [("exp1", "unit1", recent_timestamp(30 - i), dc) for i, dc in enumerate(duty_cycles)]
+        + [("exp1", "unit2", recent_timestamp(30 - i), 10.0) for i in range(5)],
+    )
+
+    rows = client.get(
+        "/api/experiments/exp1/time_series/pwm_dcs/channel_1?filter_mod_N=1&lookback=1"
+    ).get_json()
+    data = pwm_dcs = client.get(
+        "/api/experiments/exp1/time_series/pwm_dcs/channel_1?encoding=change_points&lookback=1"
+    ).get_json()
+    assert data["series"] == ["unit1", "unit2"]
+    assert data["encoding"] == "change_points"
+    assert data["cursor"] == rows["cursor"]
+
+    unit1, unit2 = data["data"]
+    assert [(point["y"], point["n"]) for point in unit1] == [(0, 3), (5, 4), (0, 1), (0, 1)]
+    assert [point["x"] for point in unit1] == [rows["data"][0][i]["x"] for i in (0, 3, 7, 8)]
+    # the last row is kept, so the last step is drawn up to it
+    assert [(point["y"], point["n"]) for point in unit2] == [(10, 4), (10, 1)]
+    assert sum(point["n"] for series in data["data"] for point in series) == 9 + 5
+
+    # built-in series and single units too
+    insert_recent_rows(
+        "temperature_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "temperature_c"),
+        [("exp1", "unit1", recent_timestamp(20 - i), 30.0 if i < 6 else 32.0) for i in range(10)],
+    )
+    data = client.get(
+        "/api/workers/unit1/experiments/exp1/time_series/temperature_readings?encoding=change_points"
+    ).get_json()
+    assert [(point["y"], point["n"]) for point in data["data"][0]] == [(30, 6), (32, 3), (32, 1)]
+
+    for query in (
+        "encoding=gzip",
+        "encoding=change_points&downsample=lttb",
+        "encoding=change_points&stream=1",
+    ):
+        response = client.get(f"/api/experiments/exp1/time_series/growth_rates?{query}")
+        assert response.status_code == 400
+
+    chart = ChartDescriptor(
+        chart_key="stirring_duty_cycle",
+        data_source="pwm_dcs",
+        data_source_column="channel_1",
+        title="Stirring",
+        source="app",
+        y_axis_label="%",
+        fixed_decimals=1,
+        encoding="change_points",
+    )
+    monkeypatch.setattr(api, "load_chart_descriptors", lambda: {chart.chart_key: chart})
+    charts = client.get("/api/experiments/exp1/charts?lookback=1").get_json()
+    assert charts["stirring_duty_cycle"] == pwm_dcs
+
+
+def test_sparklines_are_rendered_per_unit(client):
+    import re
+
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [
+            ("exp1", unit, recent_timestamp(50 - i / 10), 0.1 + (i % 7) / 100)
+            for i in range(500)
+            for unit in ("unit1", "unit2")
+        ],
+    )
+    insert_recent_rows(
+        "pwm_dcs",
+        ("experiment", "pioreactor_unit", "timestamp", "channel_1"),
+        [("exp1", "unit1", recent_timestamp(30 - i), 5.0) for i in range(3)],
+    )
+
+    response = client.get("/api/experiments/exp1/sparklines/growth_rates?lookback=1&width=60")
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "MISS"
+    payload = response.get_json()
+    assert payload["resolution"] == "raw"
+    assert (payload["width"], payload["height"]) == (60, 24)
+    assert sorted(payload["sparklines"]) == ["unit1", "unit2"]
+
+    full = client.get("/api/experiments/exp1/time_series/growth_rates?filter_mod_N=1&lookback=1")
+    assert len(response.get_data()) < len(full.get_data()) / 5
+
+    sparkline = payload["sparklines"]["unit1"]
+    assert sparkline["svg"].startswith('<svg xmlns="http://www.w3.org/2000/svg" width="60"')
+    points = re.findall(r"(-?[\d.]+),(-?[\d.]+)", sparkline["svg"].split(' d="')[1])
+    assert len(points) == 60  # one per horizontal pixel
+    assert all(0 <= float(px) <= 60 and 0 <= float(py) <= 24 for px, py in points)
+    assert (sparkline["min"], sparkline["max"]) == (0.1, 0.16)
+    assert sparkline["last"]["y"] == 0.12  # 0.1 + (499 % 7) / 100
+
+    # cached until there are new rows
+    response = client.get("/api/experiments/exp1/sparklines/growth_rates?lookback=1&width=60")
+    assert response.headers["X-Cache"] == "HIT"
+
+    flat = client.get("/api/experiments/exp1/sparklines/pwm_dcs/channel_1?lookback=1").get_json()
+    assert list(flat["sparklines"]) == ["unit1"]
+    assert "M" in flat["sparklines"]["unit1"]["svg"]
+
+    assert client.get("/api/experiments/exp1/sparklines/pwm_dcs").status_code == 404
+    assert client.get("/api/experiments/exp1/sparklines/growth_rates?width=5000").status_code == 400
+    assert client.get("/api/experiments/exp1/sparklines/growth_rates?lookback=x").status_code == 400
+
+
+OD_CALIBRATION = {
+    "calibration_type": "od",
+    "calibration_name": "od-cal-2024",
+    "calibrated_on_pioreactor_unit": "unit1",
+    "created_at": "2024-01-01T00:00:00Z",
+    "curve_data_": [0.1, 0.5, 0.01],  # voltage = 0.1 OD² + 0.5 OD + 0.01
+    "curve_type": "poly",
+    "x": "OD600",
+    "y": "Voltage",
+    "recorded_data": {"x": [0.0, 1.0, 2.0], "y": [0.01, 0.61, 1.41]},
+    "ir_led_intensity": 70.0,
+    "angle": "90",
+    "pd_channel": "2",
+    "is_active": True,
+    "pioreactor_unit": "unit1",
+}
+
+
+def test_raw_od_readings_can_be_calibrated(client):
+    from unittest.mock import patch
+
+    from msgspec.json import encode
+    from pioreactor.mureq import Response
+
+    calibration = OD_CALIBRATION
+    insert_recent_rows(
+        "raw_od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [
+            ("exp1", "unit1", recent_timestamp(10), 0.61, 90, 2),
+            ("exp1", "unit1", recent_timestamp(9), 5.0, 90, 2),
+            ("exp1", "unit1", recent_timestamp(8), 0.61, 135, 1),
+        ],
+    )
+    url = "/api/experiments/exp1/time_series/raw_od_readings?calibrate=1&filter_mod_N=1"
+
+    with capture_requests({"/unit_api/active_calibrations": encode({"od": calibration})}) as bucket:
+        data = client.get(url).get_json()
+    assert [request.path for request in bucket] == ["/unit_api/active_calibrations"]
+    assert data["series"] == ["unit1-1", "unit1-2"]
+    assert data["calibrations"] == {"unit1-2": "od-cal-2024"}
+    assert data["data"][0][0]["y"] == 0.61  # no calibration for channel 1
+    assert [point["y"] for point in data["data"][1]] == [1.0, 2.0]  # trimmed to the recorded ODs
+
+    # cached on the leader, until the calibrations are changed through the API
+    with capture_requests() as bucket:
+        assert client.get(url).get_json()["calibrations"] == {"unit1-2": "od-cal-2024"}
+        assert len(bucket) == 0
+
+        # a poll while the worker is unsetting it caches the old calibration again...
+        with patch("pioreactor.mureq.request") as request:
+
+            def unset_on_worker(method, **kwargs):
+                assert method == "DELETE"
+                request.side_effect = lambda *args, **kwargs: Response(
+                    "", 200, {}, encode({"od": calibration})
+                )
+                assert client.get(url).get_json()["calibrations"] == {"unit1-2": "od-cal-2024"}
+                return Response("", 200, {}, b"{}")
+
+            request.side_effect = unset_on_worker
+            client.delete("/api/workers/unit1/active_calibrations/od")
+
+    # ...but it's forgotten once the worker is done
+    with capture_requests({"/unit_api/active_calibrations": b"{}"}) as bucket:
+        data = client.get(url).get_json()
+    assert len(bucket) == 1
+    assert data["calibrations"] == {}
+    assert data["data"][1][0]["y"] == 0.61
+
+    # thinned like the uncalibrated series, by default too
+    insert_recent_rows(
+        "raw_od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [("exp1", "unit2", recent_timestamp(i / 100), 0.5, 90, 2) for i in range(400)],
+    )
+
+    def xs(data: dict) -> dict[str, list[str]]:
+        return {
+            name: [point["x"] for point in points]
+            for name, points in zip(data["series"], data["data"])
+        }
+
+    for filter_mod_n in ("", "&filter_mod_N=4"):
+        uncalibrated = client.get(
+            f"/api/experiments/exp1/time_series/raw_od_readings?{filter_mod_n}"
+        ).get_json()
+        with capture_requests({"/unit_api/active_calibrations": b"{}"}):
+            calibrated = client.get(
+                f"/api/experiments/exp1/time_series/raw_od_readings?calibrate=1{filter_mod_n}"
+            ).get_json()
+        assert xs(calibrated) == xs(uncalibrated)
+        assert 0 < len(xs(calibrated)["unit2-2"]) < 400
+
+    response = client.get("/api/experiments/exp1/time_series/od_readings?calibrate=1")
+    assert response.status_code == 400
+
+
+def test_expired_calibrations_are_kept_for_workers_that_dont_answer(app, monkeypatch):
+    from time import time
+
+    from pioreactorui import calibrations
+    from pioreactorui import result_cache
+
+    path = app.config["CALIBRATION_CACHE"]
+    monkeypatch.setattr(
+        calibrations,
+        "fetch_active_calibrations",
+        lambda units: {unit: {"od": OD_CALIBRATION} for unit in units},
+    )
+    assert list(calibrations.active_od_calibrations(["unit1"], path)) == ["unit1"]
+
+    # the entry expired, and the workers don't answer in time
+    monkeypatch.setattr(result_cache, "time", lambda: time() + 2 * calibrations.TTL_SECONDS)
+    monkeypatch.setattr(
+        calibrations, "fetch_active_calibrations", lambda units: {unit: None for unit in units}
+    )
+    assert list(calibrations.active_od_calibrations(["unit1", "unit2"], path)) == ["unit1"]
+
+    # but not once it was changed through the API
+    calibrations.invalidate_active_calibrations(["unit1"], path)
+    assert calibrations.active_od_calibrations(["unit1"], path) == {}
+
+
+def test_live_chart_events_are_fanned_out_from_mqtt(client, monkeypatch):
+    import paho.mqtt.client as mqtt
+    from pioreactorui import api
+    from pioreactorui import live_fanout
+
+    monkeypatch.setitem(api.env, "WWW", os.path.dirname(os.path.dirname(__file__)))
+
+    def deliver(topic: str, payload: bytes, retain: bool = False) -> None:
+        message = mqtt.MQTTMessage(topic=topic.encode())
+        message.payload = payload
+        message.retain = retain
+        live_fanout.on_message(None, None, message)
+
+    viewers = [
+        client.get("/api/experiments/exp1/live?keys=optical_density,temperature") for _ in range(2)
+    ]
+    assert viewers[0].mimetype == "text/event-stream"
+    streams = [iter(viewer.response) for viewer in viewers]
+    assert all(next(stream) == b": connected\n\n" for stream in streams)
+    # both viewers share one subscription per topic
+    assert sorted(live_fanout.topics()) == [
+        "pioreactor/+/exp1/od_reading/od1",
+        "pioreactor/+/exp1/od_reading/od2",
+        "pioreactor/+/exp1/temperature_automation/temperature",
+    ]
+
+    deliver("pioreactor/unit1/exp1/od_reading/od2", b"{}", retain=True)  # ignored
+    deliver("pioreactor/unit1/exp2/od_reading/od2", b'{"od": 0.5, "timestamp": "2025-01-01"}')
+    deliver("pioreactor/unit1/exp1/od_reading/od2", b'{"od": 0.5, "timestamp": "2025-01-01"}')
+    deliver("pioreactor/unit2/exp1/temperature_automation/temperature", b'{"temperature": 30}')
+    deliver(
+        "pioreactor/unit2/exp1/temperature_automation/temperature",
+        b'{"temperature": 30.5, "timestamp": "2025-01-01"}',
+    )
+
+    for stream in streams:
+        assert next(stream) == (
+            b'event: optical_density\ndata: {"series":"unit1-2","x":"2025-01-01","y":0.5}\n\n'
+        )
+        assert next(stream) == (
+            b'event: temperature\ndata: {"series":"unit2","x":"2025-01-01","y":30.5}\n\n'
+        )
+
+    for viewer in viewers:
+        viewer.close()
+    assert live_fanout.topics() == []
+
+    response = client.get("/api/experiments/exp1/live?keys=not_a_chart")
+    assert response.status_code == 404
+
+
+def test_recent_windows_are_read_from_the_hot_tier(client, monkeypatch):
+    import paho.mqtt.client as mqtt
+    from paho.mqtt.enums import CallbackAPIVersion
+    from pioreactorui import api
+    from pioreactorui.hot_tier import HotTier
+
+    def timestamp(minutes_ago: float) -> str:
+        # the hot tier keeps milliseconds, like pioreactor's timestamps.
+        return recent_timestamp(minutes_ago)[:23] + "Z"
+
+    insert_recent_rows(
+        "growth_rates",
+        ("experiment", "pioreactor_unit", "timestamp", "rate"),
+        [
+            ("exp1", unit, timestamp(90 - i), 0.1 + (i * 7 % 13) / 100)
+            for i in range(80)
+            # unit4 isn't assigned to exp1 (anymore), but its rows are in the database
+            for unit in ("unit1", "unit2", "unit4")
+        ],
+    )
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [
+            ("exp1", "unit1", timestamp(60 - i), 0.1 + i / 100, 90, channel)
+            for i in range(40)
+            for channel in (1, 2)
+        ],
+    )
+
+    hot_tier = HotTier(hours=2)
+    hot_tier.subscribe(mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2))
+    hot_tier.seed(g._app_database)
+    monkeypatch.setattr(api, "recent_readings", hot_tier)
+
+    def deliver(topic: str, payload: bytes, retain: bool = False) -> None:
+        message = mqtt.MQTTMessage(topic=topic.encode())
+        message.payload = payload
+        message.retain = retain
+        hot_tier.on_message(None, None, message)
+
+    for path in (
+        "/api/experiments/exp1/time_series/growth_rates?filter_mod_N=1&lookback=1",
+        "/api/experiments/exp1/time_series/od_readings?filter_mod_N=1&lookback=2",
+        "/api/workers/unit2/experiments/exp1/time_series/growth_rates?filter_mod_N=1&lookback=1",
+        "/api/experiments/exp2/time_series/growth_rates?filter_mod_N=1&lookback=1",
+    ):
+        response = client.get(path)
+        assert response.headers["X-Hot-Tier"] == "HIT"
+        # streamed responses are always read from the database
+        assert response.get_json() == client.get(path + "&stream=1").get_json()
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/growth_rates?lookback=1&downsample=lttb&max_points=10"
+    )
+    assert response.headers["X-Hot-Tier"] == "HIT"
+    assert [len(data) for data in response.get_json()["data"]] == [10, 10, 10]
+
+    # thinned by sequence number instead of ROWID: about as many rows are kept.
+    thinned = client.get(
+        "/api/experiments/exp1/time_series/growth_rates?filter_mod_N=4&lookback=2"
+    ).get_json()
+    assert all(abs(len(data) - 80 / 4) <= 1 for data in thinned["data"])
+
+    # longer windows than the hot tier keeps are read from the database.
+    response = client.get("/api/experiments/exp1/time_series/growth_rates?lookback=3")
+    assert "X-Hot-Tier" not in response.headers
+
+    newest = timestamp(0)
+    deliver("pioreactor/unit1/exp1/growth_rate_calculating/growth_rate", b"{}")  # ignored
+    deliver(
+        "pioreactor/unit1/exp1/growth_rate_calculating/growth_rate",
+        b'{"growth_rate": 0.9, "timestamp": "2020-01-01T00:00:00.000Z"}',
+        retain=True,
+    )
+    deliver(
+        "pioreactor/unit1/exp1/growth_rate_calculating/growth_rate",
+        b'{"growth_rate": 0.5, "timestamp": "' + newest.encode() + b'"}',
+    )
+    deliver(
+        "pioreactor/unit1/exp1/od_reading/od2",
+        b'{"od": 0.25, "timestamp": "' + newest.encode() + b'"}',
+    )
+
+    cursor = timestamp(5)
+    response = client.get(
+        f"/api/experiments/exp1/time_series/growth_rates?filter_mod_N=1&since={cursor}"
+    )
+    assert response.headers["X-Hot-Tier"] == "HIT"
+    data = response.get_json()
+    assert data["series"] == ["unit1"]
+    assert data["data"] == [[{"x": newest, "y": 0.5}]]
+    assert data["cursor"] == {"unit1": newest}
+
+    data = client.get(
+        "/api/workers/unit1/experiments/exp1/time_series/od_readings?filter_mod_N=1&lookback=1"
+    ).get_json()
+    assert data["series"] == ["unit1-1", "unit1-2"]
+    assert data["data"][1][-1] == {"x": newest, "y": 0.25}
+
+
+def test_parallel_per_unit_reads_match_single_query(client):
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [
+            ("exp1", f"unit{u}", recent_timestamp(60 - i), 0.1 + i / 100, 90, channel)
+            for u in range(10)
+            for i in range(20)
+            for channel in (1, 2)
+        ],
+    )
+    insert_recent_rows(
+        "alt_media_fractions",
+        ("experiment", "pioreactor_unit", "timestamp", "alt_media_fraction"),
+        [
+            ("exp1", f"unit{u}", recent_timestamp(30 - i), i / 30)
+            for u in range(3)
+            for i in range(30)
+        ],
+    )
+
+    for url in (
+        "/api/experiments/exp1/time_series/od_readings?filter_mod_N=1",
+        "/api/experiments/exp1/time_series/od_readings?downsample=lttb&max_points=10",
+        "/api/experiments/exp1/time_series/alt_media_fractions/alt_media_fraction?filter_mod_N=1",
+        "/api/experiments/exp1/time_series/alt_media_fractions/alt_media_fraction?downsample=minmax",
+    ):
+        single = client.get(url + "&parallel=0").get_json()
+        sharded = client.get(url + "&parallel=1").get_json()
+        assert sharded == single
+        # 10 units are sharded by default
+        assert client.get(url).get_json() == single
+
+    assert len(single["series"]) == 3
+    assert single["cursor"] is not None
+
+    response = client.get("/api/experiments/exp1/time_series/od_readings?parallel=maybe")
+    assert response.status_code == 400
+
+
+def test_aggregated_time_series(client):
+    hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2
+    )
+
+    def at(minutes: float) -> str:
+        return (hour + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [
+            ("exp1", "unit1", at(1), 0.1, 90, 2),
+            ("exp1", "unit1", at(30), 0.3, 90, 2),
+            ("exp1", "unit1", at(59), 0.2, 90, 2),
+            ("exp1", "unit1", at(61), 0.5, 90, 2),
+            ("exp1", "unit1", at(10), 9.0, 135, 1),
+        ],
+    )
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/od_readings/od_reading/aggregate?bucket=1h&stats=mean,min,max,count,first,last"
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["series"] == ["unit1-1", "unit1-2"]
+    assert data["data"][1] == [
+        {
+            "x": at(0).replace("000Z", "Z"),
+            "mean": 0.2,
+            "min": 0.1,
+            "max": 0.3,
+            "count": 3,
+            "first": 0.1,
+            "last": 0.2,
+        },
+        {
+            "x": at(60).replace("000Z", "Z"),
+            "mean": 0.5,
+            "min": 0.5,
+            "max": 0.5,
+            "count": 1,
+            "first": 0.5,
+            "last": 0.5,
+        },
+    ]
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/od_readings/od_reading/aggregate?bucket=30m&stats=count"
+    )
+    assert [[point["count"] for point in points] for points in response.get_json()["data"]] == [
+        [1],
+        [1, 2, 1],
+    ]
+
+    for query in ("bucket=10x", "bucket=0m", "stats=median", "lookback=a"):
+        response = client.get(
+            f"/api/experiments/exp1/time_series/od_readings/od_reading/aggregate?{query}"
+        )
+        assert response.status_code == 400
+
+    response = client.get(
+        "/api/experiments/exp1/time_series/sqlite_master/name/aggregate?bucket=1h"
+    )
+    assert response.status_code == 400
+
+
+def test_fallback_time_series_validates_against_the_schema(client):
+    insert_recent_rows(
+        "alt_media_fractions",
+        ("experiment", "pioreactor_unit", "timestamp", "alt_media_fraction"),
+        [
+            ("exp1", f"unit{u}", recent_timestamp(30 - i), i / 30)
+            for u in range(2)
+            for i in range(30)
+        ],
+    )
+
+    response = client.get("/api/experiments/exp1/time_series/not_a_table/not_a_column")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "No table or view named not_a_table."
+
+    response = client.get("/api/experiments/exp1/time_series/alt_media_fractions/not_a_column")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "alt_media_fractions has no column not_a_column."
+
+    # a plugin's view is picked up as soon as it's created, and is thinned without a ROWID
+    g._app_database.execute(
+        "CREATE VIEW plugin_fractions AS SELECT experiment, pioreactor_unit, timestamp, alt_media_fraction * 2 as doubled FROM alt_media_fractions"
+    )
+    url = "/api/experiments/exp1/time_series/plugin_fractions/doubled"
+    data = client.get(url + "?filter_mod_N=1").get_json()
+    assert data["series"] == ["unit0", "unit1"]
+    assert [len(points) for points in data["data"]] == [30, 30]
+    assert data["data"][0][-1]["y"] == pytest.approx(2 * 29 / 30)
+
+    thinned = client.get(url + "?filter_mod_N=3").get_json()
+    assert 0 < sum(len(points) for points in thinned["data"]) < 60
+
+
+def test_overlay_aligns_experiments_by_elapsed_time(client, monkeypatch):
+    from pioreactorui import api
+
+    start = datetime.now(timezone.utc) - timedelta(days=10)
+
+    def at(hours: float) -> str:
+        return (start + timedelta(hours=hours)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    insert_recent_rows(
+        "experiments",
+        ("experiment", "created_at", "description"),
+        [("run1", at(0), ""), ("run2", at(100), "")],
+    )
+    rows = []
+    for i in range(11):
+        # run1 grows linearly over 10h, run2 twice as fast over 5h, starting 100h later
+        rows.append(("run1", "unit1", at(i), 1.0 + 0.1 * i))
+        rows.append(("run1", "unit2", at(i), 1.0))
+        if i <= 5:
+            rows.append(("run2", "unit1", at(100 + i), 1.0 + 0.2 * i))
+    insert_recent_rows(
+        "od_readings_filtered",
+        ("experiment", "pioreactor_unit", "timestamp", "normalized_od_reading"),
+        rows,
+    )
+
+    response = client.get(
+        "/api/time_series/od_readings_filtered/overlay?experiments=run1,run2&units=unit1&points=11"
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["hours"] == [float(i) for i in range(11)]
+    assert data["series"] == [
+        {"experiment": "run1", "unit": "unit1"},
+        {"experiment": "run2", "unit": "unit1"},
+    ]
+    assert data["values"][0] == pytest.approx([1.0 + 0.1 * i for i in range(11)])
+    # run2 ends at 5h (give or take rounding of the timestamps)
+    assert data["values"][1][:5] == pytest.approx([1.0 + 0.2 * i for i in range(5)])
+    assert data["values"][1][6:] == [None] * 5
+
+    response = client.get(
+        "/api/time_series/od_readings_filtered/overlay?experiments=run1&points=3&max_hours=2"
+    )
+    data = response.get_json()
+    assert data["hours"] == [0.0, 1.0, 2.0]
+    assert len(data["series"]) == 2
+
+    response = client.get("/api/time_series/od_readings_filtered/overlay?experiments=run1,run3")
+    assert response.status_code == 404
+
+    # series aren't silently dropped
+    monkeypatch.setattr(api, "MAX_OVERLAY_SERIES", 2)
+    response = client.get("/api/time_series/od_readings_filtered/overlay?experiments=run1,run2")
+    assert response.status_code == 400
+    response = client.get("/api/time_series/alt_media_fractions/overlay?experiments=run1")
+    assert response.status_code == 400
+
+
+def test_time_series_for_a_single_unit(client):
+    from pioreactorui.rollups import update_rollups
+
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [
+            ("exp1", unit, recent_timestamp(20 * 60 - i), 0.1, 90, channel)
+            for unit in ("unit1", "unit1-b", "unit2")
+            for i in range(0, 1200, 10)
+            for channel in (1, 2)
+        ],
+    )
+    insert_recent_rows(
+        "alt_media_fractions",
+        ("experiment", "pioreactor_unit", "timestamp", "alt_media_fraction"),
+        [
+            ("exp1", unit, recent_timestamp(30 - i), i / 30)
+            for unit in ("unit1", "unit2")
+            for i in range(30)
+        ],
+    )
+
+    for query in ("filter_mod_N=1", "downsample=lttb", "lookback=24&resolution=raw&filter_mod_N=1"):
+        data = client.get(
+            f"/api/workers/unit1/experiments/exp1/time_series/od_readings?{query}"
+        ).get_json()
+        assert data["series"] == ["unit1-1", "unit1-2"]
+
+    response = client.get(
+        "/api/workers/unit1/experiments/exp1/time_series/od_readings?filter_mod_N=1",
+        headers={"Accept": "application/x-pioreactor-columns"},
+    )
+    header, series = decode_columns(response.data)
+    assert sorted(series) == ["unit1-1", "unit1-2"]
+
+    # rollups
+    update_rollups(g._app_database)
+    data = client.get(
+        "/api/workers/unit1/experiments/exp1/time_series/od_readings?lookback=24"
+    ).get_json()
+    assert data["resolution"] == "1m"
+    assert data["series"] == ["unit1-1", "unit1-2"]
+
+    data = client.get(
+        "/api/workers/unit2/experiments/exp1/time_series/alt_media_fractions/alt_media_fraction?filter_mod_N=1"
+    ).get_json()
+    assert data["series"] == ["unit2"]
+    assert len(data["data"][0]) == 30
+
+    response = client.get("/api/workers/unit1/experiments/exp1/time_series/not_builtin")
+    assert response.status_code == 404
+
+
+def test_replicate_bands(client):
+    hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2
+    )
+
+    def at(minutes: float) -> str:
+        return (hour + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    insert_recent_rows(
+        "temperature_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "temperature_c"),
+        [
+            ("exp1", "unit1", at(10), 30.0),
+            ("exp1", "unit1", at(20), 32.0),
+            ("exp1", "unit2", at(30), 35.0),
+            ("exp1", "unit2", at(70), 36.0),
+        ],
+    )
+
+    # unit1 and unit2 are labelled Reactor 1 and Reactor 2
+    url = "/api/experiments/exp1/time_series/temperature_readings/temperature_c/bands?bucket=1h"
+    data = client.get(url).get_json()
+    assert data["groups"] == {"Reactor": ["unit1", "unit2"]}
+    first, second = data["data"]["Reactor"]
+    assert first["x"] == at(0).replace("000Z", "Z")
+    assert first["n"] == 2
+    assert first["mean"] == 33.0
+    assert first["sd"] == round(8**0.5, 2)  # temperature_readings has 2 decimals
+    assert first["p50"] == 33.0
+    assert second["n"] == 1
+    assert second["mean"] == 36.0
+    assert second["sd"] is None
+
+    data = client.get(url + "&groups=a:unit1;b:unit2,unit3").get_json()
+    assert data["groups"] == {"a": ["unit1"], "b": ["unit2", "unit3"]}
+    assert [point["mean"] for point in data["data"]["a"]] == [31.0]
+    assert [point["mean"] for point in data["data"]["b"]] == [35.0, 36.0]
+
+    for query in ("bucket=10x", "groups=unit1,unit2", "lookback=a"):
+        response = client.get(
+            f"/api/experiments/exp1/time_series/temperature_readings/temperature_c/bands?{query}"
+        )
+        assert response.status_code == 400
+
+
+def test_replicate_bands_of_each_od_channel(client):
+    hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2
+    )
+
+    def at(minutes: float) -> str:
+        return (hour + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    insert_recent_rows(
+        "od_readings",
+        ("experiment", "pioreactor_unit", "timestamp", "od_reading", "angle", "channel"),
+        [
+            ("exp1", "unit1", at(10), 0.1, 90, 2),
+            ("exp1", "unit1", at(10), 1.0, 180, 1),
+            ("exp1", "unit2", at(20), 0.3, 90, 2),
+            ("exp1", "unit2", at(20), 3.0, 180, 1),
+        ],
+    )
+
+    data = client.get(
+        "/api/experiments/exp1/time_series/od_readings/od_reading/bands?bucket=1h"
+    ).get_json()
+    assert data["groups"] == {"Reactor": ["unit1", "unit2"]}
+    assert data["data"].keys() == {"Reactor-1", "Reactor-2"}
+    (ref,) = data["data"]["Reactor-1"]
+    (ninety,) = data["data"]["Reactor-2"]
+    assert (ref["n"], ref["mean"]) == (2, 2.0)
+    assert (ninety["n"], ninety["mean"]) == (2, 0.2)
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from datetime import datetime
+from datetime import timezone
+
+import numpy as np
+import pytest
+
+from pioreactorui.time_series import lttb_indices
+from pioreactorui.time_series import minmax_indices
+from pioreactorui.time_series import split_by_unit
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 100)
+
+    keep = lttb_indices(x, y, 100)
+
+    assert len(keep) == 100
+    assert keep[0] == 0
+    assert keep[-1] == 9_999
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(5_000, dtype=float)
+    y = np.ones_like(x)
+    y[1234] = 10.0
+
+    assert 1234 in lttb_indices(x, y, 50)
+
+
+def test_minmax_keeps_spike_and_dip():
+    x = np.arange(5_000, dtype=float)
+    y = np.zeros_like(x)
+    y[777] = 5.0
+    y[4000] = -5.0
+
+    keep = minmax_indices(x, y, 40)
+
+    assert len(keep) <= 40
+    assert 777 in keep
+    assert 4000 in keep
+
+
+def test_small_series_are_untouched():
+    x = np.arange(10, dtype=float)
+    assert list(lttb_indices(x, x, 100)) == list(range(10))
+    assert list(minmax_indices(x, x, 100)) == list(range(10))
+
+
+def test_split_by_unit():
+    units = np.array(["unit1", "unit1", "unit2", "unit3", "unit3"], dtype=object)
+    assert split_by_unit(units) == [slice(0, 2), slice(2, 3), slice(3, 5)]
+    assert split_by_unit(np.array([], dtype=object)) == []
+
+
+def test_choose_rollup_resolution():
+    from pioreactorui.rollups import choose_resolution
+
+    assert choose_resolution(4) is None
+    assert choose_resolution(24) == "1m"
+    assert choose_resolution(72) == "10m"
+    assert choose_resolution(168) == "10m"
+    assert choose_resolution(336) == "1h"
+    assert choose_resolution(24 * 60) == "1h"
+
+
+def test_result_cache_respects_version_and_ttl(tmp_path):
+    from pioreactorui.result_cache import ResultCache
+
+    with ResultCache(tmp_path / "cache.sqlite") as cache:
+        assert cache.get("key", "1") is None
+        cache.set("key", "1", "application/json", b"[]")
+        assert cache.get("key", "1") == ("application/json", b"[]")
+        assert cache.get("key", "2") is None
+
+    with ResultCache(tmp_path / "cache.sqlite", ttl_seconds=0) as cache:
+        cache.set("key", "1", "application/json", b"[]")
+        assert cache.get("key", "1") is None
+
+
+def test_tile_cache_evicts_the_oldest_tiles(tmp_path):
+    from pioreactorui.tiles import TileCache
+
+    with TileCache(tmp_path / "tiles.sqlite", max_bytes=200_000) as cache:
+        for i in range(40):
+            cache.set(f"tile{i}", "exp1", b"x" * 10_000)
+        assert cache.size() <= 200_000 + 20_000
+        assert cache.get("tile0") is None
+        assert cache.get("tile39") == b"x" * 10_000
+
+        cache.delete_experiment("exp1")
+        assert cache.get("tile39") is None
+
+
+def test_tile_ranges_are_aligned():
+    from pioreactorui.tiles import max_tile_index
+    from pioreactorui.tiles import tile_is_complete
+    from pioreactorui.tiles import tile_range
+    from pioreactorui.tiles import TileLevel
+
+    hourly = TileLevel(3_600_000, None)
+    index = datetime(2024, 1, 1, 5, tzinfo=timezone.utc).timestamp() * 1000 // hourly.width_ms
+    assert tile_range(hourly, int(index)) == (
+        "2024-01-01T05:00:00.000000Z",
+        "2024-01-01T06:00:00.000000Z",
+    )
+    # the last tile still has a timestamp
+    assert tile_range(hourly, max_tile_index(hourly))[1].startswith("9999-12-31T23:00:00")
+
+    end = (index + 1) * hourly.width_ms / 1000
+    assert not tile_is_complete(hourly, int(index), now=end)
+    assert tile_is_complete(hourly, int(index), now=end + 300)
+
+
+def test_sharded_queries_run_on_read_only_connections(tmp_path):
+    import sqlite3
+
+    from pioreactorui.sharding import map_query
+
+    database = str(tmp_path / "test.sqlite")
+    con = sqlite3.connect(database)
+    con.execute("CREATE TABLE readings (unit TEXT, value REAL)")
+    con.executemany(
+        "INSERT INTO readings VALUES (?, ?)", [(f"unit{i % 5}", i) for i in range(1_000)]
+    )
+    con.commit()
+
+    shards = map_query(
+        database,
+        "SELECT unit, count(*), sum(value) FROM readings WHERE unit=? GROUP BY 1",
+        [(f"unit{i}",) for i in reversed(range(5))],
+    )
+    assert [shard[0][0] for shard in shards] == ["unit4", "unit3", "unit2", "unit1", "unit0"]
+    assert sum(shard[0][2] for shard in shards) == sum(range(1_000))
+
+    # the pool's connections can't write
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        map_query(database, "DELETE FROM readings WHERE unit=?", [("unit0",)])
+    con.close()
+
+
+def test_bucket_statistics():
+    from pioreactorui.time_series import bucket_statistics
+    from pioreactorui.time_series import parse_bucket
+
+    assert parse_bucket("10m") == 600_000
+    with pytest.raises(ValueError):
+        parse_bucket("m")
+
+    x = np.array([0, 1_000, 59_999, 60_000, 185_000], dtype=np.int64)
+    y = np.array([1.0, 3.0, 2.0, 5.0, 4.0])
+    result = bucket_statistics(x, y, 60_000, ["mean", "last", "count"])
+
+    assert result["start"].tolist() == [0, 60_000, 180_000]
+    assert result["mean"].tolist() == [2.0, 5.0, 4.0]
+    assert result["last"].tolist() == [2.0, 5.0, 4.0]
+    assert result["count"].tolist() == [3, 1, 1]
+
+    empty = bucket_statistics(x[:0], y[:0], 60_000, ["max"])
+    assert len(empty["start"]) == len(empty["max"]) == 0
+
+
+def test_replicate_bands():
+    from pioreactorui.time_series import replicate_bands
+    from pioreactorui.time_series import replicate_group
+
+    assert replicate_group("control-1") == replicate_group("control 2") == "control"
+    assert replicate_group("treated_03") == "treated"
+    assert replicate_group("42") == "42"
+
+    rng = np.random.default_rng(0)
+    x = np.arange(0, 600_000, 1_000, dtype=np.int64)
+    replicates = [rng.normal(loc, 0.1, size=len(x)) for loc in (1.0, 2.0, 3.0)]
+    bands = replicate_bands([(x, y) for y in replicates] + [(x[:60], replicates[0][:60])], 60_000)
+
+    means = np.array([y.reshape(10, 60).mean(axis=1) for y in replicates])
+    assert bands["start"].tolist() == list(range(0, 600_000, 60_000))
+    assert bands["n"].tolist() == [4] + [3] * 9
+    assert np.allclose(bands["mean"][1:], means[:, 1:].mean(axis=0))
+    assert np.allclose(bands["sd"][1:], means[:, 1:].std(axis=0, ddof=1))
+    assert np.allclose(bands["p50"][1:], means[:, 1:].mean(axis=0), atol=0.1)
+    assert np.all(bands["p10"] <= bands["p50"]) and np.all(bands["p50"] <= bands["p90"])
+
+    assert len(replicate_bands([], 60_000)["mean"]) == 0
+
+
+def test_compile_transformation():
+    from pioreactorui.transformations import compile_transformation
+
+    y = np.array([1.0, 2.0, -4.0])
+
+    assert compile_transformation("(y) => y") is None
+    assert compile_transformation("x=>x") is None
+    assert compile_transformation("(y) => 24 * y")(y).tolist() == [24.0, 48.0, -96.0]
+    assert compile_transformation("(y) => 1")(y).tolist() == [1.0, 1.0, 1.0]
+    assert compile_transformation("(y) => -y % 3")(y).tolist() == [-1.0, -2.0, 1.0]
+    assert compile_transformation("(od) => { return Math.max(od, 0, 1.5); }")(y).tolist() == [
+        1.5,
+        2.0,
+        1.5,
+    ]
+    log2 = compile_transformation("(y) => Math.log(y) / Math.LN2")(y)
+    assert log2[:2].tolist() == pytest.approx([0.0, 1.0]) and np.isnan(log2[2])
+    assert compile_transformation("(y) => Math.pow(y, 2) / 0")(y).tolist() == [np.inf] * 3
+
+    for source in (
+        "y * 2",
+        "(y) => __import__('os')",
+        "(y) => y.real",
+        "(y) => z",
+        "(y) => y > 1",
+        "(y) => y // 2",
+        "(y) => [y]",
+        "(y) => Math.pow(y)",
+        "(y) => Math.min()",
+        "(y) => Math.constructor",
+        "(y) => " + "(" * 1000 + "y" + ")" * 1000,
+    ):
+        with pytest.raises(ValueError):
+            compile_transformation(source)
+
+
+def test_voltages_to_od_inverts_the_calibration_curve():
+    from pioreactor.structs import ODCalibration
+
+    from pioreactorui.calibrations import voltages_to_od
+
+    def calibration(curve_data_, recorded_od):
+        return ODCalibration(
+            calibration_name="test",
+            calibrated_on_pioreactor_unit="unit1",
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            curve_data_=curve_data_,
+            curve_type="poly",
+            x="OD600",
+            y="Voltage",
+            recorded_data={"x": recorded_od, "y": [0.0] * len(recorded_od)},
+            ir_led_intensity=70.0,
+            angle="90",
+            pd_channel="2",
+        )
+
+    od = np.linspace(0.0, 1.5, 50)
+    increasing = calibration([0.2, 0.5, 0.01], [0.0, 1.5])
+    assert np.allclose(voltages_to_od(increasing, np.polyval([0.2, 0.5, 0.01], od)), od)
+    assert voltages_to_od(increasing, np.array([-1.0, 100.0])).tolist() == [0.0, 1.5]
+
+    decreasing = calibration([-0.4, 1.0], [0.0, 1.5])
+    assert np.allclose(voltages_to_od(decreasing, 1.0 - 0.4 * od), od)
+
+    # not monotonic over the recorded ODs: solved per voltage, like the od_reading job
+    peaked = calibration([-1.0, 2.0, 0.0], [0.0, 1.5])
+    assert voltages_to_od(peaked, np.array([0.75, 0.75])) == pytest.approx([0.5, 0.5])
+
+
+def test_schema_catalog_is_refreshed_when_the_schema_changes():
+    import sqlite3
+
+    from pioreactorui.schema_catalog import SchemaCatalog
+
+    con = sqlite3.connect(":memory:")
+    con.executescript(
+        """
+        CREATE TABLE readings (experiment TEXT, pioreactor_unit TEXT, timestamp TEXT, value REAL);
+        CREATE INDEX readings_ix ON readings (experiment, pioreactor_unit, timestamp);
+        """
+    )
+    catalog = SchemaCatalog()
+
+    readings = catalog.tables(con)["readings"]
+    assert readings.has_columns("value", "Timestamp")
+    assert readings.has_rowid and readings.thinning_key == "ROWID"
+    assert readings.filter_by_unit
+    assert catalog.tables(con) is catalog.tables(con)
+
+    con.executescript(
+        """
+        CREATE INDEX readings_time_ix ON readings (experiment, timestamp);
+        CREATE TABLE events (experiment TEXT, timestamp TEXT, PRIMARY KEY (experiment, timestamp)) WITHOUT ROWID;
+        """
+    )
+    tables = catalog.tables(con)
+    assert not tables["readings"].filter_by_unit
+    assert not tables["events"].has_rowid
+    assert "ROWID" not in tables["events"].thinning_key
+
+
+def test_resample_does_not_extrapolate():
+    from pioreactorui.time_series import resample
+
+    grid = np.array([0.0, 1.0, 1.5, 3.0])
+    values = resample(np.array([1.0, 2.0]), np.array([10.0, 20.0]), grid)
+    assert np.isnan(values[0]) and np.isnan(values[-1])
+    assert values[1:3].tolist() == [10.0, 15.0]
+    assert np.isnan(resample(np.empty(0), np.empty(0), grid)).all()
+
+
+def test_concatenated_series_are_sorted_by_x():
+    from pioreactorui.time_series import parse_concatenated_series
+
+    x, y = parse_concatenated_series("3,1,2", "30.5,10.5,20.5", x_dtype=np.int64)
+    assert x.tolist() == [1, 2, 3]
+    assert y.tolist() == [10.5, 20.5, 30.5]
+    x, y = parse_concatenated_series(None, None)
+    assert len(x) == len(y) == 0
+
+
+def test_stream_series_json_writes_the_same_payload_in_chunks():
+    from msgspec.json import decode
+
+    from pioreactorui.time_series import Since
+    from pioreactorui.time_series import stream_series_json
+
+    rows = [
+        ("unit1", "2024-01-01T00:00:00.000Z", 1.0),
+        ("unit1", "2024-01-01T00:00:05.000Z", 2.0),
+        ("unit1", "2024-01-01T00:00:10.000Z", 3.0),
+        ("unit2", "2024-01-01T00:00:01.000Z", 4.0),
+        ("unit3", "2024-01-01T00:00:02.000Z", 5.0),
+    ]
+    chunks = list(stream_series_json(iter(rows), chunk_rows=2, resolution="raw"))
+    # the opening, one chunk per 2 rows, and the closing
+    assert len(chunks) == 5
+    assert decode(b"".join(chunks)) == {
+        "data": [
+            [
+                {"x": "2024-01-01T00:00:00.000Z", "y": 1.0},
+                {"x": "2024-01-01T00:00:05.000Z", "y": 2.0},
+                {"x": "2024-01-01T00:00:10.000Z", "y": 3.0},
+            ],
+            [{"x": "2024-01-01T00:00:01.000Z", "y": 4.0}],
+            [{"x": "2024-01-01T00:00:02.000Z", "y": 5.0}],
+        ],
+        "series": ["unit1", "unit2", "unit3"],
+        "cursor": {
+            "unit1": "2024-01-01T00:00:10.000Z",
+            "unit2": "2024-01-01T00:00:01.000Z",
+            "unit3": "2024-01-01T00:00:02.000Z",
+        },
+        "resolution": "raw",
+    }
+
+    since = Since({"unit4": "2024-01-01T00:00:00.000Z"}, "2024-01-01T00:00:00.000Z")
+    empty = b"".join(stream_series_json([], since))
+    assert decode(empty) == {"data": [], "series": [], "cursor": since.cursors}
+
+
+def test_hot_tier_rings_only_answer_windows_they_fully_cover():
+    from pioreactorui.hot_tier import HotTier
+
+    hot_tier = HotTier(hours=3 / 1800)  # 3 points per ring
+    hot_tier._subscribed_at = 1_000
+
+    # nothing received before the subscription is known
+    assert hot_tier.read("growth_rates", "exp1", 999, now=7_000) is None
+    series, timestamps, x, y = hot_tier.read("growth_rates", "exp1", 1_000, now=7_000)
+    assert series == () and len(x) == 0
+
+    for i in range(5):
+        hot_tier.add("growth_rates", "exp1", "unit1", 2_000 + i * 1_000, float(i))
+    hot_tier.add("growth_rates", "exp1", "unit1", 5_500, 9.0)  # out of order, dropped
+
+    # the ring dropped the points at 2s and 3s
+    assert hot_tier.read("growth_rates", "exp1", 3_000, now=7_000) is None
+    series, timestamps, x, y = hot_tier.read("growth_rates", "exp1", 4_000, now=7_000)
+    assert series == ("unit1", "unit1")
+    assert timestamps == ("1970-01-01T00:00:05.000Z", "1970-01-01T00:00:06.000Z")
+    assert y.tolist() == [3.0, 4.0]
+
+    # other experiments keep their own coverage
+    hot_tier.add("growth_rates", "exp2", "unit2", 2_000, 1.0)
+    assert hot_tier.read("growth_rates", "exp2", 1_000, now=7_000)[0] == ("unit2",)
+
+    # later, exp2's ring isn't full, but windows longer than `hours` aren't covered anymore.
+    assert hot_tier.read("growth_rates", "exp2", 1_000, now=60_000) is None
+    assert hot_tier.read("growth_rates", "exp2", 54_000, now=60_000)[0] == ()
+
+
+def test_change_points_keep_each_run_start_and_the_last_row():
+    from pioreactorui.time_series import change_points
+
+    indices, run_lengths = change_points(np.array([1.0, 1.0, 2.0, 2.0, 2.0, 1.0]))
+    assert indices.tolist() == [0, 2, 5]
+    assert run_lengths.tolist() == [2, 3, 1]
+
+    indices, run_lengths = change_points(np.array([3.0, 3.0, 3.0]))
+    assert indices.tolist() == [0, 2]
+    assert run_lengths.tolist() == [2, 1]
+
+    assert change_points(np.array([4.0]))[0].tolist() == [0]
+    assert len(change_points(np.empty(0))[0]) == 0
+
+
+def test_sparkline_paths_are_scaled_to_their_box():
+    from pioreactorui.sparklines import sparkline_path
+
+    x = np.array([1.0, 2.0, 3.0])
+    # the time axis is shared: the series starts halfway
+    assert sparkline_path(x, np.array([0.0, 1.0, 0.5]), 10, 10, (-1.0, 3.0)) == (
+        "M5.0,9.2L7.5,0.8L10.0,5.0"
+    )
+    # flat series are drawn in the middle, lone points as dots
+    assert sparkline_path(x, np.ones(3), 10, 10, (1.0, 3.0)) == "M0.0,5.0L5.0,5.0L10.0,5.0"
+    assert sparkline_path(x[:1], np.ones(1), 10, 10, (1.0, 3.0)) == "M0.0,5.0h0"
+    assert sparkline_path(x[:0], x[:0], 10, 10, (1.0, 3.0)) == ""